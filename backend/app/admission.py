@@ -0,0 +1,155 @@
+"""Waiting room in front of exam starts.
+
+Starting an attempt holds a database connection for several statements. When
+thousands of students press "start" at once the pool runs dry and every
+request slows down together. ``AdmissionQueue`` caps how many starts run at
+once in this process; everyone else gets a place in a FIFO line and a retry
+hint, and comes back later instead of holding a worker thread. Nothing about
+the attempt exists until the student is admitted, so the exam timer only
+starts once they are actually let in.
+
+The budget is per process: with N API processes the database sees at most
+N * ADMISSION_MAX_CONCURRENT_STARTS concurrent starts.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Hashable, Iterator
+
+from .metrics import metrics
+
+ADMISSION_MAX_CONCURRENT_STARTS = int(os.getenv("ADMISSION_MAX_CONCURRENT_STARTS", "32"))
+# A waiting student who has not retried for this long has given up and loses their place
+ADMISSION_TICKET_TTL_SECONDS = float(os.getenv("ADMISSION_TICKET_TTL_SECONDS", "30"))
+ADMISSION_MAX_RETRY_SECONDS = int(os.getenv("ADMISSION_MAX_RETRY_SECONDS", "10"))
+
+
+@dataclass
+class Ticket:
+    seq: int
+    enqueued_at: float
+    last_seen: float
+
+
+@dataclass(frozen=True)
+class Admission:
+    admitted: bool
+    position: int = 0
+    retry_after_seconds: int = 0
+
+
+class AdmissionQueue:
+    """Bounded concurrency with a FIFO waiting line keyed by (exam_id, student_id)."""
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT_STARTS,
+        ticket_ttl_seconds: float = ADMISSION_TICKET_TTL_SECONDS,
+        max_retry_seconds: int = ADMISSION_MAX_RETRY_SECONDS,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.ticket_ttl_seconds = ticket_ttl_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._lock = threading.Lock()
+        self._waiting: "OrderedDict[Hashable, Ticket]" = OrderedDict()
+        self._next_seq = 0
+        self._in_flight = 0
+        self._last_expiry = 0.0
+        # Smoothed duration of one start, used to turn a queue position into a wait estimate
+        self._avg_start_seconds = 0.05
+
+    def _expire(self, now: float) -> None:
+        # Scanning the whole line on every request would be quadratic during a burst
+        if now - self._last_expiry < 1.0:
+            return
+        self._last_expiry = now
+        cutoff = now - self.ticket_ttl_seconds
+        expired = [key for key, ticket in self._waiting.items() if ticket.last_seen < cutoff]
+        for key in expired:
+            del self._waiting[key]
+        if expired:
+            metrics.incr("admission.expired", len(expired))
+
+    def _retry_after(self, position: int) -> int:
+        rounds = position / max(1, self.max_concurrent)
+        return max(1, min(self.max_retry_seconds, round(rounds * self._avg_start_seconds + 0.5)))
+
+    def try_admit(self, key: Hashable) -> Admission:
+        """Admit ``key`` if a slot is free and nobody is ahead of it, else queue it.
+
+        Callers that get ``admitted=True`` must call ``release`` when done.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            free = self.max_concurrent - self._in_flight
+            ticket = self._waiting.get(key)
+            if ticket is None:
+                if free > 0 and not self._waiting:
+                    self._in_flight += 1
+                    self._record_admission(0.0)
+                    return Admission(admitted=True)
+                ticket = Ticket(seq=self._next_seq, enqueued_at=now, last_seen=now)
+                self._next_seq += 1
+                self._waiting[key] = ticket
+            else:
+                ticket.last_seen = now
+
+            # Only the first ``free`` tickets in line may go in
+            for rank, ahead in enumerate(self._waiting):
+                if rank >= free:
+                    break
+                if ahead == key:
+                    del self._waiting[key]
+                    self._in_flight += 1
+                    self._record_admission(now - ticket.enqueued_at)
+                    return Admission(admitted=True)
+
+            head_seq = next(iter(self._waiting.values())).seq
+            position = ticket.seq - head_seq + 1
+            metrics.incr("admission.queued")
+            metrics.set_gauge("admission.queue_depth", len(self._waiting))
+            return Admission(admitted=False, position=position, retry_after_seconds=self._retry_after(position))
+
+    def _record_admission(self, waited: float) -> None:
+        metrics.incr("admission.admitted")
+        metrics.observe("admission.wait_seconds", waited)
+        metrics.set_gauge("admission.queue_depth", len(self._waiting))
+        metrics.set_gauge("admission.in_flight", self._in_flight)
+
+    def release(self, duration_seconds: float | None = None) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if duration_seconds is not None:
+                self._avg_start_seconds = 0.8 * self._avg_start_seconds + 0.2 * duration_seconds
+            metrics.set_gauge("admission.in_flight", self._in_flight)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold an admitted slot for the duration of the block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting),
+                "avg_start_seconds": round(self._avg_start_seconds, 4),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._waiting.clear()
+            self._in_flight = 0
+            self._last_expiry = 0.0
+
+
+start_admission = AdmissionQueue()
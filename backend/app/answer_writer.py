@@ -0,0 +1,198 @@
+"""Batched persistence for answers streamed over the exam session socket.
+
+Socket handlers hand each answer change to ``AnswerWriter`` and return to the
+connection immediately. A single writer thread drains the queue every few
+milliseconds, keeps only the newest change per (attempt, question), and
+writes the batch with one read of the affected attempts plus one executemany
+upsert that skips answers already holding a later sequence number. Every
+queued change is then acknowledged through its callback with None, or with
+the reason it was rejected.
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .crud import DEADLINE_GRACE_SECONDS, answer_upsert, as_utc
+from .metrics import metrics
+
+ANSWER_FLUSH_INTERVAL_SECONDS = float(os.getenv("ANSWER_FLUSH_INTERVAL_SECONDS", "0.1"))
+ANSWER_BATCH_SIZE = int(os.getenv("ANSWER_BATCH_SIZE", "500"))
+ANSWER_QUEUE_SIZE = int(os.getenv("ANSWER_QUEUE_SIZE", "20000"))
+
+
+@dataclass
+class AnswerWrite:
+    attempt_id: uuid.UUID
+    question_id: uuid.UUID
+    answer_data: Any
+    seq: int
+    # Called from the writer thread with None once stored, or with the rejection reason
+    on_done: Callable[[int, str | None], None] | None = None
+
+
+def persist_answers(db: Session, writes: list[AnswerWrite], now: datetime | None = None) -> list[str | None]:
+    """Store a batch of answer changes; returns the rejection reason (or None) for each write."""
+    if not writes:
+        return []
+    now = now or datetime.now(timezone.utc)
+    grace = timedelta(seconds=DEADLINE_GRACE_SECONDS)
+
+    attempts = {
+        row.id: row
+        for row in db.execute(
+            select(
+                models.ExamAttempt.id,
+                models.ExamAttempt.start_time,
+                models.ExamAttempt.end_time,
+                models.ExamAttempt.deadline_at,
+            ).where(models.ExamAttempt.id.in_({w.attempt_id for w in writes}))
+        )
+    }
+
+    def rejection(attempt_id: uuid.UUID) -> str | None:
+        attempt = attempts.get(attempt_id)
+        if attempt is None:
+            return "Attempt not found"
+        if attempt.start_time is None:
+            return "Exam not started"
+        if attempt.end_time is not None:
+            return "Exam already submitted"
+        if attempt.deadline_at is not None and now > as_utc(attempt.deadline_at) + grace:
+            return "Exam time is over"
+        return None
+
+    # Later sequence numbers win when the same answer changed several times in one batch
+    latest: dict[tuple[uuid.UUID, uuid.UUID], AnswerWrite] = {}
+    for write in writes:
+        key = (write.attempt_id, write.question_id)
+        if rejection(write.attempt_id) is None and (key not in latest or write.seq >= latest[key].seq):
+            latest[key] = write
+
+    if latest:
+        # Rows already holding a later write from another path (HTTP save, a reconnect) are left alone
+        db.execute(
+            answer_upsert(db),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "attempt_id": key[0],
+                    "question_id": key[1],
+                    "answer_data": write.answer_data,
+                    "client_seq": write.seq,
+                }
+                for key, write in latest.items()
+            ],
+        )
+        db.commit()
+
+    return [rejection(write.attempt_id) for write in writes]
+
+
+class AnswerWriter:
+    """One daemon thread that persists queued answer changes in batches."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] | None = None,
+        flush_interval: float = ANSWER_FLUSH_INTERVAL_SECONDS,
+        batch_size: int = ANSWER_BATCH_SIZE,
+        max_pending: int = ANSWER_QUEUE_SIZE,
+    ) -> None:
+        self._session_factory = session_factory
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._queue: queue.Queue[AnswerWrite] = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from .database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="answer-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Stop the writer after flushing what is already queued."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, write: AnswerWrite) -> bool:
+        """Queue a write; False if the writer is not running or full and the caller must persist it itself."""
+        if not self.is_running:
+            return False
+        try:
+            self._queue.put_nowait(write)
+        except queue.Full:
+            metrics.incr("answer_writer.queue_full")
+            return False
+        metrics.set_gauge("answer_writer.queue_depth", self._queue.qsize())
+        return True
+
+    def _next_batch(self) -> list[AnswerWrite]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        # Let a burst of keystrokes pile up so it lands in one round trip
+        time.sleep(self._flush_interval)
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self.flush(batch)
+
+    def flush(self, batch: list[AnswerWrite]) -> None:
+        started = time.perf_counter()
+        db = self._session()
+        try:
+            outcomes = persist_answers(db, batch)
+        except Exception:
+            db.rollback()
+            metrics.incr("answer_writer.failures")
+            traceback.print_exc()
+            outcomes = ["Answer could not be saved"] * len(batch)
+        finally:
+            db.close()
+        metrics.observe("answer_writer.batch_size", len(batch))
+        metrics.observe("answer_writer.flush_ms", (time.perf_counter() - started) * 1000)
+        metrics.incr("answer_writer.rejected", sum(1 for outcome in outcomes if outcome))
+        for write, outcome in zip(batch, outcomes):
+            if write.on_done is not None:
+                write.on_done(write.seq, outcome)
+
+    def status(self) -> dict:
+        return {"running": self.is_running, "pending": self._queue.qsize(), "max_pending": self._queue.maxsize}
+
+
+answer_writer = AnswerWriter()
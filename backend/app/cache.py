@@ -0,0 +1,81 @@
+"""Small thread-safe TTL cache for per-process read models (exam papers, eligibility sets)."""
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+from .metrics import metrics
+from .singleflight import SingleFlight
+
+
+class TTLCache:
+    """Entries expire ``ttl_seconds`` after they were stored; misses can be loaded through single-flight."""
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 1024) -> None:
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._flight = SingleFlight(name)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                metrics.incr(f"cache.{self.name}.hits")
+                return entry[1]
+            self._entries.pop(key, None)
+        metrics.incr(f"cache.{self.name}.misses")
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                # Drop the entry closest to expiry to make room
+                self._entries.pop(min(self._entries, key=lambda k: self._entries[k][0]))
+            self._entries[key] = (expires_at, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Cached value for ``key``, or loader()'s result (concurrent misses share one load).
+
+        None results are not cached, so a missing row is looked up again next time.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        def load_and_store():
+            loaded = loader()
+            if loaded is not None:
+                self.set(key, loaded)
+            return loaded
+
+        return self._flight.do(key, load_and_store)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Drop one entry, or everything when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key satisfies ``predicate``; returns how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -1,10 +1,70 @@
+from sqlalchemy import and_, case, delete, func, insert, or_, select, text, update
+from sqlalchemy.engine import Row
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
+import base64
+import json
+import os
 import uuid
-from datetime import datetime, timezone
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
 
 from . import models, schemas
+from .cache import TTLCache
+from .events import event_bus
+from .live import live_exams
+from .metrics import metrics
+from .facets import facet_index
+from .grading import as_utc, get_grading_plan, invalidate_grading_plan, refresh_final_scores
 from .security import get_password_hash
 
+# Saves arriving this soon after the deadline are still accepted (network latency)
+DEADLINE_GRACE_SECONDS = int(os.getenv("DEADLINE_GRACE_SECONDS", "5"))
+# Pending attempts are inserted in executemany batches of this size
+PROVISION_BATCH_SIZE = 1000
+# Papers change on publish/unpublish, deletes and provisioning; other workers catch up within this TTL
+EXAM_PAPER_TTL_SECONDS = float(os.getenv("EXAM_PAPER_TTL_SECONDS", "60"))
+
+
+def attempt_deadline(start_time: datetime, duration_minutes: int, exam_end_time: datetime) -> datetime:
+    """An attempt ends when its duration runs out or the exam window closes, whichever is first."""
+    return min(as_utc(start_time) + timedelta(minutes=duration_minutes), as_utc(exam_end_time))
+
+
+def get_attempt_deadline(db: Session, attempt: models.ExamAttempt) -> datetime:
+    """Return the stored deadline, or compute it for attempts created before it was persisted.
+
+    Read-only: legacy rows are backfilled by the expiry sweeper or ``ensure_attempt_deadline``.
+    """
+    if attempt.deadline_at is None:
+        exam = db.get(models.Exam, attempt.exam_id)
+        return attempt_deadline(attempt.start_time, exam.duration_minutes, exam.end_time)
+    return as_utc(attempt.deadline_at)
+
+
+def ensure_attempt_deadline(db: Session, attempt: models.ExamAttempt) -> datetime:
+    """Store the deadline of an attempt created before it was persisted; returns the deadline."""
+    if attempt.deadline_at is None:
+        attempt.deadline_at = get_attempt_deadline(db, attempt)
+        db.commit()
+    return as_utc(attempt.deadline_at)
+
+
+def seconds_remaining(attempt: models.ExamAttempt, now: datetime | None = None) -> int:
+    """Whole seconds left before the attempt's deadline (never negative)."""
+    now = now or datetime.now(timezone.utc)
+    return max(0, int((as_utc(attempt.deadline_at) - now).total_seconds()))
+
+
+def is_past_deadline(attempt: models.ExamAttempt, now: datetime | None = None, grace_seconds: int = 0) -> bool:
+    if attempt.deadline_at is None:
+        return False
+    now = now or datetime.now(timezone.utc)
+    return now > as_utc(attempt.deadline_at) + timedelta(seconds=grace_seconds)
+
 
 def get_user_by_email(db: Session, email: str) -> models.User | None:
     """Find a user by email address."""
@@ -49,12 +109,133 @@ def create_question(db: Session, question: schemas.QuestionBase) -> models.Quest
     db.add(db_q)
     db.commit()
     db.refresh(db_q)
+    facet_index.add(db_q)
     return db_q
 
 
-def create_exam(db: Session, exam: schemas.ExamCreate) -> models.Exam:
-    """Create a new exam with associated questions."""
-    db_exam = models.Exam(
+def delete_questions_bulk(
+    db: Session, question_ids: list, chunk_size: int = 500
+) -> dict[str, str]:
+    """Delete questions with their answers and evaluations using set-based statements.
+
+    Each chunk of ids is removed in its own transaction with one DELETE per
+    table. Returns a per-id status: "deleted", "not_found", "invalid" or "failed".
+    """
+    results: dict[str, str] = {}
+    valid_ids: list[uuid.UUID] = []
+    for raw_id in question_ids:
+        try:
+            valid_ids.append(uuid.UUID(str(raw_id)))
+        except (ValueError, TypeError, AttributeError):
+            results[str(raw_id)] = "invalid"
+    valid_ids = list(dict.fromkeys(valid_ids))
+
+    for start in range(0, len(valid_ids), chunk_size):
+        chunk = valid_ids[start:start + chunk_size]
+        try:
+            existing = set(
+                db.execute(
+                    select(models.Question.id).where(models.Question.id.in_(chunk))
+                ).scalars()
+            )
+            answer_ids = select(models.Answer.id).where(models.Answer.question_id.in_(chunk))
+            db.execute(delete(models.Evaluation).where(models.Evaluation.answer_id.in_(answer_ids)))
+            db.execute(delete(models.Answer).where(models.Answer.question_id.in_(chunk)))
+            db.execute(delete(models.exam_questions).where(models.exam_questions.c.question_id.in_(chunk)))
+            db.execute(delete(models.Question).where(models.Question.id.in_(chunk)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            for qid in chunk:
+                results[str(qid)] = "failed"
+            continue
+        for qid in chunk:
+            results[str(qid)] = "deleted" if qid in existing else "not_found"
+
+    # Removed questions drop out of every exam that used them
+    invalidate_grading_plan()
+    invalidate_exam_paper()
+    db.expire_all()
+    return results
+
+
+def _delete_attempts(db: Session, attempt_ids) -> None:
+    """Delete evaluations, answers and attempts selected by an attempt-id subquery or list."""
+    answer_ids = select(models.Answer.id).where(models.Answer.attempt_id.in_(attempt_ids))
+    db.execute(delete(models.Evaluation).where(models.Evaluation.answer_id.in_(answer_ids)))
+    db.execute(delete(models.Answer).where(models.Answer.attempt_id.in_(attempt_ids)))
+    db.execute(delete(models.ExamAttempt).where(models.ExamAttempt.id.in_(attempt_ids)))
+
+
+def delete_exam_cascade(db: Session, exam_id: uuid.UUID) -> None:
+    """Delete an exam with all attempts, answers and evaluations in one transaction."""
+    attempt_ids = select(models.ExamAttempt.id).where(models.ExamAttempt.exam_id == exam_id)
+    _delete_attempts(db, attempt_ids)
+    db.execute(delete(models.exam_questions).where(models.exam_questions.c.exam_id == exam_id))
+    db.execute(delete(models.ExamStatistics).where(models.ExamStatistics.exam_id == exam_id))
+    db.execute(delete(models.Exam).where(models.Exam.id == exam_id))
+    db.commit()
+    invalidate_grading_plan(exam_id)
+    invalidate_exam_paper(exam_id)
+    db.expire_all()
+
+
+def delete_exam_chunked(db: Session, exam_id: uuid.UUID, chunk_size: int = 200) -> int:
+    """Delete an exam's attempts in short per-chunk transactions, then the exam itself.
+
+    Used for very large exams so no single transaction holds locks on every
+    attempt at once. Returns the number of attempts deleted.
+    """
+    deleted = 0
+    while True:
+        chunk = list(
+            db.execute(
+                select(models.ExamAttempt.id)
+                .where(models.ExamAttempt.exam_id == exam_id)
+                .limit(chunk_size)
+            ).scalars()
+        )
+        if not chunk:
+            break
+        _delete_attempts(db, chunk)
+        db.commit()
+        deleted += len(chunk)
+    delete_exam_cascade(db, exam_id)
+    return deleted
+
+
+def count_exam_attempts(db: Session, exam_id: uuid.UUID) -> int:
+    """Count all attempts (finished or not) for an exam."""
+    return (
+        db.query(models.ExamAttempt)
+        .filter(models.ExamAttempt.exam_id == exam_id)
+        .count()
+    )
+
+
+def delete_student_cascade(db: Session, student_id: uuid.UUID) -> None:
+    """Delete a student with all their attempts, answers and evaluations."""
+    attempt_ids = select(models.ExamAttempt.id).where(models.ExamAttempt.student_id == student_id)
+    _delete_attempts(db, attempt_ids)
+    db.execute(delete(models.User).where(models.User.id == student_id))
+    db.commit()
+    eligibility_cache.invalidate()
+    db.expire_all()
+
+
+def find_missing_question_ids(db: Session, question_ids: list[uuid.UUID]) -> list[uuid.UUID]:
+    """Return the given question IDs that do not exist, using a single IN query."""
+    wanted = list(dict.fromkeys(question_ids))
+    if not wanted:
+        return []
+    existing = set(
+        db.execute(select(models.Question.id).where(models.Question.id.in_(wanted))).scalars()
+    )
+    return [qid for qid in wanted if qid not in existing]
+
+
+def _new_exam(exam: schemas.ExamCreate) -> models.Exam:
+    return models.Exam(
         title=exam.title,
         start_time=exam.start_time,
         end_time=exam.end_time,
@@ -62,17 +243,38 @@ def create_exam(db: Session, exam: schemas.ExamCreate) -> models.Exam:
         is_published=False,
         target_candidates=exam.target_candidates,
     )
-    
-    # Attach questions to the exam
-    for question_id in exam.question_ids:
-        question = get_question_by_id(db, question_id)
-        if question:
-            db_exam.questions.append(question)
-    
-    db.add(db_exam)
+
+
+def create_exams_bulk(db: Session, exams: list[schemas.ExamCreate]) -> list[models.Exam]:
+    """Create several exams and their question links in one transaction.
+
+    All question IDs are validated with one query and the exam_questions rows
+    are written with one bulk INSERT. Raises ValueError on unknown questions.
+    """
+    missing = find_missing_question_ids(db, [qid for exam in exams for qid in exam.question_ids])
+    if missing:
+        raise ValueError(f"Question with ID {missing[0]} not found")
+
+    db_exams = [_new_exam(exam) for exam in exams]
+    db.add_all(db_exams)
+    db.flush()
+
+    links = [
+        {"exam_id": db_exam.id, "question_id": question_id}
+        for db_exam, exam in zip(db_exams, exams)
+        for question_id in dict.fromkeys(exam.question_ids)
+    ]
+    if links:
+        db.execute(insert(models.exam_questions), links)
     db.commit()
-    db.refresh(db_exam)
-    return db_exam
+    for db_exam in db_exams:
+        db.refresh(db_exam)
+    return db_exams
+
+
+def create_exam(db: Session, exam: schemas.ExamCreate) -> models.Exam:
+    """Create a new exam with associated questions."""
+    return create_exams_bulk(db, [exam])[0]
 
 
 def get_exams(db: Session) -> list[models.Exam]:
@@ -100,14 +302,174 @@ def get_available_exams(db: Session) -> list[models.Exam]:
     )
 
 
+@dataclass(frozen=True)
+class ExamPaper:
+    """Student-facing snapshot of an exam (no answer keys), safe to share between requests."""
+    id: uuid.UUID
+    title: str
+    start_time: datetime
+    end_time: datetime
+    duration_minutes: int
+    is_published: bool
+    published_by: str | None  # Publisher's email
+    target_candidates: str | None
+    provisioned_at: datetime | None
+    questions: tuple[dict, ...]
+
+    def question_list(self) -> list[dict]:
+        return [dict(q) for q in self.questions]
+
+
+def _exam_paper(exam: models.Exam) -> ExamPaper:
+    publisher_email = None
+    if exam.published_by:
+        publisher_email = exam.publisher.email if exam.publisher else "Unknown"
+    return ExamPaper(
+        id=exam.id,
+        title=exam.title,
+        start_time=as_utc(exam.start_time),
+        end_time=as_utc(exam.end_time),
+        duration_minutes=exam.duration_minutes,
+        is_published=exam.is_published,
+        published_by=publisher_email,
+        target_candidates=exam.target_candidates,
+        provisioned_at=as_utc(exam.provisioned_at) if exam.provisioned_at else None,
+        questions=tuple(
+            {
+                "id": str(q.id),
+                "title": q.title,
+                "complexity": q.complexity,
+                "type": q.type,
+                "options": q.options,
+                "max_score": q.max_score,
+                "tags": q.tags,
+            }
+            for q in (exam.questions or [])
+        ),
+    )
+
+
+# Process-wide read caches; concurrent misses share one query (see app.singleflight)
+paper_cache = TTLCache("exam_paper", EXAM_PAPER_TTL_SECONDS)
+eligibility_cache = TTLCache("eligible_students", EXAM_PAPER_TTL_SECONDS)
+attempt_ref_cache = TTLCache("attempt_ref", EXAM_PAPER_TTL_SECONDS, max_entries=20000)
+# Result pages of submitted attempts, keyed by (page, exam_id, attempt_id, results_version)
+results_cache = TTLCache("attempt_results", EXAM_PAPER_TTL_SECONDS, max_entries=5000)
+# Exam edits broadcast here so every process drops its cached copies
+EXAM_CACHE_CHANNEL = "exam_cache"
+
+
+@dataclass(frozen=True)
+class AttemptRef:
+    """The parts of a started attempt that never change, for per-ping ownership checks."""
+
+    id: uuid.UUID
+    exam_id: uuid.UUID
+    student_id: uuid.UUID
+    deadline_at: datetime | None
+
+
+def get_attempt_ref(db: Session, attempt_id: uuid.UUID) -> AttemptRef | None:
+    """A started attempt's owner, exam and deadline, cached so heartbeats skip the database."""
+    def load() -> AttemptRef | None:
+        row = db.execute(
+            select(
+                models.ExamAttempt.id,
+                models.ExamAttempt.exam_id,
+                models.ExamAttempt.student_id,
+                models.ExamAttempt.deadline_at,
+            ).where(models.ExamAttempt.id == attempt_id, models.ExamAttempt.start_time.isnot(None))
+        ).first()
+        if row is None:
+            return None
+        deadline = as_utc(row.deadline_at) if row.deadline_at else None
+        return AttemptRef(id=row.id, exam_id=row.exam_id, student_id=row.student_id, deadline_at=deadline)
+
+    return attempt_ref_cache.get_or_load(attempt_id, load)
+
+
+def invalidate_exam_paper(exam_id: uuid.UUID | None = None) -> None:
+    """Drop a cached paper (and the available-exams list), or every paper when exam_id is None.
+
+    The entries are dropped here at once and in every other process through
+    the event bus, so no worker keeps serving (or admitting starts against) a
+    paper that was unpublished or rescheduled until its TTL runs out.
+    """
+    _drop_exam_paper(exam_id)
+    event_bus.publish(EXAM_CACHE_CHANNEL, "exam_changed", {"exam_id": str(exam_id) if exam_id else None})
+
+
+def _on_exam_changed(data: dict) -> None:
+    exam_id = uuid.UUID(data["exam_id"]) if data.get("exam_id") else None
+    _drop_exam_paper(exam_id)
+    # The plan is compiled from the same exam and questions
+    invalidate_grading_plan(exam_id)
+
+
+def _drop_exam_paper(exam_id: uuid.UUID | None) -> None:
+    if exam_id is None:
+        paper_cache.invalidate()
+        eligibility_cache.invalidate()
+        results_cache.invalidate()
+    else:
+        paper_cache.invalidate(("exam", exam_id))
+        paper_cache.invalidate(("available",))
+        eligibility_cache.invalidate(exam_id)
+        # Result pages embed the exam's title, questions and answer keys
+        results_cache.invalidate_matching(lambda key: key[1] == exam_id)
+
+
+def get_exam_paper(db: Session, exam_id: uuid.UUID) -> ExamPaper | None:
+    """Load the student-facing paper of an exam through the paper cache."""
+    def load() -> ExamPaper | None:
+        exam = (
+            db.query(models.Exam)
+            .options(joinedload(models.Exam.questions), joinedload(models.Exam.publisher))
+            .filter(models.Exam.id == exam_id)
+            .first()
+        )
+        return _exam_paper(exam) if exam else None
+
+    return paper_cache.get_or_load(("exam", exam_id), load)
+
+
+def get_available_exam_papers(db: Session) -> tuple[ExamPaper, ...]:
+    """Papers of every published exam, through the paper cache."""
+    def load() -> tuple[ExamPaper, ...]:
+        exams = (
+            db.query(models.Exam)
+            .options(joinedload(models.Exam.questions), joinedload(models.Exam.publisher))
+            .filter(models.Exam.is_published == True)
+            .all()
+        )
+        return tuple(_exam_paper(exam) for exam in exams)
+
+    return paper_cache.get_or_load(("available",), load)
+
+
+def get_eligible_student_ids(db: Session, exam) -> frozenset[uuid.UUID]:
+    """Ids of students the exam targets (all students when target_candidates is unset), cached per exam."""
+    def load() -> frozenset[uuid.UUID]:
+        query = select(models.User.id).where(models.User.role == "student")
+        if exam.target_candidates is not None:
+            query = query.where(models.User.exam_candidate == exam.target_candidates)
+        return frozenset(db.execute(query).scalars())
+
+    return eligibility_cache.get_or_load(exam.id, load)
+
+
 def create_exam_attempt(
-    db: Session, exam_id: uuid.UUID, student_id: uuid.UUID
+    db: Session, exam_id: uuid.UUID, student_id: uuid.UUID, exam: models.Exam | None = None
 ) -> models.ExamAttempt:
-    """Create a new exam attempt for a student."""
+    """Create a new exam attempt for a student with its server-side deadline."""
+    if exam is None:
+        exam = db.get(models.Exam, exam_id)
+    now = datetime.now(timezone.utc)
     attempt = models.ExamAttempt(
         exam_id=exam_id,
         student_id=student_id,
-        start_time=datetime.now(timezone.utc),  # type: ignore
+        start_time=now,  # type: ignore
+        deadline_at=attempt_deadline(now, exam.duration_minutes, exam.end_time) if exam else None,
     )
     db.add(attempt)
     db.commit()
@@ -115,13 +477,135 @@ def create_exam_attempt(
     return attempt
 
 
+def provision_exam_attempts(db: Session, exam: models.Exam, batch_size: int = PROVISION_BATCH_SIZE) -> int:
+    """Bulk-create pending attempts for every eligible student ahead of the exam start.
+
+    Eligible students match the exam's target_candidates (all students when
+    it is unset) and have no open attempt for it. Pending rows have
+    start_time NULL until the student starts. Returns the number created.
+    """
+    with_open_attempt = set(
+        db.execute(
+            select(models.ExamAttempt.student_id).where(
+                models.ExamAttempt.exam_id == exam.id, models.ExamAttempt.end_time.is_(None)
+            )
+        ).scalars()
+    )
+    student_ids = sorted(get_eligible_student_ids(db, exam) - with_open_attempt)
+
+    for i in range(0, len(student_ids), batch_size):
+        # A student may start between the SELECT and the INSERT; skip them rather than fail
+        db.execute(
+            _insert_open_attempt(db, models.ExamAttempt.__table__),
+            [
+                {"id": uuid.uuid4(), "exam_id": exam.id, "student_id": student_id, "start_time": None}
+                for student_id in student_ids[i:i + batch_size]
+            ],
+        )
+    exam.provisioned_at = datetime.now(timezone.utc)  # type: ignore
+    db.commit()
+    invalidate_exam_paper(exam.id)
+    return len(student_ids)
+
+
+def claim_pending_attempt(
+    db: Session, exam: models.Exam, student_id: uuid.UUID, now: datetime | None = None
+) -> models.ExamAttempt | None:
+    """Start a pre-provisioned attempt with one conditional UPDATE; None if the student has none."""
+    now = now or datetime.now(timezone.utc)
+    attempt = db.execute(
+        update(models.ExamAttempt)
+        .where(
+            models.ExamAttempt.exam_id == exam.id,
+            models.ExamAttempt.student_id == student_id,
+            models.ExamAttempt.start_time.is_(None),
+            models.ExamAttempt.end_time.is_(None),
+        )
+        .values(start_time=now, deadline_at=attempt_deadline(now, exam.duration_minutes, exam.end_time))
+        .returning(models.ExamAttempt)
+    ).scalars().first()
+    if attempt is not None:
+        # Keep the RETURNING values loaded; the commit would otherwise expire them
+        db.expunge(attempt)
+        db.commit()
+    return attempt
+
+
+def _insert_open_attempt(db: Session, target=models.ExamAttempt):
+    """INSERT into exam_attempts that silently skips rows conflicting with an open attempt."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = pg_insert(target)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(target)
+    else:
+        return insert(target)
+    return stmt.on_conflict_do_nothing(
+        index_elements=["exam_id", "student_id"], index_where=text("end_time IS NULL")
+    )
+
+
+def start_exam_attempt(
+    db: Session, exam: models.Exam, student_id: uuid.UUID, now: datetime | None = None
+) -> models.ExamAttempt:
+    """Start the student's attempt, or return the one already open, without creating duplicates.
+
+    Normally a single round trip: a pre-provisioned row is claimed with a
+    conditional UPDATE, otherwise a new row is inserted with ON CONFLICT DO
+    NOTHING against the unique index on open attempts. Only a conflict
+    (double click, retry) falls back to reading the existing attempt.
+    """
+    now = now or datetime.now(timezone.utc)
+    deadline = attempt_deadline(now, exam.duration_minutes, exam.end_time)
+    for _ in range(3):
+        if exam.provisioned_at is not None:
+            attempt = claim_pending_attempt(db, exam, student_id, now)
+            if attempt is not None:
+                return attempt
+
+        try:
+            attempt = db.execute(
+                _insert_open_attempt(db)
+                .values(id=uuid.uuid4(), exam_id=exam.id, student_id=student_id, start_time=now, deadline_at=deadline)
+                .returning(models.ExamAttempt)
+            ).scalars().first()
+        except IntegrityError:  # dialects without ON CONFLICT support
+            db.rollback()
+            attempt = None
+        if attempt is not None:
+            db.expunge(attempt)
+            db.commit()
+            return attempt
+
+        attempt = claim_pending_attempt(db, exam, student_id, now)
+        if attempt is None:
+            attempt = (
+                db.query(models.ExamAttempt)
+                .filter(
+                    models.ExamAttempt.exam_id == exam.id,
+                    models.ExamAttempt.student_id == student_id,
+                    models.ExamAttempt.end_time.is_(None),
+                )
+                .first()
+            )
+        if attempt is not None:
+            ensure_attempt_deadline(db, attempt)
+            return attempt
+        # The conflicting attempt was submitted in the meantime; try again
+    raise ValueError("Could not start exam attempt")
+
+
 def save_answer(
     db: Session,
     attempt_id: uuid.UUID,
     student_id: uuid.UUID,
     answer_in: schemas.AnswerCreate,
-) -> models.Answer:
-    """Save or update a student's answer with security verification."""
+) -> models.Answer | None:
+    """Save or update a student's answer with security verification.
+
+    Returns None when the write is stale: the stored answer came from a write
+    with the same or a later ``client_seq``.
+    """
     # Verify the attempt belongs to the student
     attempt = (
         db.query(models.ExamAttempt)
@@ -133,94 +617,147 @@ def save_answer(
     )
     if not attempt:
         raise ValueError("Attempt not found or does not belong to student")
-
-    # Check if answer already exists
-    existing_answer = (
-        db.query(models.Answer)
-        .filter(
-            models.Answer.attempt_id == attempt_id,
-            models.Answer.question_id == answer_in.question_id,
-        )
-        .first()
-    )
-
-    if existing_answer:
-        # Update existing answer
-        existing_answer.answer_data = answer_in.answer_data
-        db.commit()
-        db.refresh(existing_answer)
-        return existing_answer
-    else:
-        # Create new answer
-        new_answer = models.Answer(
+    if attempt.start_time is None:
+        raise ValueError("Exam not started")
+    if attempt.end_time is not None:
+        raise ValueError("Exam already submitted")
+    if is_past_deadline(attempt, grace_seconds=DEADLINE_GRACE_SECONDS):
+        raise ValueError("Exam time is over")
+
+    exam_id = attempt.exam_id
+    stored = db.execute(
+        answer_upsert(db, models.Answer)
+        .values(
             attempt_id=attempt_id,
             question_id=answer_in.question_id,
             answer_data=answer_in.answer_data,
+            client_seq=answer_in.client_seq or next_answer_seq(attempt_id),
         )
-        db.add(new_answer)
-        db.commit()
-        db.refresh(new_answer)
-        return new_answer
+        .returning(models.Answer),
+        execution_options={"populate_existing": True},
+    ).scalars().first()
+    db.commit()
+    if stored is None:
+        # A write with the same or a later sequence number is already stored
+        metrics.incr("answers.stale_writes")
+        return None
+    live_exams.record_answers(exam_id, attempt_id)
+    return stored
+
+
+def answer_upsert(db: Session, target=models.Answer.__table__):
+    """INSERT into answers that updates the existing row unless it holds a later client write."""
+    table = models.Answer.__table__
+    insert_ = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert_(target)
+    return stmt.on_conflict_do_update(
+        index_elements=["attempt_id", "question_id"],
+        set_={"answer_data": stmt.excluded.answer_data, "client_seq": stmt.excluded.client_seq},
+        where=table.c.client_seq < stmt.excluded.client_seq,
+    )
+
+
+def next_answer_seq(attempt_id: uuid.UUID):
+    """Sequence number for a write the client did not number: one past the attempt's latest.
+
+    Computed inside the upsert, so the write always applies (last write wins,
+    as before clients numbered saves) and is still returned by since_seq deltas.
+    """
+    return (
+        select(func.coalesce(func.max(models.Answer.client_seq), 0) + 1)
+        .where(models.Answer.attempt_id == attempt_id)
+        .scalar_subquery()
+    )
+
+
+def get_answers(db: Session, attempt_id: uuid.UUID, since_seq: int | None = None) -> list[models.Answer]:
+    """The attempt's answers, or only those stored by writes numbered after ``since_seq``."""
+    query = db.query(models.Answer).filter(models.Answer.attempt_id == attempt_id)
+    if since_seq is not None:
+        query = query.filter(models.Answer.client_seq > since_seq)
+    return query.all()
 
 
 def calculate_and_save_score(db: Session, attempt: models.ExamAttempt) -> models.ExamAttempt:
     """Auto-grade an exam attempt, compute total possible score, and save results."""
-    # Get the exam with questions
-    exam = db.query(models.Exam).filter(models.Exam.id == attempt.exam_id).first()
-    if not exam:
+    plan = get_grading_plan(db, attempt.exam_id)
+    if plan is None:
         raise ValueError("Exam not found")
 
-    # Get all answers for this attempt
-    answers = (
-        db.query(models.Answer).filter(models.Answer.attempt_id == attempt.id).all()
+    # One query for this attempt's answers; the answer key comes from the cached plan
+    answer_map = dict(
+        db.query(models.Answer.question_id, models.Answer.answer_data)
+        .filter(models.Answer.attempt_id == attempt.id)
+        .all()
     )
-    answer_map = {ans.question_id: ans.answer_data for ans in answers}
 
-    # Calculate scores
-    total_score = 0.0
-    total_possible = 0.0
-    for question in exam.questions:
-        # Sum total possible across all questions
-        try:
-            total_possible += float(question.max_score or 0)
-        except Exception:
-            total_possible += 0.0
-
-        # Auto-grade for supported types
-        if question.type in ("single_choice", "multi_choice"):
-            student_answer = answer_map.get(question.id)
-            if student_answer is not None:
-                correct = question.correct_answers
-                if isinstance(correct, list):
-                    correct_norm = sorted([str(c) for c in correct])
-                else:
-                    correct_norm = [str(correct)]
-
-                if isinstance(student_answer, list):
-                    student_norm = sorted([str(s) for s in student_answer])
-                else:
-                    student_norm = [str(student_answer)]
-
-                if correct_norm == student_norm:
-                    total_score += float(question.max_score or 0)
-
-    # Update attempt with score, total possible, and end time
-    attempt.score = float(total_score)  # type: ignore
-    attempt.total_possible_score = float(total_possible)  # type: ignore
-    attempt.end_time = datetime.now(timezone.utc)  # type: ignore
+    # Update attempt with score, total possible, and end time (late submits end at the deadline)
+    now = datetime.now(timezone.utc)
+    attempt.score = plan.score(answer_map)  # type: ignore
+    attempt.total_possible_score = plan.total_possible  # type: ignore
+    attempt.end_time = min(now, as_utc(attempt.deadline_at)) if attempt.deadline_at else now  # type: ignore
+    db.flush()
+    refresh_final_scores(db, models.ExamAttempt.id == attempt.id, [attempt.exam_id])
     db.commit()
     # Refresh the object to ensure it has the committed values
     db.refresh(attempt)
     return attempt
 
 
+def claim_submission(
+    db: Session, attempt_id: uuid.UUID, student_id: uuid.UUID, now: datetime | None = None
+) -> Row | None:
+    """Atomically close a started, open attempt and return its row; None if it cannot be submitted.
+
+    A single UPDATE ... WHERE end_time IS NULL RETURNING, so when a manual
+    submit races the timer's auto-submit exactly one of them wins and goes
+    on to grading. end_time is capped at the attempt's deadline.
+    """
+    now = now or datetime.now(timezone.utc)
+    table = models.ExamAttempt.__table__
+    row = db.execute(
+        update(table)
+        .where(
+            table.c.id == attempt_id,
+            table.c.student_id == student_id,
+            table.c.end_time.is_(None),
+            table.c.start_time.isnot(None),
+        )
+        .values(end_time=case((and_(table.c.deadline_at.isnot(None), table.c.deadline_at < now), table.c.deadline_at), else_=now))
+        .returning(*table.c)
+    ).first()
+    db.commit()
+    return row
+
+
+def submit_attempt(db: Session, attempt: models.ExamAttempt) -> models.ExamAttempt:
+    """Close an attempt without grading it; the grading queue fills in the score."""
+    if claim_submission(db, attempt.id, attempt.student_id) is None:
+        raise ValueError("Exam already submitted")
+    db.refresh(attempt)
+    return attempt
+
+
+def attempt_state(attempt: models.ExamAttempt) -> str:
+    """in_progress until submitted, grading until a score is stored, then graded."""
+    if attempt.end_time is None:
+        return "in_progress"
+    if attempt.score is None:
+        return "grading"
+    return "graded"
+
+
 def create_or_update_evaluation(
     db: Session,
     answer_id: uuid.UUID,
     evaluator_id: uuid.UUID,
     eval_data: schemas.EvaluationCreate,
 ) -> models.Evaluation:
-    """Create or update an evaluation for a student answer."""
+    """Create or update an evaluation for a student answer.
+
+    The attempt's final score and cached result pages are brought up to date
+    as part of the write (see ``evaluations_changed``).
+    """
     # Check if evaluation exists
     existing = (
         db.query(models.Evaluation)
@@ -237,12 +774,10 @@ def create_or_update_evaluation(
         if eval_data.score_awarded is not None:
             existing.score_awarded = eval_data.score_awarded
         existing.updated_at = datetime.now(timezone.utc)  # type: ignore
-        db.commit()
-        db.refresh(existing)
-        return existing
+        evaluation = existing
     else:
         # Create new evaluation
-        new_eval = models.Evaluation(
+        evaluation = models.Evaluation(
             answer_id=answer_id,
             evaluated_by=evaluator_id,
             is_correct=eval_data.is_correct,
@@ -251,10 +786,29 @@ def create_or_update_evaluation(
             created_at=datetime.now(timezone.utc),  # type: ignore
             updated_at=datetime.now(timezone.utc),  # type: ignore
         )
-        db.add(new_eval)
-        db.commit()
-        db.refresh(new_eval)
-        return new_eval
+        db.add(evaluation)
+    db.commit()
+    attempt_id = db.execute(select(models.Answer.attempt_id).where(models.Answer.id == answer_id)).scalar()
+    if attempt_id is not None:
+        evaluations_changed(db, attempt_id)
+    db.refresh(evaluation)
+    return evaluation
+
+
+def evaluations_changed(db: Session, attempt_id: uuid.UUID) -> None:
+    """Bring an attempt's final score and cached result pages up to date after its evaluations were written."""
+    exam_id = db.execute(select(models.ExamAttempt.exam_id).where(models.ExamAttempt.id == attempt_id)).scalar()
+    if exam_id is None:
+        return
+    refresh_final_scores(db, models.ExamAttempt.id == attempt_id, [exam_id])
+    db.commit()
+    # The version bump already retires cached pages everywhere; free this process's copies now
+    results_cache.invalidate_matching(lambda key: key[2] == attempt_id)
+
+
+def get_attempt_results(attempt: models.ExamAttempt, page: str, load: Callable[[], dict]) -> dict:
+    """A result page of a submitted attempt, rebuilt with ``load`` only when its results_version changes."""
+    return results_cache.get_or_load((page, attempt.exam_id, attempt.id, attempt.results_version), load)
 
 
 def get_evaluation_by_answer(db: Session, answer_id: uuid.UUID) -> models.Evaluation | None:
@@ -264,3 +818,87 @@ def get_evaluation_by_answer(db: Session, answer_id: uuid.UUID) -> models.Evalua
         .filter(models.Evaluation.answer_id == answer_id)
         .first()
     )
+
+
+def encode_attempt_cursor(row: Row, finished: bool) -> str:
+    """Encode the keyset position of an attempt-history row as an opaque cursor."""
+    position = row.end_time if finished else row.start_time
+    raw = json.dumps([as_utc(position).isoformat(), str(row.id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_attempt_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Decode a cursor produced by ``encode_attempt_cursor``; raises ValueError if malformed."""
+    try:
+        position, attempt_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return as_utc(datetime.fromisoformat(position)), uuid.UUID(str(attempt_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def get_student_attempts(
+    db: Session,
+    student_id: uuid.UUID,
+    finished: bool,
+    limit: int | None = None,
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[Row]:
+    """The student's started attempts with their exam's header columns, in one query.
+
+    Completed attempts are ordered newest first by (end_time, id), unfinished
+    ones by (start_time, id); ``cursor`` continues after a row of a previous
+    page and ``since``/``until`` bound the same timestamp. Rows carry the
+    attempt columns plus ``exam_title``, ``exam_start_time``,
+    ``exam_end_time``, ``duration_minutes``, ``is_published`` and
+    ``target_candidates``; no question data is loaded.
+    """
+    attempt, exam = models.ExamAttempt, models.Exam
+    position = attempt.end_time if finished else attempt.start_time
+    query = (
+        select(
+            attempt.id,
+            attempt.exam_id,
+            attempt.student_id,
+            attempt.start_time,
+            attempt.end_time,
+            attempt.score,
+            attempt.total_possible_score,
+            attempt.final_score,
+            exam.title.label("exam_title"),
+            exam.start_time.label("exam_start_time"),
+            exam.end_time.label("exam_end_time"),
+            exam.duration_minutes,
+            exam.is_published,
+            exam.target_candidates,
+        )
+        .join(exam, exam.id == attempt.exam_id)
+        .where(
+            attempt.student_id == student_id,
+            attempt.start_time.isnot(None),
+            attempt.end_time.isnot(None) if finished else attempt.end_time.is_(None),
+        )
+    )
+    # Stored timestamps are UTC; SQLite compares them as text, so bounds must be UTC too
+    if since is not None:
+        query = query.where(position >= as_utc(since).astimezone(timezone.utc))
+    if until is not None:
+        query = query.where(position < as_utc(until).astimezone(timezone.utc))
+    if cursor:
+        after, attempt_id = decode_attempt_cursor(cursor)
+        query = query.where(or_(position < after, and_(position == after, attempt.id < attempt_id)))
+    query = query.order_by(position.desc(), attempt.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return db.execute(query).all()
+
+
+def final_score(row: Row) -> float:
+    """Stored final score of a graded attempt row; computed from the auto score until backfilled."""
+    if row.final_score is not None:
+        return row.final_score
+    return min(row.score or 0, row.total_possible_score or 0)
+
+
+event_bus.add_listener(EXAM_CACHE_CHANNEL, _on_exam_changed)
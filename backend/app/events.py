@@ -0,0 +1,285 @@
+"""In-process publish/subscribe for pushing exam events to connected clients.
+
+Publishers (request handlers, grading workers, jobs) call
+``event_bus.publish(channel, type, data)`` after their change is committed.
+Subscribers are server-sent event streams, each waiting on an asyncio queue
+for the channels it listens to.
+
+Events travel through a transport so every API process sees them: the local
+transport delivers within this process only, the Postgres transport sends
+each event with NOTIFY and delivers what a LISTEN connection receives, so
+subscribers on any worker get events published on any other. The transport
+is chosen with EVENT_TRANSPORT (``local`` or ``postgres``); by default
+Postgres is used whenever the database is.
+"""
+import asyncio
+import itertools
+import json
+import os
+import select
+import threading
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .metrics import metrics
+
+# Slow subscribers lose events beyond this many; they are told to resync
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+PG_NOTIFY_CHANNEL = "exam_events"
+
+STUDENTS_CHANNEL = "students"
+ADMIN_CHANNEL = "admin"
+
+
+def student_channel(student_id: uuid.UUID | str) -> str:
+    return f"student:{student_id}"
+
+
+@dataclass
+class Event:
+    channel: str
+    type: str
+    data: dict
+    id: int = 0
+
+    def encode(self) -> str:
+        return json.dumps({"channel": self.channel, "type": self.type, "data": self.data}, default=str)
+
+    @classmethod
+    def decode(cls, raw: str) -> "Event":
+        payload = json.loads(raw)
+        return cls(channel=payload["channel"], type=payload["type"], data=payload["data"])
+
+
+@dataclass(eq=False)
+class Subscription:
+    channels: frozenset[str]
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=EVENT_QUEUE_SIZE))
+    dropped: int = 0
+
+    def _put(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            metrics.incr("events.dropped")
+
+    def deliver(self, event: Event) -> None:
+        """Hand an event to the subscriber's loop; safe to call from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's loop has shut down; it unsubscribes as its stream ends
+            pass
+
+    async def get(self, timeout: float | None = None) -> Event | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalTransport:
+    """Delivers events to subscribers of this process only."""
+
+    def __init__(self) -> None:
+        self._on_message: Callable[[str], None] | None = None
+
+    def start(self, on_message: Callable[[str], None]) -> None:
+        self._on_message = on_message
+
+    def stop(self) -> None:
+        pass
+
+    def send(self, message: str) -> None:
+        if self._on_message is not None:
+            self._on_message(message)
+
+
+class PostgresTransport:
+    """Cross-process delivery with Postgres NOTIFY/LISTEN.
+
+    One connection per process LISTENs in a background thread; publishing
+    issues ``pg_notify`` on a second connection. Payloads must stay under
+    Postgres' 8000 byte limit, so events carry ids rather than documents.
+    """
+
+    def __init__(self, dsn: str, channel: str = PG_NOTIFY_CHANNEL) -> None:
+        self._dsn = dsn
+        self._channel = channel
+        self._on_message: Callable[[str], None] | None = None
+        self._send_conn = None
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self._dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def start(self, on_message: Callable[[str], None]) -> None:
+        self._on_message = on_message
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="event-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5.0)
+            self._thread = None
+        with self._send_lock:
+            if self._send_conn is not None:
+                self._send_conn.close()
+                self._send_conn = None
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = self._connect()
+                try:
+                    conn.cursor().execute(f"LISTEN {self._channel}")
+                    while not self._stop.is_set():
+                        if select.select([conn], [], [], 1.0)[0]:
+                            conn.poll()
+                            while conn.notifies:
+                                self._on_message(conn.notifies.pop(0).payload)
+                finally:
+                    conn.close()
+            except Exception:
+                metrics.incr("events.listener_failures")
+                traceback.print_exc()
+                self._stop.wait(1.0)
+
+    def send(self, message: str) -> None:
+        with self._send_lock:
+            for retry in (False, True):
+                try:
+                    if self._send_conn is None or self._send_conn.closed:
+                        self._send_conn = self._connect()
+                    self._send_conn.cursor().execute("SELECT pg_notify(%s, %s)", (self._channel, message))
+                    return
+                except Exception:
+                    self._send_conn = None
+                    if retry:
+                        raise
+
+
+def transport_from_env() -> LocalTransport | PostgresTransport:
+    database_url = os.getenv("DATABASE_URL", "")
+    is_postgres = database_url.startswith("postgres")
+    kind = os.getenv("EVENT_TRANSPORT", "postgres" if is_postgres else "local")
+    if kind == "postgres":
+        # psycopg2 takes the plain libpq URL, without SQLAlchemy's driver suffix
+        return PostgresTransport(database_url.replace("+psycopg2", "", 1))
+    return LocalTransport()
+
+
+class EventBus:
+    """Fans published events out to the subscriptions of matching channels."""
+
+    def __init__(self, transport: LocalTransport | PostgresTransport | None = None) -> None:
+        self._transport = transport or LocalTransport()
+        self._lock = threading.Lock()
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._listeners: dict[str, list[Callable[[dict], None]]] = {}
+        self._ids = itertools.count(1)
+        self._started = False
+
+    def start(self) -> None:
+        self._transport.start(self._dispatch)
+        self._started = True
+
+    def stop(self) -> None:
+        self._transport.stop()
+        self._started = False
+
+    def subscribe(self, channels: set[str]) -> Subscription:
+        """Subscribe the running event loop to ``channels``."""
+        subscription = Subscription(channels=frozenset(channels), loop=asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+            metrics.set_gauge("events.subscribers", self._count())
+        return subscription
+
+    def add_listener(self, channel: str, callback: Callable[[dict], None]) -> None:
+        """Call ``callback(data)`` synchronously for every event on ``channel`` (state kept by this process)."""
+        with self._lock:
+            self._listeners.setdefault(channel, []).append(callback)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+            metrics.set_gauge("events.subscribers", self._count())
+
+    def _count(self) -> int:
+        return len({sub for subs in self._subscriptions.values() for sub in subs})
+
+    def publish(self, channel: str, event_type: str, data: dict[str, Any]) -> None:
+        """Publish an event; failures are logged and never reach the caller."""
+        metrics.incr("events.published")
+        message = Event(channel=channel, type=event_type, data=data).encode()
+        try:
+            if self._started:
+                self._transport.send(message)
+            else:
+                # Not started (tests, scripts): deliver within this process
+                self._dispatch(message)
+        except Exception:
+            metrics.incr("events.publish_failures")
+            traceback.print_exc()
+
+    def _dispatch(self, message: str) -> None:
+        event = Event.decode(message)
+        event.id = next(self._ids)
+        with self._lock:
+            subscribers = list(self._subscriptions.get(event.channel, ()))
+            listeners = list(self._listeners.get(event.channel, ()))
+        for listener in listeners:
+            try:
+                listener(event.data)
+            except Exception:
+                metrics.incr("events.listener_failures")
+                traceback.print_exc()
+        for subscription in subscribers:
+            subscription.deliver(event)
+        metrics.incr("events.delivered", len(subscribers))
+
+
+event_bus = EventBus(transport_from_env())
+
+
+def format_sse(event: Event) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, default=str)}\n\n"
+
+
+async def stream_events(subscription: Subscription, is_disconnected: Callable, heartbeat_seconds: float = 15.0):
+    """Server-sent event stream for a subscription; a comment line keeps idle proxies from closing it."""
+    try:
+        yield "retry: 3000\n\n"
+        while not await is_disconnected():
+            event = await subscription.get(timeout=heartbeat_seconds)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+            if subscription.dropped:
+                subscription.dropped = 0
+                yield format_sse(Event(channel="", type="resync", data={}, id=event.id))
+    finally:
+        event_bus.unsubscribe(subscription)
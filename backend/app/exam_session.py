@@ -0,0 +1,265 @@
+"""Exam session over a WebSocket: answer streaming and server-owned time.
+
+The client authenticates with its first frame, carrying the usual access
+token (never in the URL, which ends up in proxy and access logs), and then
+exchanges small JSON frames:
+
+    client -> {"type": "auth", "token": "..."}   first frame, within AUTH_TIMEOUT_SECONDS
+    client -> {"type": "answer", "seq": 7, "question_id": "...", "answer_data": ...}
+    server -> {"type": "ack", "seq": 7}  or  {"type": "error", "seq": 7, "detail": "..."}
+    client -> {"type": "sync"}           server -> {"type": "time", ...}
+    client -> {"type": "heartbeat"}      server -> {"type": "heartbeat", ...}
+    server -> {"type": "session", ...}   on connect, with the deadline
+    server -> {"type": "auto_submitted"} when the deadline passes; the socket then closes
+
+Every frame counts as a heartbeat for the attempt's last_seen_at.
+``seq`` is chosen by the client and increases with every change in the
+attempt (HTTP saves share the numbering). It is stored as the answer's
+``client_seq``, so a replayed or reordered frame never overwrites a later
+answer; such a frame is still acked. An ack means the answer is stored: answers go to the batched ``AnswerWriter`` and
+are acknowledged once their batch is committed. Every database use opens
+its own short-lived session, so an idle socket holds no pooled connection.
+"""
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from typing import Callable
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from . import crud, models, notifications, security
+from .answer_writer import AnswerWrite, AnswerWriter, answer_writer, persist_answers
+from .database import SessionLocal
+from .grading_queue import grading_queue
+from .heartbeats import heartbeat_store
+from .live import live_exams
+from .metrics import metrics
+
+# Answers already sent when the deadline passes get this long to be stored before the attempt closes
+DRAIN_TIMEOUT_SECONDS = 2.0
+# A connected socket must send its auth frame within this long
+AUTH_TIMEOUT_SECONDS = 10.0
+
+
+class SessionRejected(Exception):
+    def __init__(self, code: int, reason: str) -> None:
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+def open_session(db: Session, attempt_id: uuid.UUID, token: str) -> tuple[models.ExamAttempt, datetime, set[str]]:
+    """Authenticate the token and load the open attempt, its deadline and its question ids."""
+    try:
+        user = security.get_user_from_token(db, token)
+        if user is None:
+            raise SessionRejected(4401, "Could not validate credentials")
+        if user.role != "student":
+            raise SessionRejected(4403, "Student privileges required")
+        attempt = (
+            db.query(models.ExamAttempt)
+            .filter(models.ExamAttempt.id == attempt_id, models.ExamAttempt.student_id == user.id)
+            .first()
+        )
+        if attempt is None:
+            raise SessionRejected(4404, "Attempt not found or does not belong to you")
+        if attempt.start_time is None:
+            raise SessionRejected(4409, "Exam not started")
+        if attempt.end_time is not None:
+            raise SessionRejected(4409, "Exam already submitted")
+        deadline = crud.get_attempt_deadline(db, attempt)
+        paper = crud.get_exam_paper(db, attempt.exam_id)
+        question_ids = {q["id"] for q in paper.questions} if paper else set()
+        db.expunge(attempt)
+        return attempt, deadline, question_ids
+    finally:
+        db.close()
+
+
+def auto_submit(db: Session, attempt: models.ExamAttempt) -> bool:
+    """Close the attempt at its deadline and queue it for grading; False if it was already submitted."""
+    try:
+        row = crud.claim_submission(db, attempt.id, attempt.student_id)
+        if row is None:
+            return False
+        notifications.attempts_submitted([row], auto=True)
+        grading_queue.submit(db, attempt.id)
+        return True
+    finally:
+        db.close()
+
+
+def persist_inline(db: Session, writes: list[AnswerWrite]) -> list[str | None]:
+    try:
+        return persist_answers(db, writes)
+    finally:
+        db.close()
+
+
+class ExamSession:
+    """One connected student working on one attempt."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_factory: Callable[[], Session],
+        attempt: models.ExamAttempt,
+        deadline: datetime,
+        question_ids: set[str],
+        writer: AnswerWriter | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self.session_factory = session_factory
+        self.attempt = attempt
+        self.deadline = deadline
+        self.question_ids = question_ids
+        self.writer = writer or answer_writer
+        self.outbox: asyncio.Queue[dict] = asyncio.Queue()
+        self.unacked: set[int] = set()
+        self.drained = asyncio.Event()
+        self.drained.set()
+        self.loop = asyncio.get_running_loop()
+
+    def time_message(self, kind: str) -> dict:
+        now = datetime.now(timezone.utc)
+        return {
+            "type": kind,
+            "attempt_id": str(self.attempt.id),
+            "server_time": now.isoformat(),
+            "deadline_at": self.deadline.isoformat(),
+            "seconds_remaining": max(0, int((self.deadline - now).total_seconds())),
+        }
+
+    def acknowledge(self, seq: int, error: str | None) -> None:
+        self.unacked.discard(seq)
+        if not self.unacked:
+            self.drained.set()
+        if error:
+            self.outbox.put_nowait({"type": "error", "seq": seq, "detail": error})
+        else:
+            metrics.incr("ws.answers_acked")
+            live_exams.record_answers(self.attempt.exam_id, self.attempt.id)
+            self.outbox.put_nowait({"type": "ack", "seq": seq})
+
+    def acknowledge_threadsafe(self, seq: int, error: str | None) -> None:
+        self.loop.call_soon_threadsafe(self.acknowledge, seq, error)
+
+    async def handle_answer(self, message: dict) -> None:
+        seq = message.get("seq")
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+            self.outbox.put_nowait({"type": "error", "seq": None, "detail": "seq must be a positive integer"})
+            return
+        question_id = message.get("question_id")
+        if question_id not in self.question_ids:
+            self.outbox.put_nowait({"type": "error", "seq": seq, "detail": "Question is not part of this exam"})
+            return
+        if datetime.now(timezone.utc) > self.deadline + timedelta(seconds=crud.DEADLINE_GRACE_SECONDS):
+            self.outbox.put_nowait({"type": "error", "seq": seq, "detail": "Exam time is over"})
+            return
+
+        metrics.incr("ws.answers_received")
+        self.unacked.add(seq)
+        self.drained.clear()
+        write = AnswerWrite(
+            attempt_id=self.attempt.id,
+            question_id=uuid.UUID(question_id),
+            answer_data=message.get("answer_data"),
+            seq=seq,
+            on_done=self.acknowledge_threadsafe,
+        )
+        if not self.writer.submit(write):
+            [error] = await run_in_threadpool(persist_inline, self.session_factory(), [write])
+            self.acknowledge(seq, error)
+
+    async def receive(self) -> None:
+        while True:
+            try:
+                message = json.loads(await self.websocket.receive_text())
+            except WebSocketDisconnect:
+                return
+            except json.JSONDecodeError:
+                self.outbox.put_nowait({"type": "error", "seq": None, "detail": "Invalid JSON"})
+                continue
+            kind = message.get("type") if isinstance(message, dict) else None
+            live_exams.record_activity(self.attempt.exam_id, self.attempt.id)
+            heartbeat_store.beat(self.attempt.id)
+            if kind == "answer":
+                await self.handle_answer(message)
+            elif kind == "sync":
+                self.outbox.put_nowait(self.time_message("time"))
+            elif kind == "heartbeat":
+                self.outbox.put_nowait(self.time_message("heartbeat"))
+            elif kind == "ping":
+                self.outbox.put_nowait({"type": "pong"})
+            else:
+                seq = message.get("seq") if isinstance(message, dict) else None
+                self.outbox.put_nowait({"type": "error", "seq": seq, "detail": "Unknown message type"})
+
+    async def send(self) -> None:
+        """Deliver queued frames; a None frame ends the session."""
+        while (message := await self.outbox.get()) is not None:
+            await self.websocket.send_json(message)
+        await self.websocket.close(code=1000)
+
+    async def expire(self) -> None:
+        """Auto-submit the attempt when its deadline passes."""
+        delay = (self.deadline - datetime.now(timezone.utc)).total_seconds()
+        await asyncio.sleep(max(0.0, delay))
+        try:
+            await asyncio.wait_for(self.drained.wait(), DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        submitted = await run_in_threadpool(auto_submit, self.session_factory(), self.attempt)
+        if submitted:
+            metrics.incr("ws.auto_submitted")
+        message = self.time_message("auto_submitted")
+        message["already_submitted"] = not submitted
+        self.outbox.put_nowait(message)
+        self.outbox.put_nowait(None)
+
+    async def run(self) -> None:
+        self.outbox.put_nowait(self.time_message("session"))
+        sender = asyncio.create_task(self.send())
+        receiver = asyncio.create_task(self.receive())
+        timer = asyncio.create_task(self.expire())
+        try:
+            await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (sender, receiver, timer):
+                task.cancel()
+
+
+async def receive_token(websocket: WebSocket) -> str:
+    """Token from the client's first frame; SessionRejected when it is missing or late."""
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), AUTH_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+        raise SessionRejected(4401, "Could not validate credentials")
+    token = message.get("token") if isinstance(message, dict) and message.get("type") == "auth" else None
+    if not isinstance(token, str) or not token:
+        raise SessionRejected(4401, "Could not validate credentials")
+    return token
+
+
+async def serve_exam_session(
+    websocket: WebSocket, attempt_id: uuid.UUID, session_factory: Callable[[], Session] | None = None
+) -> None:
+    session_factory = session_factory or SessionLocal
+    await websocket.accept()
+    try:
+        token = await receive_token(websocket)
+        attempt, deadline, question_ids = await run_in_threadpool(
+            open_session, session_factory(), attempt_id, token
+        )
+    except SessionRejected as e:
+        await websocket.close(code=e.code, reason=e.reason)
+        return
+    metrics.incr("ws.connections")
+    try:
+        await ExamSession(websocket, session_factory, attempt, deadline, question_ids).run()
+    finally:
+        metrics.incr("ws.disconnections")
@@ -0,0 +1,158 @@
+"""In-process facet index over question type, complexity and tags.
+
+Every question gets a compact integer slot; each facet value keeps a posting
+list stored as a Python int bitset, so combined filters are bitwise ANDs and
+facet counts are popcounts.
+"""
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Other workers may have imported or deleted questions; rebuild after this long
+FACET_INDEX_TTL_SECONDS = float(os.getenv("FACET_INDEX_TTL_SECONDS", "300"))
+
+FACETS = ("type", "complexity", "tags")
+
+
+def _iter_bits(bits: int):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class FacetIndex:
+    """Bitset posting lists keyed by (facet, value)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._clear()
+        self._built_at: float | None = None
+
+    def _clear(self) -> None:
+        self._ids: list[uuid.UUID | None] = []
+        self._slots: dict[uuid.UUID, int] = {}
+        self._live = 0
+        self._postings: dict[str, dict[str, int]] = {facet: {} for facet in FACETS}
+
+    @staticmethod
+    def _values(question_type, complexity, tags) -> dict[str, list[str]]:
+        return {
+            "type": [question_type] if question_type else [],
+            "complexity": [str(complexity).lower()] if complexity else [],
+            "tags": sorted({str(t).lower() for t in (tags or [])}),
+        }
+
+    def _insert(self, question_id: uuid.UUID, question_type, complexity, tags) -> None:
+        if question_id in self._slots:
+            self._discard(question_id)
+        slot = len(self._ids)
+        self._ids.append(question_id)
+        self._slots[question_id] = slot
+        bit = 1 << slot
+        self._live |= bit
+        for facet, values in self._values(question_type, complexity, tags).items():
+            postings = self._postings[facet]
+            for value in values:
+                postings[value] = postings.get(value, 0) | bit
+
+    def _discard(self, question_id: uuid.UUID) -> None:
+        slot = self._slots.pop(question_id, None)
+        if slot is None:
+            return
+        self._ids[slot] = None
+        mask = ~(1 << slot)
+        self._live &= mask
+        for postings in self._postings.values():
+            for value in list(postings):
+                postings[value] &= mask
+                if not postings[value]:
+                    del postings[value]
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > FACET_INDEX_TTL_SECONDS
+
+    def rebuild(self, db: Session) -> None:
+        """Reload every question's facet values from the database."""
+        rows = db.query(
+            models.Question.id,
+            models.Question.type,
+            models.Question.complexity,
+            models.Question.tags,
+        ).all()
+        with self._lock:
+            self._clear()
+            for row in rows:
+                self._insert(row.id, row.type, row.complexity, row.tags)
+            self._built_at = time.monotonic()
+
+    def ensure_built(self, db: Session) -> None:
+        """Rebuild if the index was never built or has outlived its TTL."""
+        if self.is_stale:
+            self.rebuild(db)
+
+    def add(self, question: models.Question) -> None:
+        """Index a newly created question; a no-op until the first rebuild."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._insert(question.id, question.type, question.complexity, question.tags)
+
+    def remove(self, question_ids) -> None:
+        """Drop questions from the index without a full rebuild."""
+        with self._lock:
+            for question_id in question_ids:
+                self._discard(question_id)
+
+    def invalidate(self) -> None:
+        """Force the next ensure_built() to reload from the database."""
+        with self._lock:
+            self._built_at = None
+
+    def _match(self, question_type=None, complexity=None, tags=None, skip: str | None = None) -> int:
+        bits = self._live
+        if question_type and skip != "type":
+            bits &= self._postings["type"].get(question_type, 0)
+        if complexity and skip != "complexity":
+            bits &= self._postings["complexity"].get(complexity.lower(), 0)
+        if tags and skip != "tags":
+            for tag in tags:
+                bits &= self._postings["tags"].get(tag.lower(), 0)
+        return bits
+
+    def query(self, question_type=None, complexity=None, tags=None) -> list[uuid.UUID]:
+        """Return ids of questions matching every given filter (tags are ANDed)."""
+        with self._lock:
+            bits = self._match(question_type, complexity, tags)
+            return [self._ids[slot] for slot in _iter_bits(bits)]
+
+    def count(self, question_type=None, complexity=None, tags=None) -> int:
+        with self._lock:
+            return self._match(question_type, complexity, tags).bit_count()
+
+    def facet_counts(self, question_type=None, complexity=None, tags=None) -> dict[str, dict[str, int]]:
+        """Counts per facet value under the other active filters.
+
+        Type and complexity counts ignore their own filter so the UI can show
+        alternatives; tag counts are narrowed by the selected tags.
+        """
+        with self._lock:
+            result = {}
+            for facet in FACETS:
+                base = self._match(question_type, complexity, tags, skip=None if facet == "tags" else facet)
+                result[facet] = {
+                    value: n
+                    for value, bits in sorted(self._postings[facet].items())
+                    if (n := (bits & base).bit_count())
+                }
+            return result
+
+
+# Process-wide index used by the admin routes and crud hooks
+facet_index = FacetIndex()
@@ -0,0 +1,447 @@
+"""Compiled per-exam grading plans.
+
+A plan holds, for every question on an exam, its normalized answer key
+(a frozenset of strings), max score and grading dispatch. Plans are cached per
+process so a submit storm against one paper compiles the key only once.
+"""
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+import numpy as np
+from sqlalchemy import and_, bindparam, case, func, select, update
+from sqlalchemy.orm import Session
+
+from . import models, notifications
+
+# Questions can be deleted from another worker; recompile plans after this long
+GRADING_PLAN_TTL_SECONDS = float(os.getenv("GRADING_PLAN_TTL_SECONDS", "600"))
+
+# Question types scored automatically; everything else is graded by a teacher
+AUTO_GRADED_TYPES = frozenset({"single_choice", "multi_choice"})
+
+
+def as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes (SQLite drops tzinfo) as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def normalize_answer(value: Any) -> frozenset[str]:
+    """Normalize a stored answer or answer key to a set of strings."""
+    if isinstance(value, list):
+        return frozenset(str(v) for v in value)
+    return frozenset((str(value),))
+
+
+@dataclass(frozen=True)
+class QuestionKey:
+    question_id: uuid.UUID
+    type: str
+    max_score: float
+    answer_key: frozenset[str] | None  # None for manually graded questions
+
+    @property
+    def auto_graded(self) -> bool:
+        return self.answer_key is not None
+
+
+@dataclass(frozen=True)
+class GradingPlan:
+    exam_id: uuid.UUID
+    questions: tuple[QuestionKey, ...]
+    total_possible: float
+
+    def score(self, answers: dict[uuid.UUID, Any]) -> float:
+        """Score a mapping of question id -> answer_data against the plan."""
+        total = 0.0
+        for key in self.questions:
+            if key.answer_key is None:
+                continue
+            answer = answers.get(key.question_id)
+            if answer is not None and normalize_answer(answer) == key.answer_key:
+                total += key.max_score
+        return total
+
+
+def _max_score(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def compile_plan(db: Session, exam_id: uuid.UUID) -> GradingPlan | None:
+    """Build the grading plan for an exam with one query; None if the exam does not exist."""
+    rows = db.execute(
+        select(
+            models.Exam.id.label("exam_id"),
+            models.Question.id,
+            models.Question.type,
+            models.Question.max_score,
+            models.Question.correct_answers,
+        )
+        .select_from(models.Exam)
+        .outerjoin(models.exam_questions, models.exam_questions.c.exam_id == models.Exam.id)
+        .outerjoin(models.Question, models.Question.id == models.exam_questions.c.question_id)
+        .where(models.Exam.id == exam_id)
+    ).all()
+    if not rows:
+        return None
+
+    questions = []
+    for row in rows:
+        if row.id is None:  # exam without questions
+            continue
+        answer_key = None
+        if row.type in AUTO_GRADED_TYPES and row.correct_answers is not None:
+            answer_key = normalize_answer(row.correct_answers)
+        questions.append(QuestionKey(row.id, row.type, _max_score(row.max_score), answer_key))
+    return GradingPlan(
+        exam_id=exam_id,
+        questions=tuple(questions),
+        total_possible=sum(q.max_score for q in questions),
+    )
+
+
+_plans: dict[uuid.UUID, tuple[float, GradingPlan]] = {}
+_plans_lock = threading.Lock()
+
+
+def get_grading_plan(db: Session, exam_id: uuid.UUID) -> GradingPlan | None:
+    """Return the cached plan for an exam, compiling it on first use."""
+    now = time.monotonic()
+    with _plans_lock:
+        cached = _plans.get(exam_id)
+    if cached and now - cached[0] < GRADING_PLAN_TTL_SECONDS:
+        return cached[1]
+
+    plan = compile_plan(db, exam_id)
+    if plan is not None:
+        with _plans_lock:
+            _plans[exam_id] = (now, plan)
+    return plan
+
+
+def invalidate_grading_plan(exam_id: uuid.UUID | None = None) -> None:
+    """Drop the cached plan for one exam, or every plan when exam_id is None."""
+    with _plans_lock:
+        if exam_id is None:
+            _plans.clear()
+        else:
+            _plans.pop(exam_id, None)
+
+
+def _score_attempts(db: Session, attempts: list[tuple[uuid.UUID, uuid.UUID]]) -> dict[uuid.UUID, tuple[float, float]]:
+    """Score (attempt_id, exam_id) pairs with one answers query; returns id -> (score, total)."""
+    attempt_ids = [attempt_id for attempt_id, _ in attempts]
+    answers: dict[uuid.UUID, dict[uuid.UUID, Any]] = {}
+    for attempt_id, question_id, answer_data in db.execute(
+        select(models.Answer.attempt_id, models.Answer.question_id, models.Answer.answer_data)
+        .where(models.Answer.attempt_id.in_(attempt_ids))
+    ):
+        answers.setdefault(attempt_id, {})[question_id] = answer_data
+
+    scores = {}
+    for attempt_id, exam_id in attempts:
+        plan = get_grading_plan(db, exam_id)
+        if plan is not None:
+            scores[attempt_id] = (plan.score(answers.get(attempt_id, {})), plan.total_possible)
+    return scores
+
+
+def finalize_attempts(db: Session, closings: list[tuple[uuid.UUID, uuid.UUID, datetime]]) -> list:
+    """Grade and close open attempts in bulk; returns (id, exam_id, student_id) rows of those closed.
+
+    ``closings`` holds (attempt_id, exam_id, end_time). Answers for every
+    attempt are loaded with one query and each attempt is scored against its
+    exam's cached plan. One UPDATE ... RETURNING then stamps end_time on the
+    attempts still open, skipping any submitted in the meantime, and one
+    executemany UPDATE writes the scores of exactly those attempts.
+    """
+    if not closings:
+        return []
+    scores = _score_attempts(db, [(attempt_id, exam_id) for attempt_id, exam_id, _ in closings])
+    end_times = {attempt_id: end_time for attempt_id, _, end_time in closings if attempt_id in scores}
+    if not end_times:
+        return []
+
+    table = models.ExamAttempt.__table__
+    closed = db.execute(
+        update(table)
+        .where(table.c.id.in_(end_times), table.c.end_time.is_(None))
+        .values(end_time=case(end_times, value=table.c.id))
+        .returning(table.c.id, table.c.exam_id, table.c.student_id)
+    ).all()
+    if not closed:
+        db.commit()
+        return []
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(score=bindparam("b_score"), total_possible_score=bindparam("b_total")),
+        [{"b_id": row.id, "b_score": scores[row.id][0], "b_total": scores[row.id][1]} for row in closed],
+    )
+    refresh_final_scores(db, table.c.id.in_([row.id for row in closed]), {row.exam_id for row in closed})
+    db.commit()
+    return closed
+
+
+def refresh_final_scores(db: Session, condition, exam_ids: Iterable[uuid.UUID]) -> None:
+    """Recompute final_score for the graded attempts matching ``condition``, in one UPDATE.
+
+    The final score is the automatic score plus teacher-awarded points on
+    manually graded questions, capped at the attempt's total. results_version
+    is bumped so cached result pages are rebuilt. Which questions
+    are manually graded comes from the cached plans of ``exam_ids`` (the
+    exams of the matching attempts), so the questions table is not read.
+    The caller commits.
+    """
+    table = models.ExamAttempt.__table__
+    manual_ids = {
+        key.question_id
+        for plan in (get_grading_plan(db, exam_id) for exam_id in set(exam_ids))
+        if plan is not None
+        for key in plan.questions
+        if key.type in notifications.MANUALLY_GRADED_TYPES
+    }
+    raw = table.c.score
+    if manual_ids:
+        manual = (
+            select(func.coalesce(func.sum(models.Evaluation.score_awarded), 0.0))
+            .join(models.Answer, models.Answer.id == models.Evaluation.answer_id)
+            .where(models.Answer.attempt_id == table.c.id, models.Answer.question_id.in_(manual_ids))
+            .scalar_subquery()
+        )
+        raw = raw + manual
+    total = func.coalesce(table.c.total_possible_score, 0.0)
+    db.execute(
+        update(table)
+        .where(condition, table.c.score.isnot(None))
+        .values(
+            final_score=case((raw > total, total), else_=raw),
+            results_version=table.c.results_version + 1,
+        )
+    )
+
+
+def grade_submitted_attempts(db: Session, attempt_ids: list[uuid.UUID]) -> int:
+    """Score submitted attempts that are still waiting for a grade.
+
+    Used by the grading queue: the submit request only stamps end_time, and
+    this fills in score and total_possible_score for a whole batch at once.
+    Attempts that are open or already graded are skipped.
+    """
+    if not attempt_ids:
+        return 0
+    rows = db.execute(
+        select(models.ExamAttempt.id, models.ExamAttempt.exam_id, models.ExamAttempt.student_id).where(
+            models.ExamAttempt.id.in_(attempt_ids),
+            models.ExamAttempt.end_time.isnot(None),
+            models.ExamAttempt.score.is_(None),
+        )
+    ).all()
+    if not rows:
+        return 0
+    scores = _score_attempts(db, [(row.id, row.exam_id) for row in rows])
+    if not scores:
+        return 0
+
+    table = models.ExamAttempt.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.score.is_(None))
+        .values(score=bindparam("b_score"), total_possible_score=bindparam("b_total")),
+        [{"b_id": attempt_id, "b_score": score, "b_total": total} for attempt_id, (score, total) in scores.items()],
+    )
+    refresh_final_scores(db, table.c.id.in_(list(scores)), (row.exam_id for row in rows))
+    db.commit()
+    notifications.attempts_graded(db, rows, scores)
+    return len(scores)
+
+
+# Answers are streamed from the database in batches of this many rows
+REGRADE_STREAM_BATCH = 5000
+
+
+def vectorized_scores(
+    plan: GradingPlan,
+    options: dict[uuid.UUID, list],
+    attempt_ids: list[uuid.UUID],
+    answer_rows,
+) -> np.ndarray:
+    """Score many attempts at once with a boolean (attempts x questions x options) matrix.
+
+    Each auto-graded question gets a vocabulary of its options plus its key
+    values, and one trailing overflow slot for anything else a student sent.
+    An attempt scores a question when its selection row equals the key row.
+    ``answer_rows`` yields (attempt_id, question_id, answer_data).
+    """
+    auto = [key for key in plan.questions if key.auto_graded]
+    if not attempt_ids or not auto:
+        return np.zeros(len(attempt_ids), dtype=np.float64)
+
+    vocabs = []
+    for key in auto:
+        values = dict.fromkeys(str(v) for v in (options.get(key.question_id) or []))
+        values.update(dict.fromkeys(sorted(key.answer_key)))
+        vocabs.append({value: i for i, value in enumerate(values)})
+    width = max(len(vocab) for vocab in vocabs) + 1
+    overflow = width - 1
+
+    key_matrix = np.zeros((len(auto), width), dtype=bool)
+    for j, key in enumerate(auto):
+        key_matrix[j, [vocabs[j][value] for value in key.answer_key]] = True
+    max_scores = np.array([key.max_score for key in auto], dtype=np.float64)
+
+    attempt_index = {attempt_id: i for i, attempt_id in enumerate(attempt_ids)}
+    question_index = {key.question_id: j for j, key in enumerate(auto)}
+    chosen = np.zeros((len(attempt_ids), len(auto), width), dtype=bool)
+    answered = np.zeros((len(attempt_ids), len(auto)), dtype=bool)
+
+    for attempt_id, question_id, answer_data in answer_rows:
+        a = attempt_index.get(attempt_id)
+        j = question_index.get(question_id)
+        if a is None or j is None or answer_data is None:
+            continue
+        answered[a, j] = True
+        vocab = vocabs[j]
+        for value in normalize_answer(answer_data):
+            chosen[a, j, vocab.get(value, overflow)] = True
+
+    correct = answered & (chosen == key_matrix[np.newaxis, :, :]).all(axis=2)
+    return correct.astype(np.float64) @ max_scores
+
+
+def _auto_question_options(db: Session, plan: GradingPlan) -> tuple[list[uuid.UUID], dict[uuid.UUID, list]]:
+    """Ids of the plan's auto-graded questions and their option lists (the scorer's vocabularies)."""
+    auto_ids = [key.question_id for key in plan.questions if key.auto_graded]
+    if not auto_ids:
+        return auto_ids, {}
+    options = dict(
+        db.execute(select(models.Question.id, models.Question.options).where(models.Question.id.in_(auto_ids))).all()
+    )
+    return auto_ids, options
+
+
+def regrade_exam(db: Session, exam_id: uuid.UUID) -> dict | None:
+    """Re-score every submitted attempt of an exam against the current answer key.
+
+    Recompiles the plan, streams all choice answers in one query, scores them
+    with ``vectorized_scores`` and writes the scores back in one bulk UPDATE.
+    Returns a summary, or None if the exam does not exist.
+    """
+    invalidate_grading_plan(exam_id)
+    plan = get_grading_plan(db, exam_id)
+    if plan is None:
+        return None
+
+    attempts = db.execute(
+        select(models.ExamAttempt.id, models.ExamAttempt.score)
+        .where(models.ExamAttempt.exam_id == exam_id, models.ExamAttempt.end_time.isnot(None))
+        .order_by(models.ExamAttempt.id)
+    ).all()
+    attempt_ids = [row.id for row in attempts]
+    auto_ids, options = _auto_question_options(db, plan)
+
+    answer_rows = db.execute(
+        select(models.Answer.attempt_id, models.Answer.question_id, models.Answer.answer_data)
+        .join(models.ExamAttempt, models.ExamAttempt.id == models.Answer.attempt_id)
+        .where(
+            models.ExamAttempt.exam_id == exam_id,
+            models.ExamAttempt.end_time.isnot(None),
+            models.Answer.question_id.in_(auto_ids),
+        )
+        .execution_options(yield_per=REGRADE_STREAM_BATCH)
+    ) if auto_ids and attempt_ids else []
+
+    scores = vectorized_scores(plan, options, attempt_ids, answer_rows)
+
+    changed = sum(
+        1 for row, score in zip(attempts, scores) if row.score is None or float(row.score) != float(score)
+    )
+    if attempt_ids:
+        db.execute(
+            update(models.ExamAttempt),
+            [
+                {"id": attempt_id, "score": float(score), "total_possible_score": plan.total_possible}
+                for attempt_id, score in zip(attempt_ids, scores)
+            ],
+        )
+        refresh_final_scores(
+            db, and_(models.ExamAttempt.exam_id == exam_id, models.ExamAttempt.end_time.isnot(None)), [exam_id]
+        )
+    db.commit()
+    return {
+        "exam_id": str(exam_id),
+        "attempts_regraded": len(attempt_ids),
+        "scores_changed": changed,
+        "total_possible_score": plan.total_possible,
+    }
+
+
+def close_exam_attempts(db: Session, exam_id: uuid.UUID, exam_end_time: datetime) -> int:
+    """Grade and close every open attempt of an ended exam in one pass.
+
+    Answers of all open attempts are streamed in one query and scored with
+    ``vectorized_scores``. One UPDATE ... RETURNING stamps end_time (the
+    attempt's own deadline, capped at the exam end) on the attempts still
+    open, skipping any submitted in the meantime, and one executemany UPDATE
+    writes the scores of exactly those. Returns the number of attempts closed.
+    """
+    plan = get_grading_plan(db, exam_id)
+    if plan is None:
+        return 0
+    attempt_ids = db.execute(
+        select(models.ExamAttempt.id)
+        .where(
+            models.ExamAttempt.exam_id == exam_id,
+            models.ExamAttempt.end_time.is_(None),
+            models.ExamAttempt.start_time.isnot(None),
+        )
+        .order_by(models.ExamAttempt.id)
+    ).scalars().all()
+    if not attempt_ids:
+        return 0
+    auto_ids, options = _auto_question_options(db, plan)
+
+    answer_rows = db.execute(
+        select(models.Answer.attempt_id, models.Answer.question_id, models.Answer.answer_data)
+        .join(models.ExamAttempt, models.ExamAttempt.id == models.Answer.attempt_id)
+        .where(
+            models.ExamAttempt.exam_id == exam_id,
+            models.ExamAttempt.end_time.is_(None),
+            models.Answer.question_id.in_(auto_ids),
+        )
+        .execution_options(yield_per=REGRADE_STREAM_BATCH)
+    ) if auto_ids else []
+
+    scores = vectorized_scores(plan, options, attempt_ids, answer_rows)
+    exam_end_time = as_utc(exam_end_time)
+
+    table = models.ExamAttempt.__table__
+    closed = db.execute(
+        update(table)
+        .where(table.c.id.in_(attempt_ids), table.c.end_time.is_(None))
+        .values(end_time=case(
+            (table.c.deadline_at < exam_end_time, table.c.deadline_at), else_=exam_end_time
+        ))
+        .returning(table.c.id)
+    ).scalars().all()
+    if not closed:
+        db.commit()
+        return 0
+    score_by_id = dict(zip(attempt_ids, scores))
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(score=bindparam("b_score"), total_possible_score=bindparam("b_total")),
+        [{"b_id": attempt_id, "b_score": float(score_by_id[attempt_id]), "b_total": plan.total_possible}
+         for attempt_id in closed],
+    )
+    refresh_final_scores(db, table.c.id.in_(closed), [exam_id])
+    db.commit()
+    return len(closed)
@@ -0,0 +1,141 @@
+"""Bounded worker pool that grades submitted attempts off the request path.
+
+Submit only stamps end_time and enqueues the attempt id. Worker threads drain
+the queue in batches and score each batch with one set-based update, so a
+burst of submissions at the end of an exam is absorbed by the pool instead of
+holding request threads. When the pool is not running or the queue is full,
+the attempt is graded inline in the caller's session.
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from .grading import grade_submitted_attempts
+from .metrics import metrics
+
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "4"))
+GRADING_QUEUE_SIZE = int(os.getenv("GRADING_QUEUE_SIZE", "5000"))
+GRADING_BATCH_SIZE = int(os.getenv("GRADING_BATCH_SIZE", "200"))
+
+
+class GradingQueue:
+    """Fixed-size pool of daemon threads fed by a bounded queue of attempt ids."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] | None = None,
+        workers: int = GRADING_WORKERS,
+        max_pending: int = GRADING_QUEUE_SIZE,
+        batch_size: int = GRADING_BATCH_SIZE,
+    ) -> None:
+        self._session_factory = session_factory
+        self._workers = workers
+        self._batch_size = batch_size
+        self._queue: queue.Queue[uuid.UUID] = queue.Queue(maxsize=max_pending)
+        self._pending: dict[uuid.UUID, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from .database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self) -> None:
+        if self.is_running or self._workers <= 0:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"grading-{i}", daemon=True)
+            for i in range(self._workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Stop the workers; ids still queued are picked up by the grade_pending_attempts job."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, db: Session, attempt_id: uuid.UUID) -> bool:
+        """Queue a submitted attempt for grading; grades it inline and returns False if that is not possible."""
+        if self.is_running:
+            with self._lock:
+                self._pending.setdefault(attempt_id, time.monotonic())
+            try:
+                self._queue.put_nowait(attempt_id)
+                metrics.incr("grading.queued")
+                metrics.set_gauge("grading.queue_depth", self._queue.qsize())
+                return True
+            except queue.Full:
+                with self._lock:
+                    self._pending.pop(attempt_id, None)
+                metrics.incr("grading.queue_full")
+        grade_submitted_attempts(db, [attempt_id])
+        metrics.incr("grading.inline")
+        return False
+
+    def _next_batch(self) -> list[uuid.UUID]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            metrics.set_gauge("grading.queue_depth", self._queue.qsize())
+            db = self._session()
+            try:
+                graded = grade_submitted_attempts(db, batch)
+                metrics.incr("grading.graded", graded)
+                metrics.observe("grading.batch_size", len(batch))
+            except Exception:
+                db.rollback()
+                metrics.incr("grading.failures")
+                traceback.print_exc()
+            finally:
+                db.close()
+                self._finish(batch)
+
+    def _finish(self, batch: list[uuid.UUID]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            done = [self._pending.pop(attempt_id, None) for attempt_id in batch]
+        for queued_at in done:
+            if queued_at is not None:
+                metrics.observe("grading.latency_seconds", now - queued_at)
+
+    def status(self) -> dict:
+        return {
+            "running": self.is_running,
+            "workers": self._workers,
+            "pending": self._queue.qsize(),
+            "max_pending": self._queue.maxsize,
+        }
+
+
+grading_queue = GradingQueue()
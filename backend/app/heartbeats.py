@@ -0,0 +1,83 @@
+"""Last-seen times of exam attempts, kept in memory and written in batches.
+
+Clients ping every few seconds while an exam is open (HTTP heartbeat or a
+socket frame). Each ping only updates ``attempt_id -> timestamp`` in this
+process; the flush job writes everything collected since the previous
+flush to ``ExamAttempt.last_seen_at`` with one executemany UPDATE, so the
+database sees one write per active attempt per flush interval instead of
+one per ping.
+"""
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .metrics import metrics
+
+HEARTBEAT_FLUSH_INTERVAL_SECONDS = float(os.getenv("HEARTBEAT_FLUSH_INTERVAL_SECONDS", "10"))
+HEARTBEAT_FLUSH_BATCH_SIZE = 1000
+
+
+class HeartbeatStore:
+    """attempt_id -> last seen, swapped out and persisted on every flush."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seen: dict[uuid.UUID, datetime] = {}
+
+    def beat(self, attempt_id: uuid.UUID, at: datetime | None = None) -> None:
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            previous = self._seen.get(attempt_id)
+            if previous is None or at > previous:
+                self._seen[attempt_id] = at
+        metrics.incr("heartbeats.received")
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._seen)
+
+    def reset(self) -> None:
+        """Drop collected pings without writing them."""
+        with self._lock:
+            self._seen.clear()
+
+    def flush(self, db: Session) -> int:
+        """Write collected last-seen times to open attempts; returns how many were written."""
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        if not seen:
+            return 0
+        table = models.ExamAttempt.__table__
+        statement = (
+            update(table)
+            .where(
+                table.c.id == bindparam("b_id"),
+                table.c.end_time.is_(None),
+                # Another process may already have stored a later ping
+                or_(table.c.last_seen_at.is_(None), table.c.last_seen_at < bindparam("b_seen")),
+            )
+            .values(last_seen_at=bindparam("b_seen"))
+        )
+        params = [{"b_id": attempt_id, "b_seen": at} for attempt_id, at in seen.items()]
+        try:
+            for start in range(0, len(params), HEARTBEAT_FLUSH_BATCH_SIZE):
+                db.execute(statement, params[start:start + HEARTBEAT_FLUSH_BATCH_SIZE])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Keep the pings for the next flush unless newer ones arrived meanwhile
+            with self._lock:
+                for attempt_id, at in seen.items():
+                    if attempt_id not in self._seen:
+                        self._seen[attempt_id] = at
+            raise
+        metrics.observe("heartbeats.flush_size", len(params))
+        return len(params)
+
+
+heartbeat_store = HeartbeatStore()
@@ -0,0 +1,263 @@
+"""Periodic background jobs run by ``app.scheduler``."""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.orm import Session
+
+from . import models, notifications, warmup
+from .crud import as_utc, attempt_deadline, provision_exam_attempts
+from .grading import close_exam_attempts, finalize_attempts, grade_submitted_attempts, refresh_final_scores
+from .heartbeats import HEARTBEAT_FLUSH_INTERVAL_SECONDS, heartbeat_store
+from .live import LIVE_PUBLISH_INTERVAL_SECONDS, live_exams
+from .metrics import metrics
+from .statistics import save_exam_statistics
+
+# Leave the browser's own timer a head start before the server closes an attempt
+SWEEP_GRACE_SECONDS = int(os.getenv("SWEEP_GRACE_SECONDS", "30"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "500"))
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SWEEP_INTERVAL_SECONDS", "15"))
+# Submitted attempts still ungraded after this long were lost by a grading worker
+GRADING_RETRY_AFTER_SECONDS = int(os.getenv("GRADING_RETRY_AFTER_SECONDS", "60"))
+EXAM_CLOSE_INTERVAL_SECONDS = float(os.getenv("EXAM_CLOSE_INTERVAL_SECONDS", "30"))
+# Pending attempts are created this long before a published exam starts (0 disables)
+PROVISION_LEAD_MINUTES = int(os.getenv("PROVISION_LEAD_MINUTES", "10"))
+# Caches are warmed during this long before a published exam starts
+WARMUP_LEAD_MINUTES = int(os.getenv("WARMUP_LEAD_MINUTES", "5"))
+WARMUP_INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", "30"))
+
+
+def backfill_attempt_deadlines(db: Session, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Persist deadline_at on open attempts created before deadlines were stored."""
+    table = models.ExamAttempt.__table__
+    filled = 0
+    while True:
+        rows = db.execute(
+            select(
+                models.ExamAttempt.id,
+                models.ExamAttempt.start_time,
+                models.Exam.duration_minutes,
+                models.Exam.end_time,
+            )
+            .join(models.Exam, models.Exam.id == models.ExamAttempt.exam_id)
+            .where(
+                models.ExamAttempt.end_time.is_(None),
+                models.ExamAttempt.deadline_at.is_(None),
+                models.ExamAttempt.start_time.isnot(None),
+            )
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return filled
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(deadline_at=bindparam("b_deadline")),
+            [
+                {"b_id": row.id, "b_deadline": attempt_deadline(row.start_time, row.duration_minutes, row.end_time)}
+                for row in rows
+            ],
+        )
+        db.commit()
+        filled += len(rows)
+
+
+def sweep_expired_attempts(db: Session, now: datetime | None = None, batch_size: int = SWEEP_BATCH_SIZE) -> dict:
+    """Auto-submit open attempts whose deadline has passed.
+
+    Expired attempts are read from the partial index on deadline_at over open
+    attempts, then graded and closed in set-based batches. Each attempt's
+    end_time is stamped with its deadline.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=SWEEP_GRACE_SECONDS)
+    backfill_attempt_deadlines(db, batch_size)
+    closed = 0
+    batches = 0
+    max_lag = 0.0
+
+    while True:
+        rows = db.execute(
+            select(
+                models.ExamAttempt.id,
+                models.ExamAttempt.exam_id,
+                models.ExamAttempt.student_id,
+                models.ExamAttempt.deadline_at,
+            )
+            .where(models.ExamAttempt.end_time.is_(None), models.ExamAttempt.deadline_at <= cutoff)
+            .order_by(models.ExamAttempt.deadline_at)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        closings = [(row.id, row.exam_id, as_utc(row.deadline_at)) for row in rows]
+        max_lag = max(max_lag, (now - closings[0][2]).total_seconds())
+        finalized = finalize_attempts(db, closings)
+        # Only the attempts this run closed; a concurrent submit already announced the others
+        notifications.attempts_submitted(finalized, auto=True)
+        closed += len(finalized)
+        batches += 1
+        metrics.observe("sweeper.batch_size", len(closings))
+        if len(rows) < batch_size or not finalized:
+            break
+
+    metrics.incr("sweeper.attempts_closed", closed)
+    if closed:
+        metrics.observe("sweeper.lag_seconds", max_lag)
+    return {"attempts_closed": closed, "batches": batches, "max_lag_seconds": round(max_lag, 3)}
+
+
+def backfill_final_scores(db: Session, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Fill in final_score on attempts graded before final scores were stored."""
+    filled = 0
+    while True:
+        rows = db.execute(
+            select(models.ExamAttempt.id, models.ExamAttempt.exam_id)
+            .where(models.ExamAttempt.score.isnot(None), models.ExamAttempt.final_score.is_(None))
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return filled
+        refresh_final_scores(
+            db, models.ExamAttempt.id.in_([row.id for row in rows]), (row.exam_id for row in rows)
+        )
+        db.commit()
+        filled += len(rows)
+
+
+def grade_pending_attempts(db: Session, now: datetime | None = None, batch_size: int = SWEEP_BATCH_SIZE) -> dict:
+    """Grade submitted attempts the grading queue never finished (worker restart, crash)."""
+    now = now or datetime.now(timezone.utc)
+    backfill_final_scores(db, batch_size)
+    cutoff = now - timedelta(seconds=GRADING_RETRY_AFTER_SECONDS)
+    graded = 0
+    while True:
+        attempt_ids = db.execute(
+            select(models.ExamAttempt.id)
+            .where(
+                models.ExamAttempt.end_time.isnot(None),
+                models.ExamAttempt.score.is_(None),
+                models.ExamAttempt.end_time <= cutoff,
+            )
+            .limit(batch_size)
+        ).scalars().all()
+        if not attempt_ids:
+            break
+        done = grade_submitted_attempts(db, attempt_ids)
+        graded += done
+        if len(attempt_ids) < batch_size or not done:
+            break
+    metrics.incr("grading.recovered", graded)
+    return {"attempts_graded": graded}
+
+
+def close_ended_exams(db: Session, now: datetime | None = None) -> dict:
+    """Close every exam whose window has ended.
+
+    For each exam this grades and closes all of its open attempts in one
+    vectorized pass, grades submissions still waiting in the grading queue,
+    stores the exam's score statistics and marks the exam closed.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=SWEEP_GRACE_SECONDS)
+    exams = db.execute(
+        select(models.Exam.id, models.Exam.end_time)
+        .where(models.Exam.closed_at.is_(None), models.Exam.end_time <= cutoff)
+        .order_by(models.Exam.end_time)
+    ).all()
+    attempts_closed = 0
+    for exam in exams:
+        started = time.perf_counter()
+        # Pre-provisioned attempts that were never started are not real attempts
+        db.execute(
+            delete(models.ExamAttempt).where(
+                models.ExamAttempt.exam_id == exam.id, models.ExamAttempt.start_time.is_(None)
+            )
+        )
+        attempts_closed += close_exam_attempts(db, exam.id, exam.end_time)
+        ungraded = db.execute(
+            select(models.ExamAttempt.id).where(
+                models.ExamAttempt.exam_id == exam.id, models.ExamAttempt.score.is_(None)
+            )
+        ).scalars().all()
+        grade_submitted_attempts(db, ungraded)
+        save_exam_statistics(db, exam.id)
+        db.execute(update(models.Exam.__table__).where(models.Exam.id == exam.id).values(closed_at=now))
+        db.commit()
+        live_exams.exam_closed(exam.id)
+        metrics.observe("exam_close.duration_ms", (time.perf_counter() - started) * 1000)
+
+    metrics.incr("exam_close.exams_closed", len(exams))
+    metrics.incr("exam_close.attempts_closed", attempts_closed)
+    return {"exams_closed": len(exams), "attempts_closed": attempts_closed}
+
+
+def provision_upcoming_exams(db: Session, now: datetime | None = None) -> dict:
+    """Create pending attempts for published exams starting within PROVISION_LEAD_MINUTES."""
+    now = now or datetime.now(timezone.utc)
+    exams = db.execute(
+        select(models.Exam).where(
+            models.Exam.is_published.is_(True),
+            models.Exam.provisioned_at.is_(None),
+            models.Exam.start_time <= now + timedelta(minutes=PROVISION_LEAD_MINUTES),
+            models.Exam.end_time > now,
+        )
+    ).scalars().all()
+    created = sum(provision_exam_attempts(db, exam) for exam in exams)
+    metrics.incr("provisioning.attempts_created", created)
+    return {"exams_provisioned": len(exams), "attempts_created": created}
+
+
+def warm_upcoming_exams(db: Session, now: datetime | None = None) -> dict:
+    """Warm the caches of this process for published exams starting within the lead time.
+
+    Exams that have already started are left alone: by then their caches are
+    filled by the requests themselves.
+    """
+    now = now or datetime.now(timezone.utc)
+    lead = timedelta(minutes=WARMUP_LEAD_MINUTES)
+    exam_ids = db.execute(
+        select(models.Exam.id).where(
+            models.Exam.is_published.is_(True),
+            models.Exam.start_time > now,
+            models.Exam.start_time <= now + lead,
+        )
+    ).scalars().all()
+    warmup.forget(set(warmup.warmed_exam_ids()) - set(exam_ids))
+    for exam_id in exam_ids:
+        warmup.warm_exam(db, exam_id)
+    opened = warmup.warm_connection_pool(db) if exam_ids else 0
+    return {"exams_warmed": len(exam_ids), "connections_opened": opened}
+
+
+def publish_live_counters(db: Session) -> dict:
+    """Send this process's live exam counters to every process."""
+    return {"events_published": live_exams.publish()}
+
+
+def flush_heartbeats(db: Session) -> dict:
+    """Persist the last-seen times collected by this process since the previous flush."""
+    return {"attempts_updated": heartbeat_store.flush(db)}
+
+
+def register_event_jobs(scheduler) -> None:
+    """Jobs that share this process's in-memory state with the others; every process runs them."""
+    scheduler.add_job("publish_live_counters", LIVE_PUBLISH_INTERVAL_SECONDS, publish_live_counters)
+
+
+def register_process_jobs(scheduler) -> None:
+    """Jobs that act on this process's own state; every API process runs them."""
+    scheduler.add_job("warm_upcoming_exams", WARMUP_INTERVAL_SECONDS, warm_upcoming_exams)
+    scheduler.add_job("flush_heartbeats", HEARTBEAT_FLUSH_INTERVAL_SECONDS, flush_heartbeats)
+    register_event_jobs(scheduler)
+
+
+def register_jobs(scheduler) -> None:
+    """Register the jobs that act on shared rows; each runs in one process at a time."""
+    scheduler.add_job("sweep_expired_attempts", SWEEP_INTERVAL_SECONDS, sweep_expired_attempts, exclusive=True)
+    scheduler.add_job("grade_pending_attempts", SWEEP_INTERVAL_SECONDS, grade_pending_attempts, exclusive=True)
+    scheduler.add_job("close_ended_exams", EXAM_CLOSE_INTERVAL_SECONDS, close_ended_exams, exclusive=True)
+    if PROVISION_LEAD_MINUTES > 0:
+        scheduler.add_job(
+            "provision_upcoming_exams", EXAM_CLOSE_INTERVAL_SECONDS, provision_upcoming_exams, exclusive=True
+        )
@@ -0,0 +1,247 @@
+"""Live per-exam counters for the proctoring view.
+
+Request handlers record starts, submissions, saved answers and student
+activity in memory (``live_exams.record_*``), which costs a dict update and
+no database work. Every process publishes what it recorded since its last
+flush as small delta events on the event bus; every process folds the deltas
+of all processes into one board, so any worker can answer the live endpoint
+for the whole deployment.
+
+Counts start from one grouped query per exam, taken the first time the exam
+is looked at in a process, and last-seen times from the attempts' persisted
+heartbeats. Only exams that have been looked at keep a board, and a board is
+dropped in every process when its exam closes.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timezone
+from dataclasses import dataclass, field
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .events import event_bus
+from .metrics import metrics
+
+LIVE_CHANNEL = "live"
+LIVE_PUBLISH_INTERVAL_SECONDS = float(os.getenv("LIVE_PUBLISH_INTERVAL_SECONDS", "2"))
+# Open attempts with no activity for this long are reported as possibly disconnected
+LIVE_STALE_SECONDS = int(os.getenv("LIVE_STALE_SECONDS", "60"))
+# Window over which answers per second is averaged
+LIVE_RATE_WINDOW_SECONDS = 10
+# Keeps each delta event well under the 8000 byte NOTIFY payload limit
+LIVE_EVENT_CHUNK = 100
+LIVE_STALE_LIST_LIMIT = 100
+
+
+@dataclass
+class _Pending:
+    started: int = 0
+    submitted: int = 0
+    answers: int = 0
+    seen: dict[str, float] = field(default_factory=dict)
+    submitted_ids: list[str] = field(default_factory=list)
+    # When the latest of these counts was recorded
+    recorded_at: float = 0.0
+
+
+@dataclass
+class _Board:
+    active: int = 0
+    submitted: int = 0
+    answers: int = 0
+    last_seen: dict[str, float] = field(default_factory=dict)
+    closed_ids: set[str] = field(default_factory=set)
+    # (whole second, answers saved in it)
+    answer_buckets: deque = field(default_factory=deque)
+    seeded: bool = False
+    # Counts recorded before this were read from the database by the seed
+    seeded_at: float = 0.0
+
+
+class LiveExams:
+    """Records activity locally and aggregates everyone's deltas into per-exam boards."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: dict[str, _Pending] = {}
+        self._boards: dict[str, _Board] = {}
+
+    # -- recording (hot paths) -------------------------------------------------
+
+    def _touch(self, exam_id, attempt_id) -> _Pending:
+        pending = self._pending.setdefault(str(exam_id), _Pending())
+        pending.seen[str(attempt_id)] = pending.recorded_at = time.time()
+        return pending
+
+    def record_start(self, exam_id: uuid.UUID, attempt_id: uuid.UUID) -> None:
+        with self._lock:
+            self._touch(exam_id, attempt_id).started += 1
+
+    def record_answers(self, exam_id: uuid.UUID, attempt_id: uuid.UUID, count: int = 1) -> None:
+        with self._lock:
+            self._touch(exam_id, attempt_id).answers += count
+
+    def record_activity(self, exam_id: uuid.UUID, attempt_id: uuid.UUID) -> None:
+        with self._lock:
+            self._touch(exam_id, attempt_id)
+
+    def record_submit(self, exam_id: uuid.UUID, attempt_id: uuid.UUID) -> None:
+        with self._lock:
+            pending = self._pending.setdefault(str(exam_id), _Pending())
+            pending.submitted += 1
+            pending.submitted_ids.append(str(attempt_id))
+            pending.recorded_at = time.time()
+
+    # -- publishing ------------------------------------------------------------
+
+    def publish(self) -> int:
+        """Publish and reset the local deltas; returns the number of events sent."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        sent = 0
+        for exam_id, delta in pending.items():
+            seen = list(delta.seen.items())
+            submitted_ids = delta.submitted_ids
+            first = True
+            while first or seen or submitted_ids:
+                data = {
+                    "exam_id": exam_id,
+                    "seen": dict(seen[:LIVE_EVENT_CHUNK]),
+                    "submitted_ids": submitted_ids[:LIVE_EVENT_CHUNK],
+                }
+                if first:
+                    data.update(started=delta.started, submitted=delta.submitted, answers=delta.answers,
+                                recorded_at=delta.recorded_at)
+                event_bus.publish(LIVE_CHANNEL, "live_delta", data)
+                seen, submitted_ids = seen[LIVE_EVENT_CHUNK:], submitted_ids[LIVE_EVENT_CHUNK:]
+                first = False
+                sent += 1
+        metrics.incr("live.events_published", sent)
+        return sent
+
+    def exam_closed(self, exam_id: uuid.UUID) -> None:
+        """Tell every process to drop the exam's board."""
+        event_bus.publish(LIVE_CHANNEL, "live_closed", {"exam_id": str(exam_id), "closed": True})
+
+    # -- aggregation -----------------------------------------------------------
+
+    def apply(self, data: dict) -> None:
+        """Fold one delta event (from any process) into the exam's board.
+
+        Exams nobody has looked at in this process have no board; their seed
+        reads the database, which already holds everything recorded so far.
+        """
+        with self._lock:
+            if data.get("closed"):
+                self._boards.pop(data["exam_id"], None)
+                return
+            board = self._boards.get(data["exam_id"])
+            if board is None:
+                return
+            # A delta buffered before the seed query and published after it is already in the seed
+            if data.get("recorded_at", board.seeded_at) >= board.seeded_at:
+                board.active += data.get("started", 0) - data.get("submitted", 0)
+                board.submitted += data.get("submitted", 0)
+                answers = data.get("answers", 0)
+            else:
+                answers = 0
+            if answers:
+                board.answers += answers
+                second = int(time.time())
+                if board.answer_buckets and board.answer_buckets[-1][0] == second:
+                    board.answer_buckets[-1][1] += answers
+                else:
+                    board.answer_buckets.append([second, answers])
+            for attempt_id, seen_at in data.get("seen", {}).items():
+                if attempt_id not in board.closed_ids and seen_at > board.last_seen.get(attempt_id, 0):
+                    board.last_seen[attempt_id] = seen_at
+            for attempt_id in data.get("submitted_ids", []):
+                board.closed_ids.add(attempt_id)
+                board.last_seen.pop(attempt_id, None)
+
+    def _seed(self, db: Session, exam_id: str) -> None:
+        seeded_at = time.time()
+        row = db.execute(
+            select(
+                func.count(case((models.ExamAttempt.end_time.is_(None), 1))),
+                func.count(models.ExamAttempt.end_time),
+            ).where(
+                models.ExamAttempt.exam_id == uuid.UUID(exam_id),
+                models.ExamAttempt.start_time.isnot(None),
+            )
+        ).one()
+        answers = db.execute(
+            select(func.count(models.Answer.id))
+            .join(models.ExamAttempt, models.ExamAttempt.id == models.Answer.attempt_id)
+            .where(models.ExamAttempt.exam_id == uuid.UUID(exam_id))
+        ).scalar_one()
+        last_seen = db.execute(
+            select(models.ExamAttempt.id, models.ExamAttempt.last_seen_at).where(
+                models.ExamAttempt.exam_id == uuid.UUID(exam_id),
+                models.ExamAttempt.end_time.is_(None),
+                models.ExamAttempt.last_seen_at.isnot(None),
+            )
+        ).all()
+        with self._lock:
+            board = self._boards.setdefault(exam_id, _Board())
+            for attempt_id, seen_at in last_seen:
+                if seen_at.tzinfo is None:
+                    # SQLite hands back naive datetimes
+                    seen_at = seen_at.replace(tzinfo=timezone.utc)
+                seen = seen_at.timestamp()
+                if seen > board.last_seen.get(str(attempt_id), 0):
+                    board.last_seen[str(attempt_id)] = seen
+            if not board.seeded:
+                # The database is authoritative; deltas folded in before this point are already in it
+                board.active, board.submitted, board.answers = row[0], row[1], answers
+                board.seeded, board.seeded_at = True, seeded_at
+
+    def snapshot(self, db: Session, exam_id: uuid.UUID) -> dict:
+        key = str(exam_id)
+        board = self._boards.get(key)
+        if board is None or not board.seeded:
+            self._seed(db, key)
+        now = time.time()
+        with self._lock:
+            board = self._boards[key]
+            while board.answer_buckets and board.answer_buckets[0][0] <= now - LIVE_RATE_WINDOW_SECONDS:
+                board.answer_buckets.popleft()
+            recent_answers = sum(count for _, count in board.answer_buckets)
+            stale = sorted(
+                (now - seen_at, attempt_id)
+                for attempt_id, seen_at in board.last_seen.items()
+                if now - seen_at > LIVE_STALE_SECONDS
+            )
+            return {
+                "exam_id": key,
+                "active_attempts": max(0, board.active),
+                "submitted_attempts": board.submitted,
+                "answers_saved": board.answers,
+                "answers_per_second": round(recent_answers / LIVE_RATE_WINDOW_SECONDS, 2),
+                "connected_attempts": len(board.last_seen) - len(stale),
+                "stale_attempts": len(stale),
+                "stale_after_seconds": LIVE_STALE_SECONDS,
+                "stale": [
+                    {"attempt_id": attempt_id, "seconds_since_seen": int(age)}
+                    for age, attempt_id in reversed(stale[-LIVE_STALE_LIST_LIMIT:])
+                ],
+                "generated_at": now,
+            }
+
+    def forget(self, exam_id: uuid.UUID | None = None) -> None:
+        with self._lock:
+            if exam_id is None:
+                self._boards.clear()
+                self._pending.clear()
+            else:
+                self._boards.pop(str(exam_id), None)
+                self._pending.pop(str(exam_id), None)
+
+
+live_exams = LiveExams()
+event_bus.add_listener(LIVE_CHANNEL, live_exams.apply)
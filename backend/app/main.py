@@ -1,9 +1,18 @@
+import os
+import traceback
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .database import Base, engine, SessionLocal
 from . import models, crud, schemas  # noqa: F401  # ensure models are imported so metadata has tables
 from .routers import admin, auth, student, profile
+from .answer_writer import answer_writer
+from .events import event_bus
+from .grading_queue import grading_queue
+from .heartbeats import heartbeat_store
+from .jobs import register_jobs, register_process_jobs
+from .scheduler import scheduler
 
 app = FastAPI()
 
@@ -41,6 +50,36 @@ def on_startup() -> None:
     finally:
         db.close()
 
+    # Periodic jobs (expired-attempt sweeper, ...). Every worker may schedule them: each run
+    # takes an advisory lock, so one process at a time acts. Set RUN_SCHEDULER=0 when
+    # app.worker runs them instead.
+    if os.getenv("RUN_SCHEDULER", "1") == "1":
+        register_jobs(scheduler)
+    # Cache warm-up runs in every API process regardless
+    register_process_jobs(scheduler)
+    scheduler.start()
+
+    # Submissions are graded by this worker pool instead of inside the request
+    grading_queue.start()
+    # Answers streamed over exam sockets are written in batches by this thread
+    answer_writer.start()
+    # Server-sent event streams receive events published by any worker
+    event_bus.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    scheduler.stop()
+    event_bus.stop()
+    answer_writer.stop()
+    grading_queue.stop()
+    # Last and best effort: a failed write must not stop the rest of the shutdown
+    try:
+        with SessionLocal() as db:
+            heartbeat_store.flush(db)
+    except Exception:
+        traceback.print_exc()
+
 
 @app.get("/")
 async def read_root():
@@ -10,8 +10,14 @@ from sqlalchemy import (
     Table,
     Float,
     Date,
+    Index,
+    BigInteger,
+    UniqueConstraint,
+    DDL,
+    event,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID, JSON
+from sqlalchemy.dialects.postgresql import UUID, JSON, JSONB
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -45,6 +51,31 @@ class User(Base):
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        # Keyset pagination walks (title, id); type/complexity are equality filters
+        Index("ix_questions_title_id", "title", "id"),
+        Index("ix_questions_type", "type"),
+        Index("ix_questions_complexity", "complexity"),
+        # PostgreSQL only: trigram indexes serve ILIKE '%term%', GIN serves tags @> '["tag"]'
+        Index(
+            "ix_questions_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_questions_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_questions_tags_gin",
+            "tags",
+            postgresql_using="gin",
+            postgresql_ops={"tags": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String, nullable=False)
@@ -54,11 +85,44 @@ class Question(Base):
     options = Column(JSON, nullable=True)
     correct_answers = Column(JSON, nullable=False)
     max_score = Column(Integer, nullable=False, default=1)
-    tags = Column(JSON, nullable=True, default=list)  # e.g., ["geography", "history"]
+    tags = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True, default=list)  # e.g., ["geography", "history"]
 
     exams = relationship("Exam", secondary=exam_questions, back_populates="questions")
 
 
+# Trigram operator classes need the pg_trgm extension before the indexes are built
+event.listen(
+    Question.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# SQLite stand-in for the trigram indexes: an external-content FTS5 table kept in
+# sync with questions by triggers (used by the test suite and local development)
+_QUESTION_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5("
+    "title, description, content='questions', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN "
+    "INSERT INTO questions_fts(rowid, title, description) "
+    "VALUES (new.rowid, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN "
+    "INSERT INTO questions_fts(questions_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE ON questions BEGIN "
+    "INSERT INTO questions_fts(questions_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); "
+    "INSERT INTO questions_fts(rowid, title, description) "
+    "VALUES (new.rowid, new.title, new.description); END",
+]
+for _statement in _QUESTION_FTS_DDL:
+    event.listen(Question.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Question.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS questions_fts").execute_if(dialect="sqlite"),
+)
+
+
 class Exam(Base):
     __tablename__ = "exams"
 
@@ -70,21 +134,82 @@ class Exam(Base):
     is_published = Column(Boolean, nullable=False, default=False)
     published_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)  # Admin who published
     target_candidates = Column(String, nullable=True)  # 'SSC', 'HSC', 'Admission' - who this exam is for
+    closed_at = Column(DateTime(timezone=True), nullable=True)  # Set by the exam-close job once end_time passed
+    provisioned_at = Column(DateTime(timezone=True), nullable=True)  # Pending attempts were bulk-created
 
     questions = relationship("Question", secondary=exam_questions, back_populates="exams")
     publisher = relationship("User", foreign_keys=[published_by])
 
 
+class ExamStatistics(Base):
+    """Score statistics precomputed when an exam closes."""
+    __tablename__ = "exam_statistics"
+
+    exam_id = Column(UUID(as_uuid=True), ForeignKey("exams.id", ondelete="CASCADE"), primary_key=True)
+    attempts_count = Column(Integer, nullable=False, default=0)
+    total_possible_score = Column(Float, nullable=True)
+    mean_score = Column(Float, nullable=True)
+    median_score = Column(Float, nullable=True)
+    min_score = Column(Float, nullable=True)
+    max_score = Column(Float, nullable=True)
+    stddev_score = Column(Float, nullable=True)
+    score_distribution = Column(JSON, nullable=True)  # Attempt counts per 10% band of total_possible_score
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+
 class ExamAttempt(Base):
     __tablename__ = "exam_attempts"
+    __table_args__ = (
+        # Partial index over open attempts only; the expiry sweeper scans it by deadline
+        Index(
+            "ix_exam_attempts_open_deadline",
+            "deadline_at",
+            postgresql_where=text("end_time IS NULL"),
+            sqlite_where=text("end_time IS NULL"),
+        ),
+        # At most one open attempt per student and exam; start_exam inserts with ON CONFLICT DO NOTHING
+        Index(
+            "uq_exam_attempts_open_per_student",
+            "exam_id",
+            "student_id",
+            unique=True,
+            postgresql_where=text("end_time IS NULL"),
+            sqlite_where=text("end_time IS NULL"),
+        ),
+        # Submitted attempts still waiting in the grading queue
+        Index(
+            "ix_exam_attempts_ungraded",
+            "end_time",
+            postgresql_where=text("end_time IS NOT NULL AND score IS NULL"),
+            sqlite_where=text("end_time IS NOT NULL AND score IS NULL"),
+        ),
+        # Graded attempts from before final scores were stored; empty once backfilled
+        Index(
+            "ix_exam_attempts_final_score_missing",
+            "id",
+            postgresql_where=text("score IS NOT NULL AND final_score IS NULL"),
+            sqlite_where=text("score IS NOT NULL AND final_score IS NULL"),
+        ),
+        # A student's attempt history, walked newest first by (end_time, id) keyset pages
+        Index("ix_exam_attempts_student_end_time", "student_id", "end_time", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    exam_id = Column(UUID(as_uuid=True), ForeignKey("exams.id"), nullable=False)
-    student_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    start_time = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    exam_id = Column(UUID(as_uuid=True), ForeignKey("exams.id", ondelete="CASCADE"), nullable=False, index=True)
+    student_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # NULL while the attempt is pre-provisioned and the student has not started yet
+    start_time = Column(DateTime(timezone=True), nullable=True, default=datetime.utcnow)
     end_time = Column(DateTime(timezone=True), nullable=True)
+    # min(start + duration, exam end), fixed when the attempt starts
+    deadline_at = Column(DateTime(timezone=True), nullable=True)
+    # Last heartbeat from the student's client, written in batches by the heartbeat flush job
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
     score = Column(Float, nullable=True)
     total_possible_score = Column(Float, nullable=True)
+    # score plus teacher-awarded points, capped at the total; kept current by grading.refresh_final_scores
+    final_score = Column(Float, nullable=True)
+    # Bumped whenever grading or evaluations change the attempt's result pages; part of the results cache key
+    results_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     exam = relationship("Exam")
     student = relationship("User")
@@ -92,11 +217,18 @@ class ExamAttempt(Base):
 
 class Answer(Base):
     __tablename__ = "answers"
+    __table_args__ = (
+        # One row per question per attempt; answer writes upsert on it
+        UniqueConstraint("attempt_id", "question_id", name="uq_answers_attempt_question"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    attempt_id = Column(UUID(as_uuid=True), ForeignKey("exam_attempts.id"), nullable=False)
-    question_id = Column(UUID(as_uuid=True), ForeignKey("questions.id"), nullable=False)
+    attempt_id = Column(UUID(as_uuid=True), ForeignKey("exam_attempts.id", ondelete="CASCADE"), nullable=False, index=True)
+    question_id = Column(UUID(as_uuid=True), ForeignKey("questions.id"), nullable=False, index=True)
     answer_data = Column(JSON, nullable=False)
+    # Sequence number of the write that stored answer_data, from the client or one past the attempt's latest
+    # for writes it did not number; writes with a lower number are ignored
+    client_seq = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
 
     attempt = relationship("ExamAttempt")
     question = relationship("Question")
@@ -106,7 +238,7 @@ class Evaluation(Base):
     __tablename__ = "evaluations"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    answer_id = Column(UUID(as_uuid=True), ForeignKey("answers.id"), nullable=False)
+    answer_id = Column(UUID(as_uuid=True), ForeignKey("answers.id", ondelete="CASCADE"), nullable=False, index=True)
     evaluated_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)  # Teacher/Admin
     is_correct = Column(Boolean, nullable=True)  # True=right, False=wrong, None=not evaluated
     comment = Column(String(100), nullable=True)  # Max 100 characters
@@ -0,0 +1,88 @@
+"""Events published on the event bus when exams and attempts change state.
+
+Student streams listen on their own channel plus the shared students
+channel; admin streams listen on the admin channel. Events only carry ids
+and small values; clients fetch anything larger through the regular API.
+"""
+import uuid
+from typing import Iterable
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .events import ADMIN_CHANNEL, STUDENTS_CHANNEL, event_bus, student_channel
+from .live import live_exams
+
+# Question types graded by a teacher rather than automatically
+MANUALLY_GRADED_TYPES = ("text", "image_upload")
+
+
+def exam_visibility_changed(exam_id: uuid.UUID, title: str, is_published: bool) -> None:
+    event_bus.publish(
+        STUDENTS_CHANNEL,
+        "exam_published" if is_published else "exam_unpublished",
+        {"exam_id": str(exam_id), "title": title},
+    )
+
+
+def attempts_submitted(rows: Iterable, auto: bool = False) -> None:
+    """``rows`` carry id, exam_id and student_id of attempts that were just closed."""
+    for row in rows:
+        live_exams.record_submit(row.exam_id, row.id)
+        data = {"attempt_id": str(row.id), "exam_id": str(row.exam_id)}
+        if auto:
+            event_bus.publish(student_channel(row.student_id), "attempt_auto_submitted", data)
+        event_bus.publish(ADMIN_CHANNEL, "attempt_submitted", {**data, "student_id": str(row.student_id), "auto": auto})
+
+
+def attempts_graded(db: Session, rows: Iterable, scores: dict[uuid.UUID, tuple[float, float]]) -> None:
+    """Tell students their score is ready and admins how many answers now wait for a teacher."""
+    exam_ids = set()
+    for row in rows:
+        if row.id not in scores:
+            continue
+        score, total = scores[row.id]
+        exam_ids.add(row.exam_id)
+        event_bus.publish(
+            student_channel(row.student_id),
+            "grading_finished",
+            {"attempt_id": str(row.id), "exam_id": str(row.exam_id), "score": score, "total_possible_score": total},
+        )
+    publish_pending_evaluations(db, exam_ids)
+
+
+def evaluation_posted(db: Session, attempt: models.ExamAttempt) -> None:
+    event_bus.publish(
+        student_channel(attempt.student_id),
+        "evaluation_posted",
+        {"attempt_id": str(attempt.id), "exam_id": str(attempt.exam_id)},
+    )
+    publish_pending_evaluations(db, {attempt.exam_id})
+
+
+def pending_evaluation_counts(db: Session, exam_ids: set[uuid.UUID]) -> dict[uuid.UUID, int]:
+    """Submitted answers to manually graded questions that have no evaluation yet, per exam."""
+    if not exam_ids:
+        return {}
+    rows = db.execute(
+        select(models.ExamAttempt.exam_id, func.count(models.Answer.id))
+        .join(models.Answer, models.Answer.attempt_id == models.ExamAttempt.id)
+        .join(models.Question, models.Question.id == models.Answer.question_id)
+        .outerjoin(models.Evaluation, models.Evaluation.answer_id == models.Answer.id)
+        .where(
+            models.ExamAttempt.exam_id.in_(exam_ids),
+            models.ExamAttempt.end_time.isnot(None),
+            models.Question.type.in_(MANUALLY_GRADED_TYPES),
+            models.Evaluation.id.is_(None),
+        )
+        .group_by(models.ExamAttempt.exam_id)
+    ).all()
+    counts = {exam_id: 0 for exam_id in exam_ids}
+    counts.update({exam_id: count for exam_id, count in rows})
+    return counts
+
+
+def publish_pending_evaluations(db: Session, exam_ids: set[uuid.UUID]) -> None:
+    for exam_id, count in pending_evaluation_counts(db, exam_ids).items():
+        event_bus.publish(ADMIN_CHANNEL, "pending_evaluations", {"exam_id": str(exam_id), "count": count})
@@ -1,18 +1,34 @@
+import asyncio
 import json
+import os
 from typing import Any
 from uuid import UUID
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status, Query, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, File, UploadFile, HTTPException, status, Query, Body, Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import openpyxl
 
 from ..database import get_db
-from .. import schemas, crud, models, security
+from .. import schemas, crud, models, notifications, security, grading, statistics
+from .. import search as search_module
+from ..facets import facet_index
+from ..live import LIVE_PUBLISH_INTERVAL_SECONDS, live_exams
+from ..admission import start_admission
+from ..events import ADMIN_CHANNEL, event_bus, stream_events
+from ..metrics import metrics
+from ..scheduler import scheduler
+from ..warmup import snapshot as warmup_snapshot
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Exams with more attempts than this are deleted in chunks after responding
+LARGE_EXAM_ATTEMPTS = 1000
+# Create pending attempts for every eligible student as soon as an exam is published
+PROVISION_ON_PUBLISH = os.getenv("PROVISION_ON_PUBLISH", "0") == "1"
+
 
 def get_current_admin_user(
     current_user: models.User = Depends(security.get_current_user),
@@ -27,42 +43,74 @@ def get_current_admin_user(
 
 @router.get("/questions/", response_model=list[schemas.Question])
 def list_questions(
+    response: Response,
     db: Session = Depends(get_db),
     _: models.User = Depends(get_current_admin_user),
-    search: str = Query(None, description="Search in title and complexity"),
+    search: str = Query(None, description="Search in title, description and complexity"),
     question_type: str = Query(None, description="Filter by question type"),
     complexity: str = Query(None, description="Filter by complexity"),
     tag: str = Query(None, description="Filter by tag"),
+    limit: int = Query(None, ge=1, le=1000, description="Page size (omit for all questions)"),
+    cursor: str = Query(None, description="Cursor from the X-Next-Cursor header"),
 ):
-    """List all questions for exam building with search and filter capabilities."""
-    query = db.query(models.Question)
-    
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            models.Question.title.ilike(search_pattern) | 
-            models.Question.complexity.ilike(search_pattern)
-        )
-    
-    if question_type:
-        query = query.filter(models.Question.type == question_type)
-    
-    if complexity:
-        # Normalize complexity to lowercase
-        complexity = complexity.lower()
-        query = query.filter(models.Question.complexity == complexity)
-    
-    if tag:
-        # Filter by tag - since tags is a JSON array, we need to check if tag is in the array
-        # Using PostgreSQL's JSON containment operator
-        from sqlalchemy import and_, or_
-        tag = tag.lower()
-        # Check if the tag is in the JSON array or if "others" is requested and no exact match
-        query = query.filter(
-            models.Question.tags.astext.contains(f'"{tag}"')
+    """List questions for exam building with search and filter capabilities."""
+    criteria = search_module.question_filters(db, search, question_type, complexity, tag)
+    try:
+        if limit is None:
+            return search_module.list_questions(db, criteria, cursor=cursor)
+        rows = search_module.list_questions(db, criteria, limit=limit + 1, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = search_module.encode_cursor(rows[limit - 1])
+    return rows[:limit]
+
+
+@router.get("/questions/search", response_model=schemas.QuestionPage)
+def search_questions(
+    db: Session = Depends(get_db),
+    _: models.User = Depends(get_current_admin_user),
+    search: str = Query(None, description="Search in title, description and complexity"),
+    question_type: str = Query(None, description="Filter by question type"),
+    complexity: str = Query(None, description="Filter by complexity"),
+    tag: str = Query(None, description="Filter by tag"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+):
+    """Keyset-paginated question search with a total-count estimate."""
+    try:
+        return search_module.search_questions(
+            db,
+            search=search,
+            question_type=question_type,
+            complexity=complexity,
+            tag=tag,
+            limit=limit,
+            cursor=cursor,
         )
-    
-    return query.all()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/questions/facets")
+def question_facets(
+    db: Session = Depends(get_db),
+    _: models.User = Depends(get_current_admin_user),
+    question_type: str = Query(None, description="Filter by question type"),
+    complexity: str = Query(None, description="Filter by complexity"),
+    tags: list[str] = Query(None, description="Filter by tags (all must match)"),
+    include_ids: bool = Query(False, description="Also return matching question IDs"),
+):
+    """Facet counts (and optionally matching IDs) for the question builder."""
+    facet_index.ensure_built(db)
+    result: dict[str, Any] = {
+        "total": facet_index.count(question_type, complexity, tags),
+        "facets": facet_index.facet_counts(question_type, complexity, tags),
+    }
+    if include_ids:
+        result["question_ids"] = [str(qid) for qid in facet_index.query(question_type, complexity, tags)]
+    return result
 
 
 @router.get("/questions/{question_id}", response_model=schemas.Question)
@@ -91,6 +139,9 @@ def delete_question(
     
     db.delete(question)
     db.commit()
+    facet_index.remove([question_id])
+    grading.invalidate_grading_plan()
+    crud.invalidate_exam_paper()
     return {"status": "success", "message": "Question deleted successfully"}
 
 
@@ -102,45 +153,16 @@ def delete_bulk_questions(
 ):
     """Delete multiple questions by IDs."""
     question_ids = request_body.get("question_ids", [])
-    deleted_count = 0
-    failed_count = 0
-    
-    for question_id in question_ids:
-        try:
-            qid = UUID(str(question_id))
-            
-            # First, find all answers for this question
-            answers = db.query(models.Answer).filter(
-                models.Answer.question_id == qid
-            ).all()
-            
-            # Delete evaluations that reference these answers
-            for answer in answers:
-                db.query(models.Evaluation).filter(
-                    models.Evaluation.answer_id == answer.id
-                ).delete(synchronize_session=False)
-            
-            # Then delete all answers for this question
-            db.query(models.Answer).filter(
-                models.Answer.question_id == qid
-            ).delete(synchronize_session=False)
-            
-            # Finally delete the question
-            question = crud.get_question_by_id(db, qid)
-            if question:
-                db.delete(question)
-                deleted_count += 1
-            
-            # Commit after each successful deletion to prevent transaction abort
-            db.commit()
-            
-        except Exception as e:
-            db.rollback()  # Rollback on error
-            failed_count += 1
+    results = crud.delete_questions_bulk(db, question_ids)
+    deleted_count = sum(1 for outcome in results.values() if outcome == "deleted")
+    failed_count = sum(1 for outcome in results.values() if outcome in ("failed", "invalid"))
+
+    facet_index.rebuild(db)
     return {
         "status": "success",
         "deleted": deleted_count,
-        "failed": failed_count
+        "failed": failed_count,
+        "results": results,
     }
 
 
@@ -303,6 +325,7 @@ async def upload_questions(
             max_score=max_score_val,
             tags=tags if tags else None,
         )
+        # create_question also adds the row to the facet index
         crud.create_question(db, q_schema)
         imported += 1
 
@@ -515,16 +538,25 @@ def create_exam(
     _: models.User = Depends(get_current_admin_user),
 ):
     """Create a new exam with associated questions."""
-    # Validate that all question IDs exist
-    for question_id in exam.question_ids:
-        question = crud.get_question_by_id(db, question_id)
-        if not question:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Question with ID {question_id} not found",
-            )
-    
-    return crud.create_exam(db, exam)
+    try:
+        return crud.create_exam(db, exam)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/exams/bulk", response_model=list[schemas.Exam])
+def create_exams_bulk(
+    payload: schemas.ExamBulkCreate,
+    db: Session = Depends(get_db),
+    _: models.User = Depends(get_current_admin_user),
+):
+    """Create many exams (e.g. per-cohort variants) in one transaction."""
+    if not payload.exams:
+        raise HTTPException(status_code=400, detail="No exams provided")
+    try:
+        return crud.create_exams_bulk(db, payload.exams)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.get("/exams/")
@@ -584,6 +616,10 @@ def publish_exam(
     exam.is_published = True
     exam.published_by = current_user.id  # Track which admin published
     db.commit()
+    crud.invalidate_exam_paper(exam_id)
+    notifications.exam_visibility_changed(exam.id, exam.title, True)
+    if PROVISION_ON_PUBLISH and exam.provisioned_at is None:
+        crud.provision_exam_attempts(db, exam)
     db.refresh(exam)
     
     # Get publisher email
@@ -615,6 +651,22 @@ def publish_exam(
     }
 
 
+@router.post("/exams/{exam_id}/provision-attempts")
+def provision_exam_attempts(
+    exam_id: UUID,
+    db: Session = Depends(get_db),
+    _: models.User = Depends(get_current_admin_user),
+):
+    """Pre-create pending attempts for all eligible students so starting is a single UPDATE."""
+    exam = db.get(models.Exam, exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if datetime.now(timezone.utc) > crud.as_utc(exam.end_time):
+        raise HTTPException(status_code=400, detail="Exam has already ended")
+    created = crud.provision_exam_attempts(db, exam)
+    return {"exam_id": str(exam_id), "attempts_created": created}
+
+
 @router.post("/exams/{exam_id}/unpublish")
 def unpublish_exam(
     exam_id: UUID,
@@ -628,6 +680,8 @@ def unpublish_exam(
     
     exam.is_published = False
     db.commit()
+    crud.invalidate_exam_paper(exam_id)
+    notifications.exam_visibility_changed(exam.id, exam.title, False)
     db.refresh(exam)
     
     # Get publisher email if exists
@@ -662,50 +716,123 @@ def unpublish_exam(
     }
 
 
+def _delete_exam_in_background(bind, exam_id: UUID) -> None:
+    with Session(bind=bind) as db:
+        crud.delete_exam_chunked(db, exam_id)
+
+
 @router.delete("/exams/{exam_id}")
 def delete_exam(
     exam_id: UUID,
+    background_tasks: BackgroundTasks,
+    background: bool = Query(
+        None,
+        description="Delete attempts in chunks after responding (default: only for large exams)",
+    ),
     db: Session = Depends(get_db),
     _: models.User = Depends(get_current_admin_user),
 ):
     """Delete an exam and all associated data."""
-    exam = crud.get_exam_by_id(db, exam_id)
+    exam = db.query(models.Exam).filter(models.Exam.id == exam_id).first()
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
-    
-    # Delete all attempts and their answers and evaluations
-    attempts = db.query(models.ExamAttempt).filter(
-        models.ExamAttempt.exam_id == exam_id
-    ).all()
-    
-    for attempt in attempts:
-        # Get all answers for this attempt
-        answers = db.query(models.Answer).filter(
-            models.Answer.attempt_id == attempt.id
-        ).all()
-        
-        # Delete evaluations for each answer first (respects FK constraint)
-        for answer in answers:
-            evals = db.query(models.Evaluation).filter(
-                models.Evaluation.answer_id == answer.id
-            ).all()
-            for eval_record in evals:
-                db.delete(eval_record)
-            # Delete the answer
-            db.delete(answer)
-        
-        # Finally delete attempt
-        db.delete(attempt)
-    
-    db.flush()  # Flush changes to ensure FK constraints are respected
-    
-    # Delete the exam (CASCADE will automatically delete exam_questions entries)
-    db.delete(exam)
-    db.commit()
-    
+
+    if background is None:
+        background = crud.count_exam_attempts(db, exam_id) > LARGE_EXAM_ATTEMPTS
+
+    if background:
+        # Hide the exam from students before the chunked delete starts
+        exam.is_published = False
+        db.commit()
+        background_tasks.add_task(_delete_exam_in_background, db.get_bind(), exam_id)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"status": "accepted", "message": "Exam deletion started"},
+        )
+
+    crud.delete_exam_cascade(db, exam_id)
     return {"status": "success", "message": "Exam deleted successfully"}
 
 
+@router.post("/exams/{exam_id}/regrade")
+def regrade_exam(
+    exam_id: UUID,
+    db: Session = Depends(get_db),
+    _: models.User = Depends(get_current_admin_user),
+):
+    """Re-score all submitted attempts of an exam after its answer key changed."""
+    summary = grading.regrade_exam(db, exam_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    # Stored statistics of a closed exam would otherwise keep the old scores
+    if db.get(models.ExamStatistics, exam_id) is not None:
+        statistics.save_exam_statistics(db, exam_id)
+    return summary
+
+
+@router.get("/exams/{exam_id}/statistics")
+def get_exam_statistics(
+    exam_id: UUID,
+    db: Session = Depends(get_db),
+    _: models.User = Depends(get_current_admin_user),
+):
+    """Score statistics for an exam.
+
+    Closed exams return the row precomputed by the exam-close job
+    ("final": true); running exams are summarized on the fly.
+    """
+    exam = db.get(models.Exam, exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    stored = db.get(models.ExamStatistics, exam_id)
+    if exam.closed_at is not None and stored is not None:
+        return {**statistics.serialize_statistics(stored), "final": True}
+    return {**statistics.serialize_statistics(statistics.compute_exam_statistics(db, exam_id)), "final": False}
+
+
+@router.get("/exams/{exam_id}/live")
+def get_exam_live(
+    exam_id: UUID,
+    db: Session = Depends(get_db),
+    _: models.User = Depends(get_current_admin_user),
+):
+    """Live proctoring counters for a running exam, aggregated over all workers."""
+    return live_exams.snapshot(db, exam_id)
+
+
+@router.get("/exams/{exam_id}/live/stream")
+async def stream_exam_live(
+    exam_id: UUID,
+    request: Request,
+    token: str = Query(...),
+    db: Session = Depends(get_db),
+):
+    """The live counters as server-sent events, one ``live`` event per publish interval."""
+    try:
+        user = await run_in_threadpool(security.get_user_from_token, db, token)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+        if user.role != "admin":
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+        # Seeds the board from the database once; later snapshots are memory only
+        first = await run_in_threadpool(live_exams.snapshot, db, exam_id)
+    finally:
+        db.close()
+
+    async def stream():
+        snapshot = first
+        while not await request.is_disconnected():
+            yield f"event: live\ndata: {json.dumps(snapshot)}\n\n"
+            await asyncio.sleep(LIVE_PUBLISH_INTERVAL_SECONDS)
+            snapshot = await run_in_threadpool(live_exams.snapshot, db, exam_id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/exams/{exam_id}/attempts")
 def get_exam_attempts(
     exam_id: UUID,
@@ -720,7 +847,8 @@ def get_exam_attempts(
     
     # Get all attempts for this exam
     attempts = db.query(models.ExamAttempt).filter(
-        models.ExamAttempt.exam_id == exam_id
+        models.ExamAttempt.exam_id == exam_id,
+        models.ExamAttempt.start_time.isnot(None),  # Skip pre-provisioned, never-started rows
     ).all()
     
     # Build response with student info and calculated scores
@@ -892,6 +1020,7 @@ def evaluate_answer(
     eval_record = crud.create_or_update_evaluation(
         db, answer_id, current_user.id, evaluation
     )
+    notifications.evaluation_posted(db, answer.attempt)
     return eval_record
 
 
@@ -979,29 +1108,8 @@ def delete_student(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Delete all attempts and their answers
-    attempts = db.query(models.ExamAttempt).filter(
-        models.ExamAttempt.student_id == student_id
-    ).all()
-    
-    for attempt in attempts:
-        # Delete evaluations for answers in this attempt
-        answers = db.query(models.Answer).filter(
-            models.Answer.attempt_id == attempt.id
-        ).all()
-        
-        for answer in answers:
-            db.query(models.Evaluation).filter(
-                models.Evaluation.answer_id == answer.id
-            ).delete()
-            db.delete(answer)
-        
-        db.delete(attempt)
-    
-    # Delete the student
-    db.delete(student)
-    db.commit()
-    
+    crud.delete_student_cascade(db, student_id)
+
     return {"status": "success", "message": "Student deleted successfully with all their attempts and answers"}
 
 
@@ -1148,6 +1256,8 @@ def evaluate_exam_attempt(
         
         db.commit()
     
+    crud.evaluations_changed(db, attempt.id)
+    notifications.evaluation_posted(db, attempt)
     return {"status": "success", "message": "Evaluation saved successfully"}
 
 
@@ -1316,6 +1426,8 @@ def submit_answer_evaluation(
             db.add(evaluation)
         
         db.commit()
+        crud.evaluations_changed(db, answer.attempt_id)
+        notifications.evaluation_posted(db, answer.attempt)
         
         return {
             "status": "success",
@@ -1330,4 +1442,39 @@ def submit_answer_evaluation(
         import traceback
         print(f"Error in submit_answer_evaluation: {str(e)}")
         print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/metrics")
+def get_metrics(_: models.User = Depends(get_current_admin_user)):
+    """Process-local metrics, background job and exam-start admission status."""
+    return {"metrics": metrics.snapshot(), "scheduler": scheduler.status(), "admission": start_admission.status()}
+
+
+@router.get("/warmup")
+def get_warmup_status(_: models.User = Depends(get_current_admin_user)):
+    """Cache warm-up status of this process for exams starting soon."""
+    return warmup_snapshot()
+
+
+@router.get("/events")
+async def admin_events(
+    request: Request,
+    token: str = Query(...),
+    db: Session = Depends(get_db),
+):
+    """Server-sent events for admins: attempt_submitted and pending_evaluations counts per exam."""
+    try:
+        user = await run_in_threadpool(security.get_user_from_token, db, token)
+    finally:
+        db.close()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    if user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    subscription = event_bus.subscribe({ADMIN_CHANNEL})
+    return StreamingResponse(
+        stream_events(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,29 @@
+import hashlib
+import json
+import time
 from uuid import UUID
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from .. import schemas, crud, models, security
+from .. import schemas, crud, models, notifications, security
+from ..admission import start_admission
+from ..events import STUDENTS_CHANNEL, event_bus, stream_events, student_channel
+from ..exam_session import serve_exam_session
+from ..grading_queue import grading_queue
+from ..heartbeats import heartbeat_store
+from ..live import live_exams
+
+# Long-polling status requests wake on grading_finished events and also
+# re-read the attempt this often, in case an event was missed
+STATUS_POLL_SECONDS = 5.0
+# Attempts per dashboard section; the rest is paged through the history endpoints
+DASHBOARD_PAGE_SIZE = 20
 
 router = APIRouter(prefix="/student", tags=["Student"])
 
@@ -28,7 +46,7 @@ def list_available_exams(
     current_user: models.User = Depends(get_current_student_user),
 ):
     """List all published exams available to students based on their exam_candidate selection."""
-    exams = crud.get_available_exams(db)
+    exams = crud.get_available_exam_papers(db)
     now = datetime.now(timezone.utc)
     
     # Filter exams based on student's exam_candidate
@@ -39,86 +57,142 @@ def list_available_exams(
         if exam.target_candidates is None or exam.target_candidates == current_user.exam_candidate:
             filtered_exams.append(exam)
     
-    result = []
-    for exam in filtered_exams:
-        # Get publisher email if published
-        publisher_email = None
-        if exam.published_by:
-            publisher = db.query(models.User).filter(models.User.id == exam.published_by).first()
-            publisher_email = publisher.email if publisher else "Unknown"
-        
-        # Determine exam status
-        is_expired = now > exam.end_time
-        is_upcoming = now < exam.start_time
-        is_active = not is_expired and not is_upcoming
-        
-        # Manually build exam dict
-        exam_dict = {
-            "id": str(exam.id),
-            "title": exam.title,
-            "start_time": exam.start_time.isoformat(),
-            "end_time": exam.end_time.isoformat(),
-            "duration_minutes": exam.duration_minutes,
-            "is_published": exam.is_published,
-            "published_by": publisher_email,
-            "target_candidates": exam.target_candidates,
-            "is_expired": is_expired,
-            "is_upcoming": is_upcoming,
-            "is_active": is_active,
-            "questions": [
-                {
-                    "id": str(q.id),
-                    "title": q.title,
-                    "complexity": q.complexity,
-                    "type": q.type,
-                    "options": q.options,
-                    "max_score": q.max_score,
-                    "tags": q.tags,
-                }
-                for q in (exam.questions or [])
-            ],
-        }
-        result.append(exam_dict)
-    return result
+    return [{**_exam_summary(exam, now), "questions": exam.question_list()} for exam in filtered_exams]
+
+
+def _exam_summary(exam: crud.ExamPaper, now: datetime) -> dict:
+    is_expired = now > exam.end_time
+    is_upcoming = now < exam.start_time
+    return {
+        "id": str(exam.id),
+        "title": exam.title,
+        "start_time": exam.start_time.isoformat(),
+        "end_time": exam.end_time.isoformat(),
+        "duration_minutes": exam.duration_minutes,
+        "is_published": exam.is_published,
+        "published_by": exam.published_by,
+        "target_candidates": exam.target_candidates,
+        "is_expired": is_expired,
+        "is_upcoming": is_upcoming,
+        "is_active": not is_expired and not is_upcoming,
+    }
+
+
+def _unfinished_attempt_dict(row) -> dict:
+    """Entry of the unfinished attempts list, from a ``crud.get_student_attempts`` row."""
+    return {
+        "id": str(row.id),
+        "exam_id": str(row.exam_id),
+        "student_id": str(row.student_id),
+        "start_time": crud.as_utc(row.start_time).isoformat(),
+        "end_time": None,
+        "score": row.score,
+        "total_possible_score": row.total_possible_score,
+        "exam": {
+            "id": str(row.exam_id),
+            "title": row.exam_title,
+            "start_time": crud.as_utc(row.exam_start_time).isoformat(),
+            "end_time": crud.as_utc(row.exam_end_time).isoformat(),
+            "duration_minutes": row.duration_minutes,
+            "is_published": row.is_published,
+            "target_candidates": row.target_candidates,
+        },
+    }
+
+
+def _completed_exam_dict(row) -> dict:
+    """Entry of the completed exams list, from a ``crud.get_student_attempts`` row."""
+    score = crud.final_score(row)
+    percentage = 0
+    if row.total_possible_score and row.total_possible_score > 0:
+        percentage = (score / row.total_possible_score) * 100
+    return {
+        "id": str(row.id),
+        "exam_id": str(row.exam_id),
+        "exam_title": row.exam_title,
+        "score": score,
+        "total_possible_score": row.total_possible_score,
+        "percentage": round(percentage, 2),
+        "end_time": crud.as_utc(row.end_time).isoformat(),
+    }
+
+
+def _etag_response(request: Request, payload) -> Response:
+    """JSON response with a content ETag; 304 without a body when the client already has it."""
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":"), sort_keys=True)
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    # private: per-student data; no-cache: revalidate every time, which is cheap on a match
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/dashboard")
+def student_dashboard(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_student_user),
+):
+    """Available exams plus the first page of unfinished attempts and completed exams (no question payloads).
+
+    Each attempt section comes with the cursor of its next page (or None) for
+    ``/unfinished-attempts/`` and ``/completed-exams/``.
+    """
+    now = datetime.now(timezone.utc)
+    exams = [
+        _exam_summary(exam, now)
+        for exam in crud.get_available_exam_papers(db)
+        if exam.target_candidates is None or exam.target_candidates == current_user.exam_candidate
+    ]
+    unfinished, unfinished_cursor = _attempt_page(db, current_user, False, DASHBOARD_PAGE_SIZE)
+    completed, completed_cursor = _attempt_page(db, current_user, True, DASHBOARD_PAGE_SIZE)
+    return _etag_response(request, {
+        "exams": exams,
+        "unfinished_attempts": [_unfinished_attempt_dict(row) for row in unfinished],
+        "unfinished_next_cursor": unfinished_cursor,
+        "completed_exams": [_completed_exam_dict(row) for row in completed],
+        "completed_next_cursor": completed_cursor,
+    })
 
 
 @router.get("/unfinished-attempts/")
 def list_unfinished_attempts(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_student_user),
+    limit: int = Query(None, ge=1, le=500, description="Page size (omit for all attempts)"),
+    cursor: str = Query(None, description="Cursor from the X-Next-Cursor header"),
+    since: datetime = Query(None, description="Only attempts started at or after this time"),
+    until: datetime = Query(None, description="Only attempts started before this time"),
 ):
-    """List all unfinished exam attempts for the current student."""
-    # Simple query: get all attempts where end_time is NULL (unfinished)
-    attempts = db.query(models.ExamAttempt).filter(
-        models.ExamAttempt.student_id == current_user.id,
-        models.ExamAttempt.end_time.is_(None)
-    ).all()
-    
-    # Build response with exam details
-    result = []
-    for attempt in attempts:
-        exam = crud.get_exam_by_id(db, attempt.exam_id)
-        if exam:
-            result.append({
-                "id": str(attempt.id),
-                "exam_id": str(attempt.exam_id),
-                "student_id": str(attempt.student_id),
-                "start_time": attempt.start_time.isoformat(),
-                "end_time": attempt.end_time.isoformat() if attempt.end_time else None,
-                "score": attempt.score,
-                "total_possible_score": attempt.total_possible_score,
-                "exam": {
-                    "id": str(exam.id),
-                    "title": exam.title,
-                    "start_time": exam.start_time.isoformat(),
-                    "end_time": exam.end_time.isoformat(),
-                    "duration_minutes": exam.duration_minutes,
-                    "is_published": exam.is_published,
-                    "target_candidates": exam.target_candidates,
-                }
-            })
-    
-    return result
+    """List the current student's unfinished exam attempts, most recently started first."""
+    return _attempt_history_page(
+        response, db, current_user, False, limit, cursor, since, until, _unfinished_attempt_dict
+    )
+
+
+def _attempt_history_page(response, db, current_user, finished, limit, cursor, since, until, to_dict) -> list[dict]:
+    """One keyset page of the student's attempts; the next page's cursor goes in X-Next-Cursor."""
+    try:
+        rows, next_cursor = _attempt_page(db, current_user, finished, limit, cursor, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [to_dict(row) for row in rows]
+
+
+def _attempt_page(db, current_user, finished, limit, cursor=None, since=None, until=None):
+    """Rows of one keyset page and the cursor of the next one (None on the last page or without a limit)."""
+    rows = crud.get_student_attempts(
+        db, current_user.id, finished, limit=limit + 1 if limit else None,
+        cursor=cursor, since=since, until=until,
+    )
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, crud.encode_attempt_cursor(rows[-1], finished)
 
 
 @router.post("/exams/{exam_id}/start")
@@ -127,13 +201,30 @@ def start_exam(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_student_user),
 ):
-    """Start an exam attempt for the current student."""
+    """Start an exam attempt for the current student.
+
+    Starts pass through a waiting room: over the concurrent-start budget the
+    request is answered with 429, the student's place in line and a
+    Retry-After hint. The attempt (and its timer) is only created once admitted.
+    """
+    admission = start_admission.try_admit((exam_id, current_user.id))
+    if not admission.admitted:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "message": "Waiting to start the exam",
+                "position": admission.position,
+                "retry_after_seconds": admission.retry_after_seconds,
+            },
+            headers={"Retry-After": str(admission.retry_after_seconds)},
+        )
+    with start_admission.slot():
+        return _start_admitted_exam(exam_id, db, current_user)
+
+
+def _start_admitted_exam(exam_id: UUID, db: Session, current_user: models.User) -> dict:
     try:
-        # CRITICAL: Expire all objects at the very start to prevent race conditions
-        # This ensures we get fresh reads from the database for the existence check
-        db.expire_all()
-        
-        exam = crud.get_exam_by_id(db, exam_id)
+        exam = crud.get_exam_paper(db, exam_id)
         if not exam:
             raise HTTPException(status_code=404, detail="Exam not found")
         
@@ -157,32 +248,17 @@ def start_exam(
                 detail="Exam time has expired. You can no longer take this exam",
             )
         
-        # Check if student already has an unfinished attempt for this exam
-        existing_attempt = (
-            db.query(models.ExamAttempt)
-            .filter(
-                models.ExamAttempt.exam_id == exam_id,
-                models.ExamAttempt.student_id == current_user.id,
-                models.ExamAttempt.end_time.is_(None)
-            )
-            .first()
-        )
-        
-        if existing_attempt:
-            # Return existing attempt instead of creating a new one
-            attempt = existing_attempt
+        # One round trip in the common case; concurrent starts share one open attempt
+        attempt = crud.start_exam_attempt(db, exam, current_user.id, now)
+        if crud.as_utc(attempt.start_time) == now:
+            live_exams.record_start(exam.id, attempt.id)
         else:
-            # Create a new exam attempt
-            attempt = crud.create_exam_attempt(db, exam_id, current_user.id)
-            # Immediately commit to ensure it's in the database
-            db.commit()
+            # Already started earlier; this is the student coming back
+            live_exams.record_activity(exam.id, attempt.id)
         
         # Build response without strict validation
-        # Timer is based purely on exam duration
-        duration_seconds = exam.duration_minutes * 60
-        # Calculate remaining time based on attempt start time and exam duration
-        elapsed_seconds = int((now - attempt.start_time).total_seconds())
-        time_remaining_seconds = max(0, duration_seconds - elapsed_seconds)
+        # Timer comes from the attempt's stored deadline
+        time_remaining_seconds = crud.seconds_remaining(attempt, now)
         
         exam_dict = {
             "id": str(exam.id),
@@ -191,17 +267,7 @@ def start_exam(
             "end_time": exam.end_time.isoformat(),
             "duration_minutes": exam.duration_minutes,
             "is_published": exam.is_published,
-            "questions": [
-                {
-                    "id": str(q.id),
-                    "title": q.title,
-                    "type": q.type,
-                    "complexity": q.complexity,
-                    "max_score": q.max_score,
-                    "options": q.options,
-                }
-                for q in (exam.questions or [])
-            ],
+            "questions": exam.question_list(),
             "time_remaining_seconds": max(0, time_remaining_seconds),
             "exam_end_time": exam.end_time.isoformat(),
         }
@@ -212,6 +278,7 @@ def start_exam(
             "student_id": str(attempt.student_id),
             "start_time": attempt.start_time.isoformat(),
             "end_time": attempt.end_time.isoformat() if (attempt.end_time is not None) else None,
+            "deadline_at": crud.as_utc(attempt.deadline_at).isoformat(),
             "score": attempt.score,
             "total_possible_score": attempt.total_possible_score,
         }
@@ -234,17 +301,23 @@ def start_exam(
 @router.post("/attempts/{attempt_id}/resume")
 def resume_exam(
     attempt_id: UUID,
+    since_seq: int | None = Query(None, ge=0),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_student_user),
 ):
-    """Resume an existing exam attempt for the current student."""
+    """Resume an existing exam attempt for the current student.
+
+    With ``since_seq`` the response also carries the answers stored by writes
+    numbered after it (all answers for 0) and ``last_seq`` to continue from.
+    """
     # Get the attempt and verify ownership
     attempt = (
         db.query(models.ExamAttempt)
         .filter(
             models.ExamAttempt.id == attempt_id,
             models.ExamAttempt.student_id == current_user.id,
-            models.ExamAttempt.end_time.is_(None)  # Must be unfinished
+            models.ExamAttempt.end_time.is_(None),  # Must be unfinished
+            models.ExamAttempt.start_time.isnot(None),  # and actually started
         )
         .first()
     )
@@ -255,43 +328,45 @@ def resume_exam(
             detail="Unfinished attempt not found or does not belong to you",
         )
     
-    # Get the exam
-    exam = crud.get_exam_by_id(db, attempt.exam_id)
-    if not exam:
-        raise HTTPException(status_code=404, detail="Exam not found")
-    
-    if not exam.is_published:
-        raise HTTPException(
-            status_code=400,
-            detail="Exam is not published anymore",
-        )
-    
-    # Check if exam time has expired
+    # Timing comes from the attempt row alone: its deadline was fixed at start
     now = datetime.now(timezone.utc)
-    if now > exam.end_time:
+    deadline = crud.get_attempt_deadline(db, attempt)
+    live_exams.record_activity(attempt.exam_id, attempt.id)
+    if now > deadline:
         # Auto-submit the exam
-        crud.calculate_and_save_score(db, attempt)
-        attempt = db.query(models.ExamAttempt).filter(
-            models.ExamAttempt.id == attempt_id
-        ).first()
+        exam = db.get(models.Exam, attempt.exam_id)
+        claimed = crud.claim_submission(db, attempt.id, current_user.id, now)
+        if claimed is not None:
+            notifications.attempts_submitted([claimed], auto=True)
+            grading_queue.submit(db, attempt.id)
+        db.refresh(attempt)
         return {
-            "exam": {"id": str(exam.id), "title": exam.title, "auto_submitted": True},
+            "exam": {"id": str(attempt.exam_id), "title": exam.title if exam else None, "auto_submitted": True},
             "attempt": {
                 "id": str(attempt.id),
                 "exam_id": str(attempt.exam_id),
                 "student_id": str(attempt.student_id),
                 "start_time": attempt.start_time.isoformat(),
                 "end_time": attempt.end_time.isoformat() if (attempt.end_time is not None) else None,
+                "deadline_at": deadline.isoformat(),
                 "score": attempt.score,
                 "total_possible_score": attempt.total_possible_score,
             },
         }
     
+    # Get the exam paper
+    exam = crud.get_exam_paper(db, attempt.exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    
+    if not exam.is_published:
+        raise HTTPException(
+            status_code=400,
+            detail="Exam is not published anymore",
+        )
+    
     # Return exam details (without correct_answers) and attempt info
-    # Calculate remaining time based on attempt start time and exam duration
-    elapsed_seconds = int((now - attempt.start_time).total_seconds())
-    total_duration_seconds = exam.duration_minutes * 60
-    time_remaining_seconds = max(0, total_duration_seconds - elapsed_seconds)
+    time_remaining_seconds = max(0, int((deadline - now).total_seconds()))
     
     exam_dict = {
         "id": str(exam.id),
@@ -300,17 +375,7 @@ def resume_exam(
         "end_time": exam.end_time.isoformat(),
         "duration_minutes": exam.duration_minutes,
         "is_published": exam.is_published,
-        "questions": [
-            {
-                "id": str(q.id),
-                "title": q.title,
-                "type": q.type,
-                "complexity": q.complexity,
-                "max_score": q.max_score,
-                "options": q.options,
-            }
-            for q in (exam.questions or [])
-        ],
+        "questions": exam.question_list(),
         "time_remaining_seconds": max(0, time_remaining_seconds),
         "exam_end_time": exam.end_time.isoformat(),
     }
@@ -320,14 +385,21 @@ def resume_exam(
         "student_id": str(attempt.student_id),
         "start_time": attempt.start_time.isoformat(),
         "end_time": attempt.end_time.isoformat() if (attempt.end_time is not None) else None,
+        "deadline_at": deadline.isoformat(),
         "score": attempt.score,
         "total_possible_score": attempt.total_possible_score,
     }
     
-    return {
+    response = {
         "exam": exam_dict,
         "attempt": attempt_dict,
     }
+    if since_seq is not None:
+        answers = crud.get_answers(db, attempt.id, since_seq)
+        response["answers"] = [schemas.Answer.model_validate(a) for a in answers]
+        # Every answer numbered after since_seq is in the list, so its maximum is the latest write
+        response["last_seq"] = max([since_seq, *(a.client_seq for a in answers)])
+    return response
 
 
 @router.post("/attempts/{attempt_id}/save-answer")
@@ -339,79 +411,176 @@ def save_answer(
 ):
     """Auto-save a student's answer to a question."""
     try:
-        crud.save_answer(db, attempt_id, current_user.id, answer_in)
-        return {"status": "saved"}
+        stored = crud.save_answer(db, attempt_id, current_user.id, answer_in)
+        # "stale": a write with the same or a later client_seq is already stored
+        return {"status": "saved" if stored is not None else "stale"}
     except ValueError as e:
         raise HTTPException(status_code=403, detail=str(e))
 
 
-@router.post("/attempts/{attempt_id}/submit")
-def submit_exam(
+@router.post("/attempts/{attempt_id}/heartbeat")
+def attempt_heartbeat(
     attempt_id: UUID,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_student_user),
 ):
-    """Submit the exam attempt and calculate the score."""
-    # Get the attempt and verify ownership
-    attempt = (
-        db.query(models.ExamAttempt)
-        .filter(
-            models.ExamAttempt.id == attempt_id,
-            models.ExamAttempt.student_id == current_user.id,
-        )
-        .first()
-    )
-    
-    if not attempt:
+    """Record that the student's exam page is still open; stored in memory and written in batches."""
+    attempt = crud.get_attempt_ref(db, attempt_id)
+    if attempt is None or attempt.student_id != current_user.id:
         raise HTTPException(
             status_code=404,
             detail="Attempt not found or does not belong to you",
         )
-    
-    if attempt.end_time is not None:
+    now = datetime.now(timezone.utc)
+    heartbeat_store.beat(attempt_id, now)
+    live_exams.record_activity(attempt.exam_id, attempt_id)
+    return {
+        "server_time": now.isoformat(),
+        "seconds_remaining": max(0, int((attempt.deadline_at - now).total_seconds())) if attempt.deadline_at else None,
+    }
+
+
+@router.websocket("/attempts/{attempt_id}/ws")
+async def exam_session_socket(
+    websocket: WebSocket,
+    attempt_id: UUID,
+):
+    """Stream answers and receive acks, time sync and auto-submit over one authenticated socket.
+
+    The access token comes in the first frame, not the URL; see ``app.exam_session``.
+    """
+    await serve_exam_session(websocket, attempt_id)
+
+
+@router.post("/attempts/{attempt_id}/submit", status_code=202)
+def submit_exam(
+    attempt_id: UUID,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_student_user),
+):
+    """Submit the exam attempt and queue it for grading.
+
+    Returns 202 with state "grading" while the score is being computed; poll
+    /attempts/{id}/status for completion. If the attempt was graded inline the
+    response is 200 with state "graded" and the score.
+    """
+    # Claim the attempt with one conditional UPDATE; only the winner of concurrent submits grades it
+    attempt = crud.claim_submission(db, attempt_id, current_user.id)
+    if attempt is None:
+        existing = (
+            db.query(models.ExamAttempt)
+            .filter(
+                models.ExamAttempt.id == attempt_id,
+                models.ExamAttempt.student_id == current_user.id,
+            )
+            .first()
+        )
+        if not existing:
+            raise HTTPException(
+                status_code=404,
+                detail="Attempt not found or does not belong to you",
+            )
+        if existing.start_time is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Exam not started",
+            )
         raise HTTPException(
             status_code=400,
             detail="Exam already submitted",
         )
+    notifications.attempts_submitted([attempt])
     
-    # Calculate and save score
     try:
-        # Store these values BEFORE calling calculate_and_save_score which may expunge the session
-        attempt_id = str(attempt.id)
-        exam_id = str(attempt.exam_id)
-        student_id = str(attempt.student_id)
-        start_time = attempt.start_time.isoformat()
-        
-        updated_attempt = crud.calculate_and_save_score(db, attempt)
-        
-        # Store the returned values as well
-        end_time = updated_attempt.end_time.isoformat() if updated_attempt.end_time else None
-        score = updated_attempt.score
-        total = updated_attempt.total_possible_score
-        
-        # Return manually built response instead of using response_model
-        return {
-            "id": attempt_id,
-            "exam_id": exam_id,
-            "student_id": student_id,
-            "start_time": start_time,
-            "end_time": end_time,
-            "score": score,
-            "total_possible_score": total,
-        }
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        if not grading_queue.submit(db, attempt.id):
+            # Graded inline: re-read the row for the score
+            attempt = db.get(models.ExamAttempt, attempt.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
+    
+    state = crud.attempt_state(attempt)
+    if state == "graded":
+        response.status_code = status.HTTP_200_OK
+    
+    # Return manually built response instead of using response_model
+    return {
+        "id": str(attempt.id),
+        "exam_id": str(attempt.exam_id),
+        "student_id": str(attempt.student_id),
+        "start_time": attempt.start_time.isoformat(),
+        "end_time": attempt.end_time.isoformat() if attempt.end_time else None,
+        "score": attempt.score,
+        "total_possible_score": attempt.total_possible_score,
+        "state": state,
+    }
+
+
+def _read_attempt_status(db: Session, attempt_id: UUID, student_id: UUID) -> dict | None:
+    attempt = (
+        db.query(models.ExamAttempt)
+        .filter(
+            models.ExamAttempt.id == attempt_id,
+            models.ExamAttempt.student_id == student_id,
+        )
+        .first()
+    )
+    if not attempt:
+        return None
+    return {
+        "id": str(attempt.id),
+        "state": crud.attempt_state(attempt),
+        "end_time": attempt.end_time.isoformat() if attempt.end_time else None,
+        "score": attempt.score,
+        "total_possible_score": attempt.total_possible_score,
+    }
+
+
+@router.get("/attempts/{attempt_id}/status")
+async def get_attempt_status(
+    attempt_id: UUID,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to long-poll while the attempt is grading"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_student_user),
+):
+    """Return the attempt's grading state: in_progress, grading or graded.
+
+    While waiting the request holds no thread and no connection: it sleeps on
+    the student's event channel and re-reads the row when grading_finished
+    arrives for this attempt (from any process) or every STATUS_POLL_SECONDS.
+    """
+    student_id = current_user.id
+    # Subscribe before the first read so an event published in between is not lost
+    subscription = event_bus.subscribe({student_channel(student_id)}) if wait > 0 else None
+    try:
+        give_up_at = time.monotonic() + wait
+        while True:
+            try:
+                body = await run_in_threadpool(_read_attempt_status, db, attempt_id, student_id)
+            finally:
+                db.close()
+            if body is None:
+                raise HTTPException(status_code=404, detail="Attempt not found or does not belong to you")
+            recheck_at = min(give_up_at, time.monotonic() + STATUS_POLL_SECONDS)
+            while body["state"] == "grading" and (remaining := recheck_at - time.monotonic()) > 0:
+                event = await subscription.get(timeout=remaining)
+                if event is not None and event.type == "grading_finished" and event.data.get("attempt_id") == body["id"]:
+                    break
+            if body["state"] != "grading" or time.monotonic() >= give_up_at:
+                return body
+    finally:
+        if subscription is not None:
+            event_bus.unsubscribe(subscription)
 
 
 @router.get("/attempts/{attempt_id}/answers")
 def get_attempt_answers(
     attempt_id: UUID,
+    since_seq: int | None = Query(None, ge=0),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_student_user),
 ):
-    """Get all answers for a specific exam attempt."""
+    """Get the answers for a specific exam attempt, or those written after ``since_seq``."""
     # Verify attempt belongs to the current student
     attempt = (
         db.query(models.ExamAttempt)
@@ -428,11 +597,7 @@ def get_attempt_answers(
         )
     
     # Fetch student's answers for this attempt
-    answers = (
-        db.query(models.Answer)
-        .filter(models.Answer.attempt_id == attempt_id)
-        .all()
-    )
+    answers = crud.get_answers(db, attempt_id, since_seq)
     
     return [schemas.Answer.model_validate(a) for a in answers]
 
@@ -459,6 +624,12 @@ def get_attempt_results(
     if attempt.end_time is None:
         raise HTTPException(status_code=400, detail="Exam not submitted")
 
+    # Submitted results only change with grading or evaluations, which bump results_version
+    return crud.get_attempt_results(attempt, "results", lambda: _load_attempt_results(db, attempt))
+
+
+def _load_attempt_results(db: Session, attempt: models.ExamAttempt) -> dict:
+    """Build the results page of a submitted attempt; served through the results cache."""
     # Fetch the full exam (with correct answers)
     exam = crud.get_exam_by_id(db, attempt.exam_id)
     if not exam:
@@ -511,59 +682,18 @@ def get_attempt_results(
 
 @router.get("/completed-exams/")
 def list_completed_exams(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_student_user),
+    limit: int = Query(None, ge=1, le=500, description="Page size (omit for all attempts)"),
+    cursor: str = Query(None, description="Cursor from the X-Next-Cursor header"),
+    since: datetime = Query(None, description="Only attempts submitted at or after this time"),
+    until: datetime = Query(None, description="Only attempts submitted before this time"),
 ):
-    """List all completed exams for the current student with their scores."""
-    # Get all completed attempts (end_time is not None)
-    attempts = (
-        db.query(models.ExamAttempt)
-        .filter(
-            models.ExamAttempt.student_id == current_user.id,
-            models.ExamAttempt.end_time.isnot(None)
-        )
-        .all()
+    """List the current student's completed exams with their final scores, most recent first."""
+    return _attempt_history_page(
+        response, db, current_user, True, limit, cursor, since, until, _completed_exam_dict
     )
-    
-    result = []
-    for attempt in attempts:
-        exam = crud.get_exam_by_id(db, attempt.exam_id)
-        if exam:
-            # Get all answers for this attempt
-            answers = (
-                db.query(models.Answer)
-                .filter(models.Answer.attempt_id == attempt.id)
-                .all()
-            )
-            
-            # Calculate final score with manual evaluations included
-            manual_score_total = 0.0
-            for answer in answers:
-                eval_record = crud.get_evaluation_by_answer(db, answer.id)
-                if eval_record and eval_record.score_awarded is not None:
-                    question = crud.get_question_by_id(db, answer.question_id)
-                    if question and question.type in ("text", "image_upload"):
-                        manual_score_total += float(eval_record.score_awarded)
-            
-            # Final score: auto-graded + manual scores (capped at total)
-            final_score = min(attempt.score + manual_score_total, attempt.total_possible_score or 0)
-            
-            # Calculate percentage
-            percentage = 0
-            if attempt.total_possible_score and attempt.total_possible_score > 0:
-                percentage = (final_score / attempt.total_possible_score) * 100
-            
-            result.append({
-                "id": str(attempt.id),
-                "exam_id": str(attempt.exam_id),
-                "exam_title": exam.title,
-                "score": final_score,
-                "total_possible_score": attempt.total_possible_score,
-                "percentage": round(percentage, 2),
-                "end_time": attempt.end_time.isoformat(),
-            })
-    
-    return result
 
 
 @router.get("/attempts/{attempt_id}/evaluated-results")
@@ -587,6 +717,11 @@ def get_evaluated_results(
     if not attempt:
         raise HTTPException(status_code=404, detail="Exam attempt not found or does not belong to you")
     
+    return crud.get_attempt_results(attempt, "evaluated", lambda: _load_evaluated_results(db, attempt))
+
+
+def _load_evaluated_results(db: Session, attempt: models.ExamAttempt) -> dict:
+    """Build the evaluated results page of a submitted attempt; served through the results cache."""
     # Get the exam
     exam = crud.get_exam_by_id(db, attempt.exam_id)
     if not exam:
@@ -653,3 +788,31 @@ def get_evaluated_results(
         "published_by": publisher_email,
         "answers_with_evaluations": answers_with_eval,
     }
+
+
+@router.get("/events")
+async def student_events(
+    request: Request,
+    token: str = Query(...),
+    db: Session = Depends(get_db),
+):
+    """Server-sent events for the current student.
+
+    Streams exam_published / exam_unpublished, attempt_auto_submitted,
+    grading_finished and evaluation_posted, so pages can react instead of
+    polling. EventSource cannot send headers, so the token is a query parameter.
+    """
+    try:
+        user = await run_in_threadpool(security.get_user_from_token, db, token)
+    finally:
+        db.close()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    if user.role != "student":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Student privileges required")
+    subscription = event_bus.subscribe({STUDENTS_CHANNEL, student_channel(user.id)})
+    return StreamingResponse(
+        stream_events(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,198 @@
+"""Minimal in-process periodic job runner.
+
+Jobs are plain functions taking a database session. The web app starts the
+scheduler on startup when RUN_SCHEDULER is enabled; ``python -m app.worker``
+runs the same jobs in a dedicated process instead. Jobs registered as
+exclusive hold a PostgreSQL advisory lock while they run, so when several
+processes schedule the same job only one of them runs it at a time.
+"""
+import threading
+import time
+import traceback
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .metrics import metrics
+
+
+@dataclass
+class Job:
+    name: str
+    interval_seconds: float
+    func: Callable[[Session], object]
+    exclusive: bool = False
+    next_run: float = 0.0
+    runs: int = 0
+    skipped: int = 0
+    failures: int = 0
+    last_run_at: datetime | None = None
+    last_duration_ms: float | None = None
+    last_result: object = None
+    last_error: str | None = None
+    running: bool = field(default=False, repr=False)
+
+
+class Scheduler:
+    """Runs registered jobs on fixed intervals in a single daemon thread."""
+
+    def __init__(self, session_factory: Callable[[], Session] | None = None, tick_seconds: float = 1.0) -> None:
+        self._session_factory = session_factory
+        self._tick_seconds = tick_seconds
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_job(
+        self, name: str, interval_seconds: float, func: Callable[[Session], object], exclusive: bool = False
+    ) -> None:
+        """Register a job; ``exclusive`` jobs are skipped while another process runs them."""
+        with self._lock:
+            self._jobs[name] = Job(name=name, interval_seconds=interval_seconds, func=func, exclusive=exclusive)
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from .database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def run_job(self, name: str) -> object:
+        """Run one job now in the calling thread and record its outcome."""
+        job = self._jobs[name]
+        db = self._session()
+        lock_conn = None
+        if job.exclusive:
+            try:
+                lock_conn = _try_job_lock(db, name)
+            except Exception as e:
+                db.close()
+                job.failures += 1
+                job.last_error = f"{type(e).__name__}: {e}"
+                metrics.incr(f"scheduler.{name}.failures")
+                traceback.print_exc()
+                return None
+            if lock_conn is False:
+                db.close()
+                job.skipped += 1
+                metrics.incr(f"scheduler.{name}.skipped")
+                return None
+        started = time.perf_counter()
+        job.running = True
+        try:
+            job.last_result = job.func(db)
+            job.last_error = None
+        except Exception as e:
+            db.rollback()
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            metrics.incr(f"scheduler.{name}.failures")
+            traceback.print_exc()
+        finally:
+            if lock_conn:
+                _release_job_lock(lock_conn, name)
+            db.close()
+            job.running = False
+            job.runs += 1
+            job.last_run_at = datetime.now(timezone.utc)
+            job.last_duration_ms = (time.perf_counter() - started) * 1000
+            metrics.observe(f"scheduler.{name}.duration_ms", job.last_duration_ms)
+        return job.last_result
+
+    def run_pending(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            due = [job for job in self._jobs.values() if job.next_run <= now]
+        for job in due:
+            job.next_run = now + job.interval_seconds
+            self.run_job(job.name)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(self._tick_seconds)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "running": self.is_running,
+            "jobs": [
+                {
+                    "name": job.name,
+                    "interval_seconds": job.interval_seconds,
+                    "runs": job.runs,
+                    "skipped": job.skipped,
+                    "failures": job.failures,
+                    "last_run_at": job.last_run_at.isoformat() if job.last_run_at else None,
+                    "last_duration_ms": job.last_duration_ms,
+                    "last_result": job.last_result,
+                    "last_error": job.last_error,
+                }
+                for job in jobs
+            ],
+        }
+
+
+def _job_lock_key(name: str) -> int:
+    return zlib.crc32(f"scheduler:{name}".encode())
+
+
+def _try_job_lock(db: Session, name: str):
+    """Take the job's advisory lock on a dedicated connection.
+
+    Returns the connection holding it, False if another process holds it, or
+    None on databases without advisory locks (SQLite: one process). The job's
+    own session commits and may switch pooled connections, so the
+    session-level lock lives on a separate connection for the whole run.
+    """
+    engine = db.get_bind()
+    if engine.dialect.name != "postgresql":
+        return None
+    conn = engine.connect()
+    try:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _job_lock_key(name)}).scalar()
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    if not acquired:
+        conn.close()
+        return False
+    return conn
+
+
+def _release_job_lock(conn, name: str) -> None:
+    try:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _job_lock_key(name)})
+        conn.commit()
+    except Exception:
+        traceback.print_exc()
+    finally:
+        # Closing the connection would also release a session lock, but pooled connections stay open
+        conn.close()
+
+
+scheduler = Scheduler()
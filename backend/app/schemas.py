@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
 from uuid import UUID
 from typing import Any, Optional
 from datetime import datetime, date
@@ -55,6 +55,15 @@ class Question(QuestionBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class QuestionPage(BaseModel):
+    """One keyset page of question search results."""
+    items: list[Question]
+    next_cursor: Optional[str] = None
+    total_estimate: int
+    total_is_exact: bool
+    model_config = ConfigDict(from_attributes=True)
+
+
 class QuestionForStudent(BaseModel):
     """Question schema for students - excludes correct_answers for security."""
     id: UUID
@@ -76,6 +85,11 @@ class ExamCreate(BaseModel):
     target_candidates: str  # 'SSC', 'HSC', 'Admission'
 
 
+class ExamBulkCreate(BaseModel):
+    """Several exams (e.g. per-cohort variants) created in one transaction."""
+    exams: list[ExamCreate]
+
+
 class Exam(BaseModel):
     id: UUID
     title: str
@@ -108,12 +122,14 @@ class AnswerBase(BaseModel):
 
 
 class AnswerCreate(AnswerBase):
-    pass
+    # Increases with every change the client makes in the attempt; stale retries are ignored
+    client_seq: Optional[int] = Field(None, ge=1)
 
 
 class Answer(AnswerBase):
     id: UUID
     attempt_id: UUID
+    client_seq: int = 0
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -0,0 +1,152 @@
+"""Question bank search: index-backed filters, keyset pagination and count estimates.
+
+PostgreSQL uses the pg_trgm indexes on title/description and the GIN index on
+``tags`` declared in ``models``. SQLite (tests, local development) answers the
+text search from the ``questions_fts`` FTS5 table instead.
+"""
+import base64
+import json
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import and_, func, literal, literal_column, or_, select, text, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Counting stops here; larger result sets are reported as an estimate
+COUNT_CAP = 10_000
+
+# The FTS5 trigram tokenizer cannot match terms shorter than one trigram
+MIN_FTS_TERM_LENGTH = 3
+
+
+@dataclass
+class QuestionPage:
+    """One page of search results plus the cursor for the next page."""
+    items: list[models.Question]
+    next_cursor: str | None
+    total_estimate: int
+    total_is_exact: bool
+
+
+def encode_cursor(question: models.Question) -> str:
+    """Encode the (title, id) keyset position of a question as an opaque cursor."""
+    raw = json.dumps([question.title, str(question.id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, uuid.UUID]:
+    """Decode a cursor produced by ``encode_cursor``; raises ValueError if malformed."""
+    try:
+        title, question_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(title), uuid.UUID(str(question_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _search_clause(db: Session, term: str):
+    """Match ``term`` as a substring of title/description, or exactly on complexity."""
+    complexity_match = models.Question.complexity == term.lower()
+    if _dialect(db) == "sqlite" and len(term) >= MIN_FTS_TERM_LENGTH:
+        phrase = '"' + term.replace('"', '""') + '"'
+        fts_rowids = select(literal_column("rowid")).select_from(text("questions_fts")).where(
+            text("questions_fts MATCH :fts_phrase").bindparams(fts_phrase=phrase)
+        )
+        return or_(literal_column("questions.rowid").in_(fts_rowids), complexity_match)
+
+    pattern = f"%{_escape_like(term)}%"
+    return or_(
+        models.Question.title.ilike(pattern, escape="\\"),
+        models.Question.description.ilike(pattern, escape="\\"),
+        complexity_match,
+    )
+
+
+def _tag_clause(db: Session, tag: str):
+    """JSON array containment on ``tags``: GIN-indexed ``@>`` on PostgreSQL."""
+    if _dialect(db) == "postgresql":
+        return type_coerce(models.Question.tags, JSONB).contains([tag])
+    tag_values = func.json_each(models.Question.tags).table_valued("value")
+    return select(literal(1)).select_from(tag_values).where(tag_values.c.value == tag).exists()
+
+
+def question_filters(
+    db: Session,
+    search: str | None = None,
+    question_type: str | None = None,
+    complexity: str | None = None,
+    tag: str | None = None,
+) -> list:
+    """Build the WHERE criteria shared by listing, paging and counting."""
+    criteria = []
+    if search:
+        criteria.append(_search_clause(db, search))
+    if question_type:
+        criteria.append(models.Question.type == question_type)
+    if complexity:
+        criteria.append(models.Question.complexity == complexity.lower())
+    if tag:
+        criteria.append(_tag_clause(db, tag.lower()))
+    return criteria
+
+
+def estimate_count(db: Session, criteria: list) -> tuple[int, bool]:
+    """Return (count, is_exact), counting at most COUNT_CAP matching rows."""
+    if not criteria and _dialect(db) == "postgresql":
+        # Planner statistics are free and good enough for an unfiltered bank
+        reltuples = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'questions'::regclass")
+        ).scalar()
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples), False
+
+    capped = select(literal(1)).select_from(models.Question).where(*criteria).limit(COUNT_CAP + 1)
+    count = db.execute(select(func.count()).select_from(capped.subquery())).scalar_one()
+    if count > COUNT_CAP:
+        return COUNT_CAP, False
+    return count, True
+
+
+def list_questions(db: Session, criteria: list, limit: int | None = None, cursor: str | None = None):
+    """Return questions matching ``criteria`` in (title, id) order, starting after ``cursor``."""
+    query = db.query(models.Question).filter(*criteria)
+    if cursor:
+        title, question_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                models.Question.title > title,
+                and_(models.Question.title == title, models.Question.id > question_id),
+            )
+        )
+    query = query.order_by(models.Question.title, models.Question.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def search_questions(
+    db: Session,
+    search: str | None = None,
+    question_type: str | None = None,
+    complexity: str | None = None,
+    tag: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+) -> QuestionPage:
+    """Return one keyset page of matching questions with a total-count estimate."""
+    criteria = question_filters(db, search, question_type, complexity, tag)
+    rows = list_questions(db, criteria, limit=limit + 1, cursor=cursor)
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    total, exact = estimate_count(db, criteria)
+    return QuestionPage(items=items, next_cursor=next_cursor, total_estimate=total, total_is_exact=exact)
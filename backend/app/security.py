@@ -66,6 +66,17 @@ def decode_access_token(token: str) -> Optional[dict]:
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 
+def get_user_from_token(db: Session, token: str) -> models.User | None:
+    """Resolve an access token to its user; None if the token is invalid."""
+    payload = decode_access_token(token)
+    if not payload:
+        return None
+    email = payload.get("sub") or payload.get("email")
+    if not email:
+        return None
+    return crud.get_user_by_email(db, email)
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
@@ -76,13 +87,7 @@ def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_access_token(token)
-    if not payload:
-        raise credentials_exception
-    email = payload.get("sub") or payload.get("email")
-    if not email:
-        raise credentials_exception
-    user = crud.get_user_by_email(db, email)
+    user = get_user_from_token(db, token)
     if not user:
         raise credentials_exception
     return user
@@ -0,0 +1,65 @@
+"""Request coalescing for identical concurrent loads.
+
+When many requests ask for the same key at once (every student opening the
+paper at 10:00), only the first caller runs the loader; the others wait for
+its result instead of issuing the same query. Nothing is kept after the load
+finishes, so this adds no staleness on its own.
+"""
+import threading
+from typing import Any, Callable, Hashable
+
+from .metrics import metrics
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls per key; counters go to the metrics registry."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return loader()'s result, sharing one execution among concurrent callers of ``key``.
+
+        Exceptions raised by the loader are re-raised in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        metrics.incr(f"singleflight.{self.name}.calls")
+
+        if not leader:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr(f"singleflight.{self.name}.executions")
+        try:
+            call.result = loader()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,69 @@
+"""Exam-level score statistics, computed with NumPy from one query."""
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Score distribution buckets: 0-10%, 10-20%, ..., 90-100% of the total possible score
+DISTRIBUTION_BUCKETS = 10
+
+
+def compute_exam_statistics(db: Session, exam_id: uuid.UUID) -> dict:
+    """Summarize the scores of every graded attempt of an exam."""
+    rows = db.execute(
+        select(models.ExamAttempt.score, models.ExamAttempt.total_possible_score).where(
+            models.ExamAttempt.exam_id == exam_id,
+            models.ExamAttempt.end_time.isnot(None),
+            models.ExamAttempt.score.isnot(None),
+        )
+    ).all()
+    stats = {
+        "exam_id": exam_id,
+        "attempts_count": len(rows),
+        "total_possible_score": None,
+        "mean_score": None,
+        "median_score": None,
+        "min_score": None,
+        "max_score": None,
+        "stddev_score": None,
+        "score_distribution": [0] * DISTRIBUTION_BUCKETS,
+        "computed_at": datetime.now(timezone.utc),
+    }
+    if not rows:
+        return stats
+
+    scores = np.fromiter((row.score for row in rows), dtype=np.float64, count=len(rows))
+    totals = np.fromiter((row.total_possible_score or 0 for row in rows), dtype=np.float64, count=len(rows))
+    fractions = np.divide(scores, totals, out=np.zeros_like(scores), where=totals > 0)
+    buckets = np.clip((fractions * DISTRIBUTION_BUCKETS).astype(int), 0, DISTRIBUTION_BUCKETS - 1)
+    stats.update(
+        total_possible_score=float(totals.max()),
+        mean_score=round(float(scores.mean()), 4),
+        median_score=float(np.median(scores)),
+        min_score=float(scores.min()),
+        max_score=float(scores.max()),
+        stddev_score=round(float(scores.std()), 4),
+        score_distribution=np.bincount(buckets, minlength=DISTRIBUTION_BUCKETS).tolist(),
+    )
+    return stats
+
+
+def save_exam_statistics(db: Session, exam_id: uuid.UUID) -> models.ExamStatistics:
+    """Compute and store (insert or replace) an exam's statistics row."""
+    row = db.merge(models.ExamStatistics(**compute_exam_statistics(db, exam_id)))
+    db.commit()
+    return row
+
+
+def serialize_statistics(stats: dict | models.ExamStatistics) -> dict:
+    if isinstance(stats, models.ExamStatistics):
+        stats = {column.name: getattr(stats, column.name) for column in models.ExamStatistics.__table__.columns}
+    return {
+        **stats,
+        "exam_id": str(stats["exam_id"]),
+        "computed_at": stats["computed_at"].isoformat(),
+    }
@@ -0,0 +1,100 @@
+"""Pre-warming of per-process caches ahead of an exam's start.
+
+Load arrives at a known time (Exam.start_time). A few minutes before, every
+API process loads the student-facing paper, the eligible-student set and the
+grading plan into its own caches and opens its connection pool to full size,
+so the first requests after the start never take a cold path.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from . import crud
+from .grading import get_grading_plan
+from .metrics import metrics
+
+_status: dict[uuid.UUID, dict] = {}
+_pool_status: dict = {}
+_lock = threading.Lock()
+
+
+def warm_connection_pool(db: Session) -> int:
+    """Check out (and return) as many connections as the pool keeps open; returns how many were opened."""
+    engine = db.get_bind()
+    # Only QueuePool keeps a fixed set of connections open (SQLite memory/static pools do not)
+    target = engine.pool.size() if isinstance(engine.pool, QueuePool) else 0
+    connections = []
+    try:
+        for _ in range(target):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+    with _lock:
+        _pool_status.update(target=target, opened=len(connections), warmed_at=datetime.now(timezone.utc))
+    return len(connections)
+
+
+def warm_exam(db: Session, exam_id: uuid.UUID) -> dict:
+    """Load one exam's paper, eligible students and grading plan into this process's caches.
+
+    Entries that are already cached are kept: edits invalidate them when they
+    happen, and dropping them here would throw away warm pages (results,
+    paper) for nothing and make the next requests take the cold path.
+    """
+    started = time.perf_counter()
+    paper = crud.get_exam_paper(db, exam_id)
+    if paper is None:
+        return {"exam_id": str(exam_id), "warmed": False}
+    eligible = crud.get_eligible_student_ids(db, paper)
+    plan = get_grading_plan(db, exam_id)
+    crud.get_available_exam_papers(db)
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    metrics.observe("warmup.exam_duration_ms", duration_ms)
+    status = {
+        "exam_id": str(exam_id),
+        "title": paper.title,
+        "start_time": paper.start_time.isoformat(),
+        "warmed": True,
+        "warmed_at": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duration_ms, 2),
+        "questions": len(paper.questions),
+        "eligible_students": len(eligible),
+        "grading_plan": plan is not None,
+    }
+    with _lock:
+        _status[exam_id] = status
+    return status
+
+
+def warmed_exam_ids() -> list[uuid.UUID]:
+    with _lock:
+        return list(_status)
+
+
+def forget(exam_ids) -> None:
+    """Drop status entries for exams that are no longer upcoming."""
+    with _lock:
+        for exam_id in exam_ids:
+            _status.pop(exam_id, None)
+
+
+def snapshot() -> dict:
+    with _lock:
+        pool = dict(_pool_status)
+        exams = list(_status.values())
+    if pool.get("warmed_at"):
+        pool["warmed_at"] = pool["warmed_at"].isoformat()
+    return {
+        "pool": pool,
+        "exams": sorted(exams, key=lambda status: status["start_time"]),
+        "cache": {"exam_papers": len(crud.paper_cache), "eligible_students": len(crud.eligibility_cache)},
+    }
@@ -0,0 +1,32 @@
+"""Standalone background worker.
+
+Run ``python -m app.worker`` to execute the periodic jobs outside the web
+processes; set RUN_SCHEDULER=0 for the API workers then so request
+processes do not compete for the job locks.
+"""
+import signal
+import threading
+
+from .events import event_bus
+from .jobs import register_event_jobs, register_jobs
+from .scheduler import scheduler
+
+
+def main() -> None:
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    # Auto-submits by the sweeper are pushed to clients connected to the API processes
+    event_bus.start()
+    register_jobs(scheduler)
+    register_event_jobs(scheduler)
+    scheduler.start()
+    print("Background worker started; press Ctrl+C to stop")
+    stop.wait()
+    scheduler.stop()
+    event_bus.stop()
+
+
+if __name__ == "__main__":
+    main()
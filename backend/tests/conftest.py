@@ -1,10 +1,15 @@
 import pytest
 import os
+import uuid
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from app.database import Base
 from app.main import app
-from app import models, schemas, crud
+from app import models, schemas, crud, warmup
+from app.admission import start_admission
+from app.heartbeats import heartbeat_store
+from app.live import live_exams
 from fastapi.testclient import TestClient
 
 
@@ -29,6 +34,32 @@ def test_db():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    """Each test has its own database, so process-wide caches must not carry over."""
+    crud.invalidate_exam_paper()
+    warmup.forget(warmup.warmed_exam_ids())
+    start_admission.reset()
+    live_exams.forget()
+    crud.attempt_ref_cache.invalidate()
+    heartbeat_store.reset()
+    yield
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    """Session factory on a file-backed SQLite database, so threads share one database."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(bind=engine)
+    
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    engine.dispose()
+
+
 @pytest.fixture
 def client(test_db):
     """Create test client with test database."""
@@ -58,6 +89,70 @@ def sample_question_data():
     }
 
 
+@pytest.fixture
+def make_question():
+    """Factory for unsaved questions; defaults depend on the question type."""
+    defaults = {
+        "single_choice": {"options": ["3", "4"], "correct_answers": "4", "max_score": 1},
+        "multi_choice": {"options": ["2", "3", "4"], "correct_answers": ["2", "3"], "max_score": 3},
+        "text": {"correct_answers": "", "max_score": 5},
+    }
+
+    def make(type="single_choice", title="2+2?", complexity="easy", **fields):
+        return models.Question(title=title, complexity=complexity, type=type, **{**defaults[type], **fields})
+
+    return make
+
+
+@pytest.fixture
+def make_exam(make_question):
+    """Factory for saved, published exams; by default open from an hour ago for two hours, with one question."""
+    def make(db, start=None, end=None, *, questions=None, duration=30, published=True, target=None, title="Exam"):
+        start = start or datetime.now(timezone.utc) - timedelta(hours=1)
+        exam = models.Exam(
+            title=title, start_time=start, end_time=end or start + timedelta(hours=2),
+            duration_minutes=duration, is_published=published, target_candidates=target,
+            questions=[make_question()] if questions is None else list(questions),
+        )
+        db.add(exam)
+        db.commit()
+        return exam
+
+    return make
+
+
+@pytest.fixture
+def make_student():
+    """Factory for saved users with a unique email; students unless ``role`` says otherwise."""
+    def make(db, email=None, candidate=None, role="student"):
+        user = models.User(
+            email=email or f"{uuid.uuid4().hex}@t.com", hashed_password="x", role=role, exam_candidate=candidate,
+        )
+        db.add(user)
+        db.commit()
+        return user
+
+    return make
+
+
+@pytest.fixture
+def make_attempt(make_student):
+    """Factory for saved attempts by a new (or the given) student, with answers as (question, data) pairs."""
+    def make(db, exam, started=None, *, student=None, answers=(), **columns):
+        student = student or make_student(db)
+        if started is not None:
+            columns["start_time"] = started
+        attempt = models.ExamAttempt(exam_id=exam.id, student_id=student.id, **columns)
+        db.add(attempt)
+        db.commit()
+        for question, data in answers:
+            db.add(models.Answer(attempt_id=attempt.id, question_id=question.id, answer_data=data))
+        db.commit()
+        return attempt
+
+    return make
+
+
 @pytest.fixture
 def sample_admin_user(test_db):
     """Create a test admin user."""
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.admission import AdmissionQueue, start_admission
+from app.metrics import metrics
+from app.routers import student as student_routes
+
+
+class TestAdmissionQueue:
+    def test_admits_up_to_budget_then_queues_in_order(self):
+        queue = AdmissionQueue(max_concurrent=2)
+        assert queue.try_admit("a").admitted
+        assert queue.try_admit("b").admitted
+
+        c = queue.try_admit("c")
+        d = queue.try_admit("d")
+        assert not c.admitted and c.position == 1
+        assert not d.admitted and d.position == 2
+        assert c.retry_after_seconds >= 1
+
+        queue.release()
+        # d retries first but c is ahead of it
+        assert not queue.try_admit("d").admitted
+        assert queue.try_admit("c").admitted
+        assert queue.try_admit("d").position == 1
+
+    def test_newcomers_do_not_jump_the_line(self):
+        queue = AdmissionQueue(max_concurrent=1)
+        assert queue.try_admit("a").admitted
+        assert not queue.try_admit("b").admitted
+        queue.release()
+        assert not queue.try_admit("c").admitted
+        assert queue.try_admit("b").admitted
+
+    def test_abandoned_tickets_expire(self, monkeypatch):
+        clock = [100.0]
+        monkeypatch.setattr("app.admission.time.monotonic", lambda: clock[0])
+        queue = AdmissionQueue(max_concurrent=1, ticket_ttl_seconds=5)
+        assert queue.try_admit("a").admitted
+        assert not queue.try_admit("gone").admitted
+        queue.release()
+
+        clock[0] += 10
+        assert queue.try_admit("b").admitted
+        assert queue.status()["waiting"] == 0
+
+    def test_records_queue_depth_and_wait(self):
+        metrics.reset()
+        queue = AdmissionQueue(max_concurrent=1)
+        queue.try_admit("a")
+        queue.try_admit("b")
+        assert metrics.snapshot()["gauges"]["admission.queue_depth"] == 1
+        with queue.slot():
+            pass
+        assert queue.try_admit("b").admitted
+        assert metrics.counter("admission.admitted") == 2
+        assert metrics.counter("admission.queued") == 1
+        assert metrics.snapshot()["observations"]["admission.wait_seconds"]["count"] == 2
+
+
+class TestStartExamAdmission:
+    def make_exam(self, db):
+        now = datetime.now(timezone.utc)
+        exam = models.Exam(
+            title="Burst", start_time=now - timedelta(minutes=1), end_time=now + timedelta(hours=1),
+            duration_minutes=30, is_published=True,
+        )
+        students = [models.User(email=f"s{i}@t.com", hashed_password="x", role="student") for i in range(2)]
+        db.add_all([exam, *students])
+        db.commit()
+        return exam, students
+
+    def test_over_budget_start_is_queued_without_creating_attempt(self, test_db, monkeypatch):
+        exam, (first, second) = self.make_exam(test_db)
+        monkeypatch.setattr(start_admission, "max_concurrent", 1)
+        assert start_admission.try_admit("someone else").admitted
+
+        with pytest.raises(HTTPException) as exc:
+            student_routes.start_exam(exam.id, db=test_db, current_user=first)
+        assert exc.value.status_code == 429
+        assert exc.value.detail["position"] == 1
+        assert int(exc.value.headers["Retry-After"]) >= 1
+        assert test_db.query(models.ExamAttempt).count() == 0
+
+        start_admission.release()
+        body = student_routes.start_exam(exam.id, db=test_db, current_user=first)
+        # The timer starts on admission, not when the student joined the line
+        assert body["exam"]["time_remaining_seconds"] >= 30 * 60 - 5
+        assert start_admission.status()["in_flight"] == 0
+
+    def test_slot_is_released_when_start_fails(self, test_db, monkeypatch):
+        exam, (first, _) = self.make_exam(test_db)
+        exam.is_published = False
+        test_db.commit()
+        monkeypatch.setattr(start_admission, "max_concurrent", 1)
+
+        with pytest.raises(HTTPException) as exc:
+            student_routes.start_exam(exam.id, db=test_db, current_user=first)
+        assert exc.value.status_code == 400
+        assert start_admission.status()["in_flight"] == 0
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import crud, models, schemas
+from app.answer_writer import AnswerWrite, persist_answers
+from app.routers import student as student_routes
+
+
+@pytest.fixture
+def started_attempt(test_db, make_question, make_exam, make_student):
+    questions = [make_question(title=f"Q{i}") for i in range(3)]
+    exam = make_exam(test_db, questions=questions)
+    student = make_student(test_db)
+    attempt = crud.start_exam_attempt(test_db, exam, student.id, datetime.now(timezone.utc))
+    return attempt, [q.id for q in questions], student
+
+
+def save(db, attempt, student, question_id, data, seq=None):
+    return student_routes.save_answer(
+        attempt.id, schemas.AnswerCreate(question_id=question_id, answer_data=data, client_seq=seq),
+        db=db, current_user=student,
+    )
+
+
+def stored(db, attempt_id):
+    db.expire_all()
+    return {a.question_id: (a.answer_data, a.client_seq) for a in crud.get_answers(db, attempt_id)}
+
+
+class TestAnswerSequencing:
+    def test_out_of_order_and_retried_writes_are_ignored(self, test_db, started_attempt):
+        attempt, (q1, _, _), student = started_attempt
+
+        assert save(test_db, attempt, student, q1, "b", seq=5) == {"status": "saved"}
+        # A delayed older write and a retry of the same write change nothing
+        assert save(test_db, attempt, student, q1, "a", seq=4) == {"status": "stale"}
+        assert save(test_db, attempt, student, q1, "a", seq=5) == {"status": "stale"}
+        assert stored(test_db, attempt.id) == {q1: ("b", 5)}
+
+        assert save(test_db, attempt, student, q1, "a", seq=6) == {"status": "saved"}
+        assert stored(test_db, attempt.id) == {q1: ("a", 6)}
+        assert test_db.query(models.Answer).count() == 1
+
+    def test_unsequenced_writes_win_and_take_the_next_sequence(self, test_db, started_attempt):
+        attempt, (q1, q2, _), student = started_attempt
+        save(test_db, attempt, student, q1, "b", seq=3)
+
+        assert save(test_db, attempt, student, q1, "a") == {"status": "saved"}
+        assert save(test_db, attempt, student, q2, "b") == {"status": "saved"}
+        assert stored(test_db, attempt.id) == {q1: ("a", 4), q2: ("b", 5)}
+        # So a client resuming from the last number it saw still receives them
+        delta = crud.get_answers(test_db, attempt.id, since_seq=3)
+        assert {a.question_id for a in delta} == {q1, q2}
+
+    def test_socket_batches_respect_later_http_writes(self, test_db, started_attempt):
+        attempt, (q1, q2, _), student = started_attempt
+        save(test_db, attempt, student, q1, "b", seq=9)
+
+        outcomes = persist_answers(test_db, [
+            AnswerWrite(attempt.id, q1, "a", seq=8),
+            AnswerWrite(attempt.id, q2, "a", seq=7),
+        ])
+        assert outcomes == [None, None]
+        assert stored(test_db, attempt.id) == {q1: ("b", 9), q2: ("a", 7)}
+
+    def test_resume_returns_only_answers_written_after_since_seq(self, test_db, started_attempt):
+        attempt, (q1, q2, q3), student = started_attempt
+        for seq, question_id in enumerate((q1, q2, q3), start=1):
+            save(test_db, attempt, student, question_id, "a", seq=seq)
+        save(test_db, attempt, student, q1, "b", seq=4)
+
+        delta = student_routes.resume_exam(attempt.id, since_seq=2, db=test_db, current_user=student)
+        assert {a.question_id: a.answer_data for a in delta["answers"]} == {q3: "a", q1: "b"}
+        assert delta["last_seq"] == 4
+
+        caught_up = student_routes.resume_exam(attempt.id, since_seq=4, db=test_db, current_user=student)
+        assert caught_up["answers"] == [] and caught_up["last_seq"] == 4
+
+        plain = student_routes.resume_exam(attempt.id, since_seq=None, db=test_db, current_user=student)
+        assert "answers" not in plain
+        assert len(student_routes.get_attempt_answers(attempt.id, since_seq=3, db=test_db, current_user=student)) == 1
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import crud, models, schemas
+
+
+@pytest.fixture
+def deadline_exam(make_exam, make_student):
+    """Factory for an exam with one question and a student to take it."""
+    def make(db, start, end, duration=30):
+        exam = make_exam(db, start, end, duration=duration)
+        return exam, exam.questions[0], make_student(db)
+
+    return make
+
+
+class TestAttemptDeadlines:
+    """Test suite for server-side attempt deadlines."""
+
+    def test_deadline_is_duration_or_exam_end(self, test_db, deadline_exam):
+        now = datetime.now(timezone.utc)
+        exam, _, student = deadline_exam(test_db, now - timedelta(hours=1), now + timedelta(hours=2), duration=30)
+        attempt = crud.create_exam_attempt(test_db, exam.id, student.id, exam=exam)
+        assert crud.as_utc(attempt.deadline_at) == crud.as_utc(attempt.start_time) + timedelta(minutes=30)
+        assert 29 * 60 <= crud.seconds_remaining(attempt) <= 30 * 60
+
+        crud.calculate_and_save_score(test_db, attempt)
+        exam.end_time = now + timedelta(minutes=10)
+        test_db.commit()
+        attempt = crud.create_exam_attempt(test_db, exam.id, student.id)
+        assert crud.as_utc(attempt.deadline_at) == crud.as_utc(exam.end_time)
+
+    def test_save_rejected_after_deadline_and_after_submit(self, test_db, deadline_exam):
+        now = datetime.now(timezone.utc)
+        exam, question, student = deadline_exam(test_db, now - timedelta(hours=1), now + timedelta(hours=1))
+        attempt = crud.create_exam_attempt(test_db, exam.id, student.id, exam=exam)
+        crud.save_answer(test_db, attempt.id, student.id, schemas.AnswerCreate(question_id=question.id, answer_data="4"))
+
+        attempt.deadline_at = now - timedelta(seconds=crud.DEADLINE_GRACE_SECONDS + 1)
+        test_db.commit()
+        with pytest.raises(ValueError, match="time is over"):
+            crud.save_answer(test_db, attempt.id, student.id, schemas.AnswerCreate(question_id=question.id, answer_data="3"))
+
+        crud.calculate_and_save_score(test_db, attempt)
+        with pytest.raises(ValueError, match="already submitted"):
+            crud.save_answer(test_db, attempt.id, student.id, schemas.AnswerCreate(question_id=question.id, answer_data="3"))
+
+    def test_late_submit_ends_at_deadline(self, test_db, deadline_exam):
+        now = datetime.now(timezone.utc)
+        exam, question, student = deadline_exam(test_db, now - timedelta(hours=1), now + timedelta(hours=1))
+        attempt = crud.create_exam_attempt(test_db, exam.id, student.id, exam=exam)
+        crud.save_answer(test_db, attempt.id, student.id, schemas.AnswerCreate(question_id=question.id, answer_data="4"))
+        deadline = now - timedelta(minutes=5)
+        attempt.deadline_at = deadline
+        test_db.commit()
+
+        crud.calculate_and_save_score(test_db, attempt)
+        assert crud.as_utc(attempt.end_time) == deadline
+        assert attempt.score == 1
+
+    def test_legacy_attempt_deadline_is_backfilled(self, test_db, deadline_exam, make_attempt):
+        now = datetime.now(timezone.utc)
+        exam, _, student = deadline_exam(test_db, now - timedelta(hours=1), now + timedelta(hours=1), duration=20)
+        started = now - timedelta(minutes=5)
+        attempt = make_attempt(test_db, exam, started, student=student)
+
+        assert crud.get_attempt_deadline(test_db, attempt) == started + timedelta(minutes=20)
+        # Reading the deadline does not write it
+        test_db.expire_all()
+        assert test_db.get(models.ExamAttempt, attempt.id).deadline_at is None
+
+        assert crud.ensure_attempt_deadline(test_db, attempt) == started + timedelta(minutes=20)
+        test_db.expire_all()
+        assert crud.as_utc(test_db.get(models.ExamAttempt, attempt.id).deadline_at) == started + timedelta(minutes=20)
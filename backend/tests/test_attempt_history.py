@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import event
+
+from app import crud, grading, jobs, models
+from app.routers import student as student_routes
+
+
+@pytest.fixture
+def make_history(make_question, make_exam, make_student, make_attempt):
+    """Factory for a student with ``attempts`` submitted attempts, one a day, newest first."""
+    def make(db, attempts=5):
+        now = datetime.now(timezone.utc)
+        essay, pick = make_question("text", title="Essay"), make_question(title="Pick")
+        exam = make_exam(db, now - timedelta(days=30), now + timedelta(days=1), questions=[essay, pick])
+        student = make_student(db)
+        teacher = make_student(db, role="admin")
+        rows = [
+            make_attempt(db, exam, now - timedelta(days=i, minutes=30), student=student,
+                         end_time=now - timedelta(days=i), score=1, total_possible_score=6)
+            for i in range(attempts)
+        ]
+        return exam, (essay, pick), student, teacher, rows
+
+    return make
+
+
+def completed(db, student, **params):
+    response = Response()
+    page = student_routes.list_completed_exams(
+        response, db=db, current_user=student,
+        **{"limit": None, "cursor": None, "since": None, "until": None, **params},
+    )
+    return page, response.headers.get("x-next-cursor")
+
+
+class TestFinalScores:
+    def test_evaluations_update_the_stored_final_score(self, test_db, make_history):
+        _, (essay, _), _, teacher, (attempt, *_) = make_history(test_db, attempts=1)
+        answer = models.Answer(attempt_id=attempt.id, question_id=essay.id, answer_data="words")
+        test_db.add(answer)
+        test_db.flush()
+        evaluation = models.Evaluation(answer_id=answer.id, evaluated_by=teacher.id, score_awarded=3)
+        test_db.add(evaluation)
+        test_db.commit()
+
+        crud.evaluations_changed(test_db, attempt.id)
+        test_db.refresh(attempt)
+        assert attempt.final_score == 4
+
+        # Capped at the attempt's total
+        evaluation.score_awarded = 50
+        test_db.commit()
+        crud.evaluations_changed(test_db, attempt.id)
+        test_db.refresh(attempt)
+        assert attempt.final_score == 6
+
+    def test_grading_stores_final_score_and_backfill_fills_old_rows(self, test_db, make_history):
+        exam, _, _, _, (graded, legacy, *_) = make_history(test_db, attempts=2)
+        graded.score = None
+        test_db.commit()
+
+        assert grading.grade_submitted_attempts(test_db, [graded.id]) == 1
+        assert jobs.backfill_final_scores(test_db) == 1
+        test_db.expire_all()
+        assert graded.final_score == 0 and legacy.final_score == 1
+        assert jobs.backfill_final_scores(test_db) == 0
+
+
+class TestAttemptHistory:
+    def test_keyset_pages_walk_newest_first(self, test_db, make_history):
+        *_, student, _, rows = make_history(test_db)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = completed(test_db, student, limit=2, cursor=cursor)
+            seen.extend(entry["id"] for entry in page)
+            if cursor is None:
+                break
+        assert seen == [str(row.id) for row in rows]
+
+    def test_date_range_filter(self, test_db, make_history):
+        *_, student, _, rows = make_history(test_db)
+        now = datetime.now(timezone.utc)
+
+        page, _ = completed(test_db, student, since=now - timedelta(days=3, hours=12), until=now - timedelta(hours=12))
+        assert [entry["id"] for entry in page] == [str(row.id) for row in rows[1:4]]
+
+    def test_listing_is_one_query(self, test_db, make_history):
+        *_, student, _, _ = make_history(test_db)
+        test_db.refresh(student)  # the request's user is already loaded by authentication
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            page, _ = completed(test_db, student)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert len(page) == 5 and len(statements) == 1
+
+    def test_invalid_cursor_is_rejected(self, test_db, make_history):
+        *_, student, _, _ = make_history(test_db, attempts=1)
+        with pytest.raises(HTTPException) as exc:
+            completed(test_db, student, limit=2, cursor="not-a-cursor")
+        assert exc.value.status_code == 400
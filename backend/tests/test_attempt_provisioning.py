@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import Response
+from sqlalchemy import event
+
+from app import crud, jobs, models, schemas
+from app.routers import student as student_routes
+
+
+@pytest.fixture
+def make_students(make_student):
+    """Factory for students with the given exam candidacies, plus an admin who is never provisioned."""
+    def make(db, *candidates):
+        make_student(db, role="admin")
+        return [make_student(db, candidate=candidate) for candidate in candidates]
+
+    return make
+
+
+def pending_count(db, exam):
+    return db.query(models.ExamAttempt).filter(
+        models.ExamAttempt.exam_id == exam.id, models.ExamAttempt.start_time.is_(None)
+    ).count()
+
+
+class TestAttemptProvisioning:
+    """Test suite for pre-provisioned pending attempts."""
+
+    def test_provisions_matching_students_once(self, test_db, make_exam, make_students):
+        now = datetime.now(timezone.utc)
+        exam = make_exam(test_db, now + timedelta(minutes=5), now + timedelta(hours=1), target="SSC")
+        ssc, _, other_ssc = make_students(test_db, "SSC", "HSC", "SSC")
+
+        assert crud.provision_exam_attempts(test_db, exam) == 2
+        assert exam.provisioned_at is not None
+        # Pending rows count as open attempts, so a second run adds nothing
+        assert crud.provision_exam_attempts(test_db, exam) == 0
+        assert pending_count(test_db, exam) == 2
+
+    def test_start_claims_pending_attempt_with_one_statement(self, test_db, make_exam, make_students):
+        now = datetime.now(timezone.utc)
+        exam = make_exam(test_db, now - timedelta(minutes=1), now + timedelta(hours=1))
+        (student,) = make_students(test_db, "SSC")
+        crud.provision_exam_attempts(test_db, exam)
+        pending = test_db.query(models.ExamAttempt).one()
+        test_db.refresh(exam)
+        test_db.refresh(student)
+
+        statements = []
+        engine = test_db.get_bind()
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            attempt = crud.claim_pending_attempt(test_db, exam, student.id)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+        assert len(statements) == 1 and statements[0].startswith("UPDATE")
+        assert attempt.id == pending.id
+        assert crud.as_utc(attempt.deadline_at) == crud.as_utc(attempt.start_time) + timedelta(minutes=30)
+        assert crud.claim_pending_attempt(test_db, exam, student.id) is None
+
+        body = student_routes.start_exam(exam.id, db=test_db, current_user=student)
+        assert body["attempt"]["id"] == str(pending.id)
+        assert test_db.query(models.ExamAttempt).count() == 1
+
+    def test_pending_attempts_are_hidden_and_read_only(self, test_db, make_exam, make_students):
+        now = datetime.now(timezone.utc)
+        exam = make_exam(test_db, now - timedelta(minutes=1), now + timedelta(hours=1))
+        [question] = exam.questions
+        (student,) = make_students(test_db, None)
+        crud.provision_exam_attempts(test_db, exam)
+        pending = test_db.query(models.ExamAttempt).one()
+
+        assert student_routes.list_unfinished_attempts(
+            Response(), db=test_db, current_user=student, limit=None, cursor=None, since=None, until=None
+        ) == []
+        with pytest.raises(ValueError, match="not started"):
+            crud.save_answer(test_db, pending.id, student.id,
+                             schemas.AnswerCreate(question_id=question.id, answer_data="4"))
+        assert jobs.sweep_expired_attempts(test_db, now=now + timedelta(days=1))["attempts_closed"] == 0
+
+    def test_jobs_provision_before_start_and_drop_unstarted_at_close(self, test_db, make_exam, make_students):
+        now = datetime.now(timezone.utc)
+        soon = make_exam(test_db, now + timedelta(minutes=5), now + timedelta(hours=1))
+        later = make_exam(test_db, now + timedelta(hours=3), now + timedelta(hours=4))
+        make_exam(test_db, now + timedelta(minutes=5), now + timedelta(hours=1), published=False)
+        make_students(test_db, "SSC", "HSC")
+
+        assert jobs.provision_upcoming_exams(test_db, now=now) == {"exams_provisioned": 1, "attempts_created": 2}
+        assert pending_count(test_db, soon) == 2 and pending_count(test_db, later) == 0
+        assert jobs.provision_upcoming_exams(test_db, now=now)["exams_provisioned"] == 0
+
+        result = jobs.close_ended_exams(test_db, now=now + timedelta(hours=2))
+        assert result == {"exams_closed": 2, "attempts_closed": 0}
+        assert pending_count(test_db, soon) == 0
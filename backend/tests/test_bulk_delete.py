@@ -0,0 +1,146 @@
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import event, insert
+
+from app import crud, models
+
+
+def seed_exam_with_answers(db, questions_count=3):
+    questions = [
+        models.Question(
+            title=f"Q{i}",
+            complexity="easy",
+            type="text",
+            correct_answers=None,
+            max_score=1,
+        )
+        for i in range(questions_count)
+    ]
+    student = models.User(email="bulk@test.com", hashed_password="x", role="student")
+    admin = models.User(email="bulkadmin@test.com", hashed_password="x", role="admin")
+    db.add_all(questions + [student, admin])
+    db.commit()
+
+    exam = models.Exam(
+        title="Bulk exam",
+        start_time=datetime.now(timezone.utc),
+        end_time=datetime.now(timezone.utc),
+        duration_minutes=10,
+        questions=questions,
+    )
+    db.add(exam)
+    db.commit()
+
+    attempt = models.ExamAttempt(exam_id=exam.id, student_id=student.id)
+    db.add(attempt)
+    db.commit()
+    for question in questions:
+        answer = models.Answer(attempt_id=attempt.id, question_id=question.id, answer_data="x")
+        db.add(answer)
+        db.commit()
+        db.add(models.Evaluation(answer_id=answer.id, evaluated_by=admin.id, score_awarded=1))
+    db.commit()
+    return exam, questions
+
+
+class TestBulkQuestionDelete:
+    """Test suite for set-based bulk question deletion."""
+
+    def test_deletes_dependents_and_reports_per_id(self, test_db):
+        exam, questions = seed_exam_with_answers(test_db)
+        missing = uuid.uuid4()
+
+        results = crud.delete_questions_bulk(
+            test_db, [str(questions[0].id), str(questions[1].id), str(missing), "garbage"]
+        )
+
+        assert results[str(questions[0].id)] == "deleted"
+        assert results[str(questions[1].id)] == "deleted"
+        assert results[str(missing)] == "not_found"
+        assert results["garbage"] == "invalid"
+
+        assert test_db.query(models.Question).count() == 1
+        assert test_db.query(models.Answer).count() == 1
+        assert test_db.query(models.Evaluation).count() == 1
+        test_db.refresh(exam)
+        assert [q.id for q in exam.questions] == [questions[2].id]
+
+    def test_benchmark_10k_ids_uses_few_statements(self, test_db):
+        """10k ids are removed in a handful of statements per chunk."""
+        ids = [uuid.uuid4() for _ in range(10_000)]
+        test_db.execute(
+            insert(models.Question),
+            [
+                {"id": qid, "title": "q", "complexity": "easy", "type": "text",
+                 "correct_answers": None, "max_score": 1, "tags": []}
+                for qid in ids
+            ],
+        )
+        test_db.commit()
+
+        statements = []
+        engine = test_db.get_bind()
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            started = time.perf_counter()
+            results = crud.delete_questions_bulk(test_db, ids, chunk_size=500)
+            elapsed = time.perf_counter() - started
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+        print(f"\nbulk delete of 10k questions: {len(statements)} statements in {elapsed:.2f}s")
+        assert all(outcome == "deleted" for outcome in results.values())
+        assert test_db.query(models.Question).count() == 0
+        # 20 chunks x (1 SELECT + 4 DELETE)
+        assert len(statements) <= 20 * 5
+
+
+class TestCascadeDelete:
+    """Test suite for set-based exam and student deletion."""
+
+    def test_delete_exam_cascade(self, test_db):
+        exam, questions = seed_exam_with_answers(test_db)
+
+        crud.delete_exam_cascade(test_db, exam.id)
+
+        assert test_db.query(models.Exam).count() == 0
+        assert test_db.query(models.ExamAttempt).count() == 0
+        assert test_db.query(models.Answer).count() == 0
+        assert test_db.query(models.Evaluation).count() == 0
+        assert test_db.query(models.exam_questions).count() == 0
+        # Questions stay in the bank
+        assert test_db.query(models.Question).count() == len(questions)
+
+    def test_delete_exam_chunked(self, test_db):
+        exam, _ = seed_exam_with_answers(test_db)
+        for i in range(4):
+            student = models.User(email=f"chunk{i}@test.com", hashed_password="x", role="student")
+            test_db.add(student)
+            test_db.commit()
+            test_db.add(models.ExamAttempt(exam_id=exam.id, student_id=student.id))
+        test_db.commit()
+
+        deleted = crud.delete_exam_chunked(test_db, exam.id, chunk_size=2)
+
+        assert deleted == 5
+        assert test_db.query(models.Exam).count() == 0
+        assert test_db.query(models.ExamAttempt).count() == 0
+        assert test_db.query(models.Evaluation).count() == 0
+
+    def test_delete_student_cascade(self, test_db):
+        exam, _ = seed_exam_with_answers(test_db)
+        student = test_db.query(models.User).filter(models.User.role == "student").one()
+
+        crud.delete_student_cascade(test_db, student.id)
+
+        assert test_db.query(models.User).filter(models.User.role == "student").count() == 0
+        assert test_db.query(models.ExamAttempt).count() == 0
+        assert test_db.query(models.Answer).count() == 0
+        assert test_db.query(models.Evaluation).count() == 0
+        assert test_db.query(models.Exam).count() == 1
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import crud, models, notifications
+from app.events import ADMIN_CHANNEL, Event, EventBus, LocalTransport, event_bus, stream_events, student_channel
+from app.grading import grade_submitted_attempts
+from app.routers import student as student_routes
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestEventBus:
+    def test_delivers_only_to_matching_channels(self):
+        async def scenario():
+            bus = EventBus(LocalTransport())
+            bus.start()
+            mine = bus.subscribe({"student:a", "students"})
+            other = bus.subscribe({"student:b"})
+            bus.publish("student:a", "grading_finished", {"attempt_id": "1"})
+            bus.publish("students", "exam_published", {"exam_id": "2"})
+            first, second = await mine.get(1), await mine.get(1)
+            return first, second, await other.get(0.05)
+
+        first, second, nothing = run(scenario())
+        assert (first.type, first.data) == ("grading_finished", {"attempt_id": "1"})
+        assert second.type == "exam_published" and second.id > first.id
+        assert nothing is None
+
+    def test_events_round_trip_through_the_transport(self):
+        sent = []
+
+        class RecordingTransport(LocalTransport):
+            def send(self, message):
+                sent.append(message)
+                super().send(message)
+
+        async def scenario():
+            bus = EventBus(RecordingTransport())
+            bus.start()
+            subscription = bus.subscribe({"admin"})
+            bus.publish("admin", "attempt_submitted", {"attempt_id": "x"})
+            return await subscription.get(1)
+
+        event = run(scenario())
+        assert event.data == {"attempt_id": "x"}
+        assert Event.decode(sent[0]).type == "attempt_submitted"
+
+    def test_stream_formats_events_and_unsubscribes(self):
+        async def scenario():
+            bus = EventBus()
+            subscription = bus.subscribe({"admin"})
+            bus.publish("admin", "pending_evaluations", {"exam_id": "e", "count": 3})
+            calls = iter([False, True])
+
+            async def is_disconnected():
+                return next(calls)
+
+            chunks = []
+            # stream_events unsubscribes through the module-level bus
+            async for chunk in stream_events(subscription, is_disconnected, heartbeat_seconds=0.05):
+                chunks.append(chunk)
+            return chunks
+
+        chunks = run(scenario())
+        assert chunks[0].startswith("retry:")
+        assert chunks[1] == 'id: 1\nevent: pending_evaluations\ndata: {"exam_id": "e", "count": 3}\n\n'
+
+
+class TestNotifications:
+    def make_submitted_attempt(self, db):
+        now = datetime.now(timezone.utc)
+        choice = models.Question(title="Q", complexity="easy", type="single_choice",
+                                 options=["a", "b"], correct_answers="a", max_score=1)
+        essay = models.Question(title="Essay", complexity="easy", type="text", correct_answers="", max_score=5)
+        exam = models.Exam(title="Events", start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+                           duration_minutes=30, is_published=True, questions=[choice, essay])
+        student = models.User(email="events@t.com", hashed_password="x", role="student")
+        db.add_all([exam, student])
+        db.commit()
+        attempt = crud.start_exam_attempt(db, exam, student.id, now - timedelta(minutes=5))
+        db.add_all([
+            models.Answer(attempt_id=attempt.id, question_id=choice.id, answer_data="a"),
+            models.Answer(attempt_id=attempt.id, question_id=essay.id, answer_data="words"),
+        ])
+        db.commit()
+        crud.claim_submission(db, attempt.id, student.id)
+        return attempt, student
+
+    def test_grading_notifies_student_and_admins(self, test_db):
+        attempt, student = self.make_submitted_attempt(test_db)
+
+        async def scenario():
+            student_sub = event_bus.subscribe({student_channel(student.id)})
+            admin_sub = event_bus.subscribe({ADMIN_CHANNEL})
+            try:
+                grade_submitted_attempts(test_db, [attempt.id])
+                return await student_sub.get(1), await admin_sub.get(1)
+            finally:
+                event_bus.unsubscribe(student_sub)
+                event_bus.unsubscribe(admin_sub)
+
+        graded, pending = run(scenario())
+        assert graded.type == "grading_finished"
+        assert graded.data["score"] == 1.0
+        assert pending.type == "pending_evaluations"
+        assert pending.data == {"exam_id": str(attempt.exam_id), "count": 1}
+
+    def test_pending_count_drops_after_evaluation(self, test_db):
+        attempt, _ = self.make_submitted_attempt(test_db)
+        answer = test_db.query(models.Answer).join(models.Question).filter(models.Question.type == "text").one()
+        admin = models.User(email="grader@t.com", hashed_password="x", role="admin")
+        test_db.add(admin)
+        test_db.commit()
+        test_db.add(models.Evaluation(answer_id=answer.id, evaluated_by=admin.id, score_awarded=4))
+        test_db.commit()
+
+        assert notifications.pending_evaluation_counts(test_db, {attempt.exam_id}) == {attempt.exam_id: 0}
+
+
+class TestEventsEndpoint:
+    def test_rejects_invalid_token(self, test_db):
+        request = Request({"type": "http", "method": "GET", "path": "/student/events", "headers": []})
+        with pytest.raises(HTTPException) as exc:
+            run(student_routes.student_events(request, token="nope", db=test_db))
+        assert exc.value.status_code == 401
@@ -0,0 +1,147 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import crud, grading, jobs, models, statistics
+from app.routers import admin
+
+
+@pytest.fixture
+def close_exam(make_exam, make_question):
+    """Factory for hour-long exams with a choice, a multi-choice and an essay question (10 points)."""
+    def make(db, start, end):
+        questions = [
+            make_question(max_score=2),
+            make_question("multi_choice", title="Primes"),
+            make_question("text", title="Essay"),
+        ]
+        return make_exam(db, start, end, duration=60, questions=questions), questions
+
+    return make
+
+
+@pytest.fixture
+def started_attempt(make_attempt):
+    """Factory for attempts started at ``started``, with the deadline the start endpoint stores."""
+    def make(db, exam, started, answers=()):
+        deadline = crud.attempt_deadline(started, exam.duration_minutes, exam.end_time)
+        return make_attempt(db, exam, started, answers=answers, deadline_at=deadline)
+
+    return make
+
+
+class TestExamClose:
+    """Test suite for the exam-close job and exam statistics."""
+
+    def test_closes_ended_exam_and_stores_statistics(self, test_db, close_exam, started_attempt):
+        now = datetime.now(timezone.utc)
+        ended, (single, multi, _) = close_exam(test_db, now - timedelta(hours=2), now - timedelta(minutes=5))
+        running, _ = close_exam(test_db, now - timedelta(hours=1), now + timedelta(hours=1))
+
+        full = started_attempt(test_db, ended, now - timedelta(minutes=30), [(single, "4"), (multi, ["3", "2"])])
+        partial = started_attempt(test_db, ended, now - timedelta(minutes=90), [(single, "4"), (multi, ["2"])])
+        queued = started_attempt(test_db, ended, now - timedelta(minutes=40), [(single, "3")])
+        crud.submit_attempt(test_db, queued)
+        still_open = started_attempt(test_db, running, now - timedelta(minutes=10))
+
+        result = jobs.close_ended_exams(test_db, now=now)
+
+        assert result == {"exams_closed": 1, "attempts_closed": 2}
+        for attempt in (full, partial, queued, still_open):
+            test_db.refresh(attempt)
+        assert (full.score, partial.score, queued.score) == (5.0, 2.0, 0.0)
+        assert full.total_possible_score == 10.0
+        # Each attempt ends at its own deadline, capped at the exam end
+        assert crud.as_utc(full.end_time) == crud.as_utc(ended.end_time)
+        assert crud.as_utc(partial.end_time) == crud.as_utc(partial.start_time) + timedelta(minutes=60)
+        assert still_open.end_time is None
+
+        test_db.refresh(ended)
+        assert ended.closed_at is not None
+        stored = test_db.get(models.ExamStatistics, ended.id)
+        assert stored.attempts_count == 3
+        assert (stored.min_score, stored.median_score, stored.max_score) == (0.0, 2.0, 5.0)
+        assert stored.score_distribution == [1, 0, 1, 0, 0, 1, 0, 0, 0, 0]
+
+        assert jobs.close_ended_exams(test_db, now=now) == {"exams_closed": 0, "attempts_closed": 0}
+
+    def test_attempts_submitted_meanwhile_are_not_counted(self, test_db, close_exam, started_attempt, monkeypatch):
+        now = datetime.now(timezone.utc)
+        exam, (single, _, _) = close_exam(test_db, now - timedelta(hours=2), now - timedelta(minutes=5))
+        closing = started_attempt(test_db, exam, now - timedelta(minutes=30), [(single, "4")])
+        submitting = started_attempt(test_db, exam, now - timedelta(minutes=30), [(single, "3")])
+        score = grading.vectorized_scores
+
+        def submit_while_scoring(*args):
+            # The student's own submit lands after the open attempts were read
+            crud.submit_attempt(test_db, submitting)
+            return score(*args)
+
+        monkeypatch.setattr(grading, "vectorized_scores", submit_while_scoring)
+        assert grading.close_exam_attempts(test_db, exam.id, exam.end_time) == 1
+        test_db.refresh(closing)
+        test_db.refresh(submitting)
+        assert closing.score == 2.0
+        assert submitting.score is None
+
+    def test_statistics_endpoint_is_live_until_closed(self, test_db, close_exam, started_attempt):
+        now = datetime.now(timezone.utc)
+        exam, (single, _, _) = close_exam(test_db, now - timedelta(hours=2), now - timedelta(minutes=5))
+        started_attempt(test_db, exam, now - timedelta(minutes=30), [(single, "4")])
+
+        live = admin.get_exam_statistics(exam.id, db=test_db, _=None)
+        assert live["final"] is False and live["attempts_count"] == 0
+
+        jobs.close_ended_exams(test_db, now=now)
+        final = admin.get_exam_statistics(exam.id, db=test_db, _=None)
+        assert final["final"] is True
+        assert final["attempts_count"] == 1 and final["mean_score"] == 2.0
+
+    def test_statistics_for_exam_without_attempts(self, test_db, close_exam):
+        now = datetime.now(timezone.utc)
+        exam, _ = close_exam(test_db, now - timedelta(hours=2), now + timedelta(hours=1))
+        stats = statistics.compute_exam_statistics(test_db, exam.id)
+        assert stats["attempts_count"] == 0
+        assert stats["mean_score"] is None
+        assert stats["score_distribution"] == [0] * statistics.DISTRIBUTION_BUCKETS
+
+    def test_benchmark_close_uses_constant_statements(self, test_db, close_exam):
+        now = datetime.now(timezone.utc)
+        exam, (single, multi, _) = close_exam(test_db, now - timedelta(hours=2), now - timedelta(minutes=5))
+        student_ids = [uuid.uuid4() for _ in range(2000)]
+        test_db.execute(insert(models.User), [
+            {"id": student_id, "email": f"{student_id.hex}@t.com", "hashed_password": "x", "role": "student"}
+            for student_id in student_ids
+        ])
+        attempt_ids = [uuid.uuid4() for _ in range(2000)]
+        test_db.execute(insert(models.ExamAttempt), [
+            {"id": attempt_id, "exam_id": exam.id, "student_id": student_id,
+             "start_time": now - timedelta(minutes=50), "deadline_at": now - timedelta(minutes=5)}
+            for attempt_id, student_id in zip(attempt_ids, student_ids)
+        ])
+        test_db.execute(insert(models.Answer), [
+            {"attempt_id": attempt_id, "question_id": question.id, "answer_data": value}
+            for i, attempt_id in enumerate(attempt_ids)
+            for question, value in ((single, "4" if i % 2 else "3"), (multi, ["2", "3"]))
+        ])
+        test_db.commit()
+
+        statements = []
+        engine = test_db.get_bind()
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            result = jobs.close_ended_exams(test_db, now=now)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+        assert result["attempts_closed"] == 2000
+        assert len(statements) < 20
+        stored = test_db.get(models.ExamStatistics, exam.id)
+        assert stored.attempts_count == 2000
+        assert stored.mean_score == 4.0
@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, models, schemas
+
+
+def make_questions(db, count):
+    questions = [
+        models.Question(
+            title=f"Q{i}", complexity="easy", type="single_choice",
+            options=["a", "b"], correct_answers="a", max_score=1,
+        )
+        for i in range(count)
+    ]
+    db.add_all(questions)
+    db.commit()
+    return questions
+
+
+def exam_payload(question_ids, title="Exam", target="SSC"):
+    now = datetime.now(timezone.utc)
+    return schemas.ExamCreate(
+        title=title,
+        start_time=now,
+        end_time=now + timedelta(hours=1),
+        duration_minutes=30,
+        question_ids=question_ids,
+        target_candidates=target,
+    )
+
+
+class TestExamCreation:
+    """Test suite for bulk exam creation."""
+
+    def test_create_exam_links_questions_in_constant_queries(self, test_db):
+        question_ids = [q.id for q in make_questions(test_db, 200)]
+        statements = []
+        engine = test_db.get_bind()
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            exam = crud.create_exam(test_db, exam_payload(question_ids))
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+        assert len(statements) < 10
+        assert {q.id for q in exam.questions} == set(question_ids)
+
+    def test_duplicate_question_ids_are_linked_once(self, test_db):
+        q = make_questions(test_db, 1)[0]
+        exam = crud.create_exam(test_db, exam_payload([q.id, q.id]))
+        assert [x.id for x in exam.questions] == [q.id]
+
+    def test_missing_question_rejects_whole_batch(self, test_db):
+        questions = make_questions(test_db, 2)
+        missing = uuid.uuid4()
+        with pytest.raises(ValueError, match=str(missing)):
+            crud.create_exams_bulk(
+                test_db,
+                [exam_payload([questions[0].id]), exam_payload([questions[1].id, missing])],
+            )
+        assert test_db.query(models.Exam).count() == 0
+
+    def test_bulk_creates_per_cohort_variants(self, test_db):
+        questions = make_questions(test_db, 3)
+        ids = [q.id for q in questions]
+        exams = crud.create_exams_bulk(
+            test_db,
+            [exam_payload(ids, title=f"Mock ({c})", target=c) for c in ("SSC", "HSC", "Admission")],
+        )
+
+        assert [e.target_candidates for e in exams] == ["SSC", "HSC", "Admission"]
+        assert all(len(e.questions) == 3 for e in exams)
+        assert test_db.query(models.exam_questions).count() == 9
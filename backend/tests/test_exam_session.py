@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app import crud, exam_session, models, security
+from app.answer_writer import AnswerWrite, AnswerWriter, persist_answers
+from app.main import app
+
+
+@pytest.fixture
+def make_session(make_question, make_exam, make_student):
+    """Factory for a started two-question attempt; returns its id, the question ids and a token."""
+    def make(db, started_minutes_ago=1, duration=30):
+        questions = [make_question(title=f"Q{i}") for i in range(2)]
+        exam = make_exam(db, questions=questions, duration=duration)
+        student = make_student(db)
+        started = datetime.now(timezone.utc) - timedelta(minutes=started_minutes_ago)
+        attempt = crud.start_exam_attempt(db, exam, student.id, started)
+        token = security.create_access_token({"sub": student.email})
+        return attempt.id, [q.id for q in questions], token
+
+    return make
+
+
+@pytest.fixture
+def socket_client(file_db, monkeypatch):
+    writer = AnswerWriter(session_factory=file_db, flush_interval=0.01)
+    writer.start()
+    monkeypatch.setattr(exam_session, "answer_writer", writer)
+    monkeypatch.setattr(exam_session, "SessionLocal", file_db)
+    yield TestClient(app)
+    writer.stop()
+
+
+class TestPersistAnswers:
+    def test_batch_keeps_latest_change_per_question(self, test_db, make_session):
+        attempt_id, (q1, q2), _ = make_session(test_db)
+        test_db.add(models.Answer(attempt_id=attempt_id, question_id=q1, answer_data="b"))
+        test_db.commit()
+
+        outcomes = persist_answers(test_db, [
+            AnswerWrite(attempt_id, q1, "a", seq=2),
+            AnswerWrite(attempt_id, q1, "b", seq=1),
+            AnswerWrite(attempt_id, q2, "b", seq=3),
+        ])
+
+        assert outcomes == [None, None, None]
+        stored = {a.question_id: a.answer_data for a in test_db.query(models.Answer).all()}
+        assert stored == {q1: "a", q2: "b"}
+
+    def test_rejects_writes_to_submitted_attempt(self, test_db, make_session):
+        attempt_id, (q1, _), _ = make_session(test_db)
+        attempt = test_db.get(models.ExamAttempt, attempt_id)
+        crud.claim_submission(test_db, attempt_id, attempt.student_id)
+
+        assert persist_answers(test_db, [AnswerWrite(attempt_id, q1, "a", seq=1)]) == ["Exam already submitted"]
+        assert test_db.query(models.Answer).count() == 0
+
+
+class TestExamSessionSocket:
+    def test_answers_are_acked_once_stored(self, socket_client, file_db, make_session):
+        db = file_db()
+        attempt_id, (q1, q2), token = make_session(db)
+        db.close()
+
+        with socket_client.websocket_connect(f"/student/attempts/{attempt_id}/ws") as ws:
+            ws.send_json({"type": "auth", "token": token})
+            hello = ws.receive_json()
+            assert hello["type"] == "session"
+            assert 28 * 60 < hello["seconds_remaining"] <= 29 * 60
+
+            ws.send_json({"type": "answer", "seq": 1, "question_id": str(q1), "answer_data": "b"})
+            ws.send_json({"type": "answer", "seq": 2, "question_id": str(q1), "answer_data": "a"})
+            ws.send_json({"type": "answer", "seq": 3, "question_id": "not-a-question", "answer_data": "a"})
+            replies = [ws.receive_json() for _ in range(3)]
+
+        assert {"type": "error", "seq": 3, "detail": "Question is not part of this exam"} in replies
+        assert sorted(r["seq"] for r in replies if r["type"] == "ack") == [1, 2]
+        db = file_db()
+        assert [a.answer_data for a in db.query(models.Answer).all()] == ["a"]
+        db.close()
+
+    def test_deadline_auto_submits(self, socket_client, file_db, make_session):
+        db = file_db()
+        attempt_id, _, token = make_session(db, started_minutes_ago=30 - 1 / 60)
+        db.close()
+
+        with socket_client.websocket_connect(f"/student/attempts/{attempt_id}/ws") as ws:
+            ws.send_json({"type": "auth", "token": token})
+            assert ws.receive_json()["type"] == "session"
+            message = ws.receive_json()
+            assert message["type"] == "auto_submitted"
+            assert message["already_submitted"] is False
+
+        db = file_db()
+        assert db.get(models.ExamAttempt, attempt_id).end_time is not None
+        db.close()
+
+    def test_rejects_bad_token(self, socket_client, file_db, make_session):
+        db = file_db()
+        attempt_id, _, _ = make_session(db)
+        db.close()
+
+        for first_frame in ({"type": "auth", "token": "nope"}, {"type": "sync"}):
+            with socket_client.websocket_connect(f"/student/attempts/{attempt_id}/ws") as ws:
+                ws.send_json(first_frame)
+                with pytest.raises(WebSocketDisconnect) as exc:
+                    ws.receive_json()
+            assert exc.value.code == 4401
@@ -0,0 +1,79 @@
+from app import crud, models, schemas
+from app.facets import FacetIndex, facet_index
+
+
+def make_question(db, title, qtype="single_choice", complexity="easy", tags=None):
+    question = models.Question(
+        title=title,
+        complexity=complexity,
+        type=qtype,
+        options=["a", "b"],
+        correct_answers="a",
+        max_score=1,
+        tags=tags or [],
+    )
+    db.add(question)
+    db.commit()
+    return question
+
+
+class TestFacetIndex:
+    """Test suite for the in-memory question facet index."""
+
+    def test_combined_filters(self, test_db):
+        q1 = make_question(test_db, "A", tags=["history", "world"])
+        q2 = make_question(test_db, "B", qtype="multi_choice", tags=["history"])
+        make_question(test_db, "C", complexity="hard", tags=["science"])
+
+        index = FacetIndex()
+        index.rebuild(test_db)
+
+        assert set(index.query(tags=["history"])) == {q1.id, q2.id}
+        assert index.query(question_type="single_choice", tags=["history", "world"]) == [q1.id]
+        assert index.query(complexity="HARD", tags=["history"]) == []
+        assert index.count() == 3
+
+    def test_facet_counts(self, test_db):
+        make_question(test_db, "A", tags=["history"])
+        make_question(test_db, "B", qtype="text", tags=["history", "art"])
+        make_question(test_db, "C", qtype="text", complexity="medium", tags=["art"])
+
+        index = FacetIndex()
+        index.rebuild(test_db)
+        counts = index.facet_counts(question_type="text")
+
+        # Type counts ignore the type filter so alternatives remain visible
+        assert counts["type"] == {"single_choice": 1, "text": 2}
+        assert counts["complexity"] == {"easy": 1, "medium": 1}
+        assert counts["tags"] == {"art": 2, "history": 1}
+
+    def test_add_and_remove(self, test_db):
+        q1 = make_question(test_db, "A", tags=["space"])
+        index = FacetIndex()
+        index.rebuild(test_db)
+
+        q2 = make_question(test_db, "B", tags=["space"])
+        index.add(q2)
+        assert set(index.query(tags=["space"])) == {q1.id, q2.id}
+
+        index.remove([q1.id])
+        assert index.query(tags=["space"]) == [q2.id]
+        assert index.facet_counts()["tags"] == {"space": 1}
+
+    def test_create_question_updates_global_index(self, test_db):
+        facet_index.rebuild(test_db)
+        question = crud.create_question(
+            test_db,
+            schemas.QuestionBase(
+                title="Newly created",
+                complexity="easy",
+                type="single_choice",
+                options=["a", "b"],
+                correct_answers="a",
+                tags=["biology"],
+            ),
+        )
+        try:
+            assert facet_index.query(tags=["biology"]) == [question.id]
+        finally:
+            facet_index.invalidate()
@@ -0,0 +1,132 @@
+import random
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, grading
+
+
+@pytest.fixture
+def plan_exam(make_exam, make_question):
+    """Factory for an exam with a single-choice, a multi-choice and a free-text question."""
+    def make(db):
+        questions = (
+            make_question(title="Capital of France?", options=["Paris", "London"], correct_answers="Paris"),
+            make_question("multi_choice", title="Primes", complexity="medium",
+                          options=["2", "4", "5"], correct_answers=["2", "5"], max_score=2),
+            make_question("text", title="Explain", complexity="hard", correct_answers=None),
+        )
+        now = datetime.now(timezone.utc)
+        return make_exam(db, now, now, questions=questions), questions
+
+    return make
+
+
+class TestGradingPlan:
+    """Test suite for compiled per-exam grading plans."""
+
+    def test_compile_plan(self, test_db, plan_exam):
+        exam, (q1, q2, q3) = plan_exam(test_db)
+        plan = grading.compile_plan(test_db, exam.id)
+
+        keys = {k.question_id: k for k in plan.questions}
+        assert keys[q1.id].answer_key == frozenset({"Paris"})
+        assert keys[q2.id].answer_key == frozenset({"2", "5"})
+        assert keys[q3.id].answer_key is None
+        assert plan.total_possible == 8.0
+        assert plan.score({q1.id: "Paris", q2.id: ["5", "2"], q3.id: "essay"}) == 3.0
+
+    def test_missing_exam_has_no_plan(self, test_db):
+        assert grading.compile_plan(test_db, uuid.uuid4()) is None
+
+    def test_plan_is_reused_across_submissions(self, test_db, plan_exam, make_attempt):
+        exam, (q1, q2, _) = plan_exam(test_db)
+        first = make_attempt(test_db, exam, answers=[(q1, "Paris")])
+        second = make_attempt(test_db, exam, answers=[(q2, ["2", "5"])])
+        crud.calculate_and_save_score(test_db, first)
+
+        statements = []
+        engine = test_db.get_bind()
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            graded = crud.calculate_and_save_score(test_db, second)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert graded.score == 2.0
+        assert not any("FROM questions" in s or "JOIN questions" in s for s in statements)
+
+    def test_invalidation_recompiles(self, test_db, plan_exam):
+        exam, (q1, _, _) = plan_exam(test_db)
+        plan = grading.get_grading_plan(test_db, exam.id)
+        assert grading.get_grading_plan(test_db, exam.id) is plan
+
+        grading.invalidate_grading_plan(exam.id)
+        assert grading.get_grading_plan(test_db, exam.id) is not plan
+
+
+class TestVectorizedRegrade:
+    """Test suite for the NumPy whole-exam regrade."""
+
+    def test_regrade_matches_plan_scoring_after_key_change(self, test_db, plan_exam, make_attempt):
+        exam, (q1, q2, q3) = plan_exam(test_db)
+        attempts = [
+            make_attempt(test_db, exam, answers=[(q1, "Paris"), (q2, ["2", "5"])]),
+            make_attempt(test_db, exam, answers=[(q1, "London"), (q2, ["2"])]),
+            make_attempt(test_db, exam, answers=[(q1, "Lyon"), (q2, ["5", "2", "9"]), (q3, "essay")]),
+            make_attempt(test_db, exam, answers=[]),
+        ]
+        for attempt in attempts:
+            crud.calculate_and_save_score(test_db, attempt)
+        assert [a.score for a in attempts] == [3.0, 0.0, 0.0, 0.0]
+
+        # Answer key corrected after the exam
+        q1.correct_answers = "London"
+        test_db.commit()
+
+        summary = grading.regrade_exam(test_db, exam.id)
+        assert summary["attempts_regraded"] == 4
+        assert summary["scores_changed"] == 2
+
+        for attempt in attempts:
+            test_db.refresh(attempt)
+        assert [a.score for a in attempts] == [2.0, 1.0, 0.0, 0.0]
+        assert all(a.total_possible_score == 8.0 for a in attempts)
+
+    def test_vectorized_scores_agree_with_plan(self):
+        rng = random.Random(7)
+        questions = []
+        options = {}
+        for i in range(40):
+            qid = uuid.uuid4()
+            opts = [str(n) for n in range(4)]
+            multi = i % 2 == 0
+            key = frozenset(rng.sample(opts, 2)) if multi else frozenset([rng.choice(opts)])
+            questions.append(grading.QuestionKey(qid, "multi_choice" if multi else "single_choice", 1.0 + i % 3, key))
+            options[qid] = opts
+        plan = grading.GradingPlan(uuid.uuid4(), tuple(questions), sum(q.max_score for q in questions))
+
+        attempt_ids = [uuid.uuid4() for _ in range(300)]
+        per_attempt = {aid: {} for aid in attempt_ids}
+        rows = []
+        for aid in attempt_ids:
+            for key in questions:
+                if rng.random() < 0.1:
+                    continue
+                if rng.random() < 0.5:
+                    data = sorted(key.answer_key)
+                else:
+                    data = rng.sample(options[key.question_id] + ["x"], rng.randint(1, 2))
+                if key.type == "single_choice":
+                    data = data[0]
+                per_attempt[aid][key.question_id] = data
+                rows.append((aid, key.question_id, data))
+
+        scores = grading.vectorized_scores(plan, options, attempt_ids, rows)
+        assert list(scores) == [plan.score(per_attempt[aid]) for aid in attempt_ids]
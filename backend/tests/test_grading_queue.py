@@ -0,0 +1,144 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, jobs, models
+from app.database import Base
+from app.grading import grade_submitted_attempts
+from app.grading_queue import GradingQueue
+from app.metrics import metrics
+from app.routers import student
+
+
+@pytest.fixture
+def seed(make_question, make_exam, make_student):
+    """Factory for an open exam with one attempt per student; even-numbered students answer correctly."""
+    def make(db, students=1):
+        question = make_question(max_score=2)
+        exam = make_exam(db, duration=60, questions=[question])
+        attempts = []
+        for i in range(students):
+            student = make_student(db)
+            attempt = crud.create_exam_attempt(db, exam.id, student.id, exam=exam)
+            answer = "4" if i % 2 == 0 else "3"
+            db.add(models.Answer(attempt_id=attempt.id, question_id=question.id, answer_data=answer))
+            db.commit()
+            attempts.append(attempt)
+        return exam, attempts
+
+    return make
+
+
+class TestGradingQueue:
+    """Test suite for queued submission grading."""
+
+    def test_grades_only_submitted_ungraded_attempts(self, test_db, seed):
+        _, (submitted, open_attempt) = seed(test_db, students=2)
+        crud.submit_attempt(test_db, submitted)
+
+        assert crud.attempt_state(submitted) == "grading"
+        assert grade_submitted_attempts(test_db, [submitted.id, open_attempt.id]) == 1
+        test_db.refresh(submitted)
+        test_db.refresh(open_attempt)
+        assert crud.attempt_state(submitted) == "graded"
+        assert submitted.score == 2.0 and submitted.total_possible_score == 2.0
+        assert crud.attempt_state(open_attempt) == "in_progress"
+        # Already graded: nothing left to do
+        assert grade_submitted_attempts(test_db, [submitted.id]) == 0
+
+    def test_worker_pool_grades_burst(self, tmp_path, seed):
+        engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        db = factory()
+        _, attempts = seed(db, students=40)
+        for attempt in attempts:
+            crud.submit_attempt(db, attempt)
+
+        metrics.reset()
+        pool = GradingQueue(session_factory=factory, workers=2, max_pending=100, batch_size=16)
+        pool.start()
+        try:
+            assert all(pool.submit(db, attempt.id) for attempt in attempts)
+            give_up_at = time.monotonic() + 10
+            while pool.status()["pending"] and time.monotonic() < give_up_at:
+                time.sleep(0.05)
+        finally:
+            # Joins the workers, so any batch still in flight completes first
+            pool.stop()
+
+        db.expire_all()
+        scores = [db.get(models.ExamAttempt, attempt.id).score for attempt in attempts]
+        assert scores == [2.0 if i % 2 == 0 else 0.0 for i in range(40)]
+        assert metrics.counter("grading.graded") == 40
+        assert metrics.snapshot()["observations"]["grading.batch_size"]["max"] <= 16
+        db.close()
+        engine.dispose()
+
+    def test_grades_inline_when_pool_not_running(self, test_db, seed):
+        _, (attempt,) = seed(test_db)
+        crud.submit_attempt(test_db, attempt)
+
+        assert GradingQueue(workers=0).submit(test_db, attempt.id) is False
+        test_db.refresh(attempt)
+        assert attempt.score == 2.0
+
+    def test_recovery_job_grades_stale_submissions(self, test_db, seed):
+        _, (attempt,) = seed(test_db)
+        crud.submit_attempt(test_db, attempt)
+
+        assert jobs.grade_pending_attempts(test_db)["attempts_graded"] == 0
+        later = datetime.now(timezone.utc) + timedelta(seconds=jobs.GRADING_RETRY_AFTER_SECONDS + 1)
+        assert jobs.grade_pending_attempts(test_db, now=later)["attempts_graded"] == 1
+
+    def test_submit_and_status_endpoints(self, test_db, seed):
+        _, (attempt,) = seed(test_db)
+        student_user = attempt.student
+
+        status_body = asyncio.run(student.get_attempt_status(attempt.id, wait=0, db=test_db, current_user=student_user))
+        assert status_body["state"] == "in_progress"
+
+        # The pool only runs inside the app's startup, so this submit is graded inline
+        response = Response()
+        body = student.submit_exam(attempt.id, response, db=test_db, current_user=student_user)
+        assert response.status_code == 200
+        assert body["state"] == "graded" and body["score"] == 2.0
+
+        started = time.monotonic()
+        status_body = asyncio.run(student.get_attempt_status(attempt.id, wait=5, db=test_db, current_user=student_user))
+        assert time.monotonic() - started < 1
+        assert status_body["state"] == "graded"
+        assert status_body["score"] == 2.0 and status_body["total_possible_score"] == 2.0
+
+    def test_status_long_poll_times_out_while_grading(self, test_db, seed):
+        _, (attempt,) = seed(test_db)
+        crud.submit_attempt(test_db, attempt)
+
+        started = time.monotonic()
+        status_body = asyncio.run(student.get_attempt_status(attempt.id, wait=0.2, db=test_db, current_user=attempt.student))
+        assert 0.2 <= time.monotonic() - started < 2
+        assert status_body["state"] == "grading"
+        assert status_body["score"] is None
+
+    def test_status_long_poll_wakes_on_grading_event(self, test_db, seed):
+        _, (attempt,) = seed(test_db)
+        crud.submit_attempt(test_db, attempt)
+        attempt_id, student_user = attempt.id, attempt.student
+
+        async def scenario():
+            poll = asyncio.create_task(
+                student.get_attempt_status(attempt_id, wait=10, db=test_db, current_user=student_user)
+            )
+            await asyncio.sleep(0.2)
+            assert not poll.done()
+            # Grading elsewhere publishes grading_finished; the waiting request re-reads at once
+            grade_submitted_attempts(test_db, [attempt_id])
+            return await asyncio.wait_for(poll, student.STATUS_POLL_SECONDS - 1)
+
+        status_body = asyncio.run(scenario())
+        assert status_body["state"] == "graded" and status_body["score"] == 2.0
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app import jobs
+from app.heartbeats import HeartbeatStore, heartbeat_store
+from app.live import LiveExams
+from app.routers import student as student_routes
+
+
+@pytest.fixture
+def open_attempts(test_db, make_exam, make_student, make_attempt):
+    now = datetime.now(timezone.utc)
+    exam = make_exam(test_db, now - timedelta(minutes=5), now + timedelta(hours=1), questions=[])
+    users = [make_student(test_db) for _ in range(2)]
+    attempts = [make_attempt(test_db, exam, now, student=user, deadline_at=now + timedelta(minutes=30))
+                for user in users]
+    return exam, users, attempts
+
+
+class TestHeartbeats:
+    def test_pings_are_coalesced_into_one_write_per_attempt(self, test_db, open_attempts):
+        _, _, (first, second) = open_attempts
+        store = HeartbeatStore()
+        base = datetime.now(timezone.utc)
+        for seconds in (1, 3, 2):
+            store.beat(first.id, base + timedelta(seconds=seconds))
+        store.beat(second.id, base)
+        assert store.pending() == 2
+
+        assert store.flush(test_db) == 2
+        assert store.pending() == 0
+        test_db.expire_all()
+        assert first.last_seen_at.replace(tzinfo=timezone.utc) == base + timedelta(seconds=3)
+        assert second.last_seen_at.replace(tzinfo=timezone.utc) == base
+        assert store.flush(test_db) == 0
+
+    def test_flush_skips_closed_attempts_and_older_pings(self, test_db, open_attempts):
+        _, _, (open_attempt, closed_attempt) = open_attempts
+        now = datetime.now(timezone.utc)
+        open_attempt.last_seen_at = now
+        closed_attempt.end_time = now
+        test_db.commit()
+
+        store = HeartbeatStore()
+        store.beat(open_attempt.id, now - timedelta(seconds=30))
+        store.beat(closed_attempt.id, now)
+        store.flush(test_db)
+
+        test_db.expire_all()
+        assert open_attempt.last_seen_at.replace(tzinfo=timezone.utc) == now
+        assert closed_attempt.last_seen_at is None
+
+    def test_endpoint_records_ping_for_own_attempt_only(self, test_db, open_attempts):
+        _, (owner, other), (attempt, _) = open_attempts
+
+        result = student_routes.attempt_heartbeat(attempt.id, db=test_db, current_user=owner)
+        assert 0 < result["seconds_remaining"] <= 30 * 60
+        with pytest.raises(HTTPException) as exc:
+            student_routes.attempt_heartbeat(attempt.id, db=test_db, current_user=other)
+        assert exc.value.status_code == 404
+
+        assert jobs.flush_heartbeats(test_db) == {"attempts_updated": 1}
+        test_db.expire_all()
+        assert attempt.last_seen_at is not None
+        assert heartbeat_store.pending() == 0
+
+    def test_persisted_pings_seed_the_live_board(self, test_db, open_attempts):
+        exam, _, (attempt, _) = open_attempts
+        attempt.last_seen_at = datetime.now(timezone.utc) - timedelta(minutes=10)
+        test_db.commit()
+
+        snapshot = LiveExams().snapshot(test_db, exam.id)
+        assert snapshot["stale_attempts"] == 1
+        assert snapshot["stale"][0]["attempt_id"] == str(attempt.id)
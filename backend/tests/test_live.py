@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import Response
+
+from app import jobs, live, models, schemas
+from app.live import LiveExams, live_exams
+from app.routers import admin as admin_routes
+from app.routers import student as student_routes
+
+
+@pytest.fixture
+def live_exam(test_db, make_exam, make_question, make_student):
+    """An exam that started five minutes ago, its question and three students."""
+    now = datetime.now(timezone.utc)
+    question = make_question(options=["a", "b"], correct_answers="a")
+    exam = make_exam(test_db, now - timedelta(minutes=5), now + timedelta(hours=1), questions=[question])
+    return exam, question, [make_student(test_db) for _ in range(3)]
+
+
+class TestLiveExams:
+    def test_deltas_from_several_processes_are_summed(self, test_db, live_exam):
+        exam, _, _ = live_exam
+        board = LiveExams()
+        board.snapshot(test_db, exam.id)  # seed: nothing started yet
+
+        # Two workers each publish their own deltas
+        board.apply({"exam_id": str(exam.id), "started": 3, "submitted": 0, "answers": 4,
+                     "seen": {"a": 1.0, "b": 2.0, "c": 3.0}, "submitted_ids": []})
+        board.apply({"exam_id": str(exam.id), "started": 1, "submitted": 1, "answers": 2,
+                     "seen": {"d": 4.0}, "submitted_ids": ["c"]})
+
+        snapshot = board.snapshot(test_db, exam.id)
+        assert snapshot["active_attempts"] == 3
+        assert snapshot["submitted_attempts"] == 1
+        assert snapshot["answers_saved"] == 6
+        assert snapshot["answers_per_second"] == 0.6
+        # a, b and d were last seen long ago; c is submitted and no longer tracked
+        assert snapshot["stale_attempts"] == 3
+        assert [s["attempt_id"] for s in snapshot["stale"]] == ["a", "b", "d"]
+
+    def test_deltas_recorded_before_the_seed_are_not_counted_twice(self, test_db, monkeypatch, live_exam):
+        exam, _, (student, *_) = live_exam
+        # Started and buffered here, but only published after another process seeded its board
+        student_routes.start_exam(exam.id, db=test_db, current_user=student)
+        board = LiveExams()
+        assert board.snapshot(test_db, exam.id)["active_attempts"] == 1
+
+        sent = []
+        monkeypatch.setattr(live.event_bus, "publish", lambda channel, kind, data: sent.append(data))
+        live_exams.publish()
+        [delta] = sent
+        board.apply(delta)
+        assert board.snapshot(test_db, exam.id)["active_attempts"] == 1
+
+    def test_deltas_for_unwatched_exams_keep_no_board(self, test_db, live_exam):
+        exam, _, _ = live_exam
+        board = LiveExams()
+        board.apply({"exam_id": str(exam.id), "started": 2, "seen": {"a": 1.0}, "submitted_ids": []})
+        snapshot = board.snapshot(test_db, exam.id)
+        assert snapshot["active_attempts"] == 0 and snapshot["stale_attempts"] == 0
+
+    def test_closing_an_exam_drops_its_board(self, test_db, live_exam):
+        exam, _, _ = live_exam
+        exam.end_time = datetime.now(timezone.utc) - timedelta(minutes=5)
+        test_db.commit()
+        live_exams.snapshot(test_db, exam.id)
+
+        jobs.close_ended_exams(test_db)
+        # Without a board the delta is dropped and the next look re-reads the database
+        live_exams.apply({"exam_id": str(exam.id), "started": 5})
+        assert live_exams.snapshot(test_db, exam.id)["active_attempts"] == 0
+
+    def test_publish_splits_large_deltas(self, monkeypatch):
+        sent = []
+        monkeypatch.setattr(live.event_bus, "publish", lambda channel, kind, data: sent.append(data))
+        board = LiveExams()
+        for i in range(250):
+            board.record_answers("exam", f"attempt-{i}")
+
+        assert board.publish() == 3
+        assert sum(len(data["seen"]) for data in sent) == 250
+        assert sent[0]["answers"] == 250 and "answers" not in sent[1]
+        assert board.publish() == 0
+
+    def test_hot_paths_feed_the_live_board(self, test_db, live_exam):
+        exam, question, (first, second, _) = live_exam
+        assert admin_routes.get_exam_live(exam.id, db=test_db)["active_attempts"] == 0
+
+        for student in (first, second):
+            student_routes.start_exam(exam.id, db=test_db, current_user=student)
+        attempt = test_db.query(models.ExamAttempt).filter_by(student_id=first.id).one()
+        student_routes.save_answer(
+            attempt.id, schemas.AnswerCreate(question_id=question.id, answer_data="a"),
+            db=test_db, current_user=first,
+        )
+        student_routes.submit_exam(attempt.id, Response(), db=test_db, current_user=first)
+        # Nothing reaches the board until the process publishes its deltas
+        assert admin_routes.get_exam_live(exam.id, db=test_db)["submitted_attempts"] == 0
+        live_exams.publish()
+
+        snapshot = admin_routes.get_exam_live(exam.id, db=test_db)
+        assert snapshot["active_attempts"] == 1
+        assert snapshot["submitted_attempts"] == 1
+        assert snapshot["answers_saved"] == 1
+        assert snapshot["connected_attempts"] == 1
+        assert snapshot["stale_attempts"] == 0
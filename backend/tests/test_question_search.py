@@ -0,0 +1,109 @@
+import pytest
+from app import models, search
+
+
+def add_questions(db, count, **overrides):
+    questions = []
+    for i in range(count):
+        fields = dict(
+            title=f"Question {i:03d}",
+            description="A plain question",
+            complexity="easy",
+            type="single_choice",
+            options=["a", "b"],
+            correct_answers="a",
+            max_score=1,
+            tags=["history"],
+        )
+        fields.update(overrides)
+        questions.append(models.Question(**fields))
+    db.add_all(questions)
+    db.commit()
+    return questions
+
+
+class TestQuestionSearch:
+    """Test suite for the indexed question search."""
+
+    def test_text_search_uses_fts_substring_match(self, test_db):
+        add_questions(test_db, 3)
+        add_questions(test_db, 1, title="Capital of France?", description="Geography")
+        add_questions(test_db, 1, title="Rivers", description="Which river flows through PARIS?")
+
+        page = search.search_questions(test_db, search="paris")
+        assert [q.title for q in page.items] == ["Rivers"]
+
+        page = search.search_questions(test_db, search="France")
+        assert [q.title for q in page.items] == ["Capital of France?"]
+
+    def test_short_term_falls_back_to_like(self, test_db):
+        add_questions(test_db, 2)
+        add_questions(test_db, 1, title="Is 2+2 = 4?")
+
+        page = search.search_questions(test_db, search="2+")
+        assert [q.title for q in page.items] == ["Is 2+2 = 4?"]
+
+    def test_search_matches_complexity_exactly(self, test_db):
+        add_questions(test_db, 2)
+        add_questions(test_db, 1, title="Tough one", complexity="hard")
+
+        page = search.search_questions(test_db, search="Hard")
+        assert [q.title for q in page.items] == ["Tough one"]
+
+    def test_fts_index_follows_updates_and_deletes(self, test_db):
+        question = add_questions(test_db, 1, title="Old wording")[0]
+        question.title = "New wording"
+        test_db.commit()
+
+        assert search.search_questions(test_db, search="Old").items == []
+        assert len(search.search_questions(test_db, search="New").items) == 1
+
+        test_db.delete(question)
+        test_db.commit()
+        assert search.search_questions(test_db, search="New").items == []
+
+    def test_tag_filter_uses_json_containment(self, test_db):
+        add_questions(test_db, 2, tags=["history"])
+        add_questions(test_db, 1, title="Planets", tags=["space", "science"])
+        add_questions(test_db, 1, title="Untagged", tags=[])
+
+        page = search.search_questions(test_db, tag="Science")
+        assert [q.title for q in page.items] == ["Planets"]
+
+    def test_combined_filters(self, test_db):
+        add_questions(test_db, 2, type="multi_choice", complexity="medium")
+        add_questions(test_db, 2, type="text", complexity="medium")
+
+        page = search.search_questions(test_db, question_type="text", complexity="MEDIUM")
+        assert len(page.items) == 2
+        assert all(q.type == "text" for q in page.items)
+
+    def test_keyset_pagination_walks_every_row_once(self, test_db):
+        add_questions(test_db, 23)
+        add_questions(test_db, 2, title="Question 005")  # duplicate titles tie-break on id
+
+        seen = []
+        cursor = None
+        while True:
+            page = search.search_questions(test_db, limit=10, cursor=cursor)
+            seen.extend(q.id for q in page.items)
+            assert page.total_estimate == 25
+            assert page.total_is_exact
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert len(seen) == 25
+        assert len(set(seen)) == 25
+
+    def test_count_is_capped(self, test_db, monkeypatch):
+        monkeypatch.setattr(search, "COUNT_CAP", 5)
+        add_questions(test_db, 8)
+
+        page = search.search_questions(test_db, limit=3)
+        assert page.total_estimate == 5
+        assert page.total_is_exact is False
+
+    def test_invalid_cursor_raises_value_error(self, test_db):
+        with pytest.raises(ValueError):
+            search.search_questions(test_db, cursor="not-a-cursor")
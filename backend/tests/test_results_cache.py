@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, schemas
+from app.routers import admin as admin_routes
+from app.routers import student as student_routes
+
+
+@pytest.fixture
+def submitted_attempt(test_db, make_question, make_exam, make_student, make_attempt):
+    now = datetime.now(timezone.utc)
+    essay, pick = make_question("text", title="Essay"), make_question(title="Pick")
+    exam = make_exam(test_db, now - timedelta(hours=2), now - timedelta(hours=1), questions=[essay, pick])
+    student = make_student(test_db)
+    teacher = make_student(test_db, role="admin")
+    attempt = make_attempt(test_db, exam, now - timedelta(hours=2), student=student,
+                           end_time=now - timedelta(hours=1, minutes=45), answers=[(essay, "words"), (pick, "4")])
+    crud.calculate_and_save_score(test_db, attempt)
+    [essay_answer] = [a for a in crud.get_answers(test_db, attempt.id) if a.question_id == essay.id]
+    return exam, attempt, student, teacher, essay_answer
+
+
+def count_statements(db, call):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        result = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return result, len(statements)
+
+
+class TestResultsCache:
+    def test_repeat_requests_only_check_ownership(self, test_db, submitted_attempt):
+        _, attempt, student, _, _ = submitted_attempt
+        test_db.refresh(student)
+
+        first = student_routes.get_evaluated_results(attempt.id, db=test_db, current_user=student)
+        again, statements = count_statements(
+            test_db, lambda: student_routes.get_evaluated_results(attempt.id, db=test_db, current_user=student)
+        )
+        assert again is first and statements == 1
+
+        results = student_routes.get_attempt_results(attempt.id, db=test_db, current_user=student)
+        assert student_routes.get_attempt_results(attempt.id, db=test_db, current_user=student) is results
+
+    def test_evaluation_writes_refresh_the_results(self, test_db, submitted_attempt):
+        _, attempt, student, teacher, essay_answer = submitted_attempt
+        before = student_routes.get_evaluated_results(attempt.id, db=test_db, current_user=student)
+        assert before["score"] == 1
+
+        admin_routes.submit_answer_evaluation(
+            essay_answer.id, {"is_correct": True, "comment": "Good"}, db=test_db, current_user=teacher
+        )
+        after = student_routes.get_evaluated_results(attempt.id, db=test_db, current_user=student)
+        assert after["score"] == 6
+        [evaluated] = [a for a in after["answers_with_evaluations"] if a["id"] == str(essay_answer.id)]
+        assert evaluated["evaluation"]["comment"] == "Good"
+
+    def test_exam_edits_drop_cached_pages(self, test_db, submitted_attempt):
+        exam, attempt, student, _, _ = submitted_attempt
+        first = student_routes.get_attempt_results(attempt.id, db=test_db, current_user=student)
+
+        exam.title = "Renamed"
+        test_db.commit()
+        crud.invalidate_exam_paper(exam.id)
+        renamed = student_routes.get_attempt_results(attempt.id, db=test_db, current_user=student)
+        assert renamed is not first and renamed["exam"]["title"] == "Renamed"
+
+    def test_crud_evaluation_writes_refresh_the_results(self, test_db, submitted_attempt):
+        _, attempt, student, teacher, essay_answer = submitted_attempt
+        student_routes.get_evaluated_results(attempt.id, db=test_db, current_user=student)
+
+        crud.create_or_update_evaluation(
+            test_db, essay_answer.id, teacher.id, schemas.EvaluationCreate(score_awarded=2, comment="Partly")
+        )
+        test_db.refresh(attempt)
+        assert attempt.final_score == 3
+        after = student_routes.get_evaluated_results(attempt.id, db=test_db, current_user=student)
+        assert after["score"] == 3
@@ -0,0 +1,92 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import crud, models
+from app.metrics import metrics
+from app.singleflight import SingleFlight
+
+
+def run_concurrently(func, workers):
+    barrier = threading.Barrier(workers)
+    results, errors = [], []
+
+    def call():
+        barrier.wait()
+        try:
+            results.append(func())
+        except Exception as e:  # collected for the assertions
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class TestSingleFlight:
+    """Test suite for request coalescing."""
+
+    def test_concurrent_callers_share_one_load(self):
+        metrics.reset()
+        flight = SingleFlight("test")
+        executions = []
+
+        def load():
+            executions.append(1)
+            time.sleep(0.2)
+            return {"paper": 1}
+
+        results, errors = run_concurrently(lambda: flight.do("exam", load), workers=10)
+
+        assert errors == []
+        assert len(executions) == 1
+        assert all(result is results[0] for result in results)
+        assert metrics.counter("singleflight.test.calls") == 10
+        assert metrics.counter("singleflight.test.coalesced") == 9
+        assert flight.in_flight() == 0
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight("test")
+
+        def load():
+            time.sleep(0.2)
+            raise RuntimeError("db down")
+
+        results, errors = run_concurrently(lambda: flight.do("exam", load), workers=5)
+
+        assert results == []
+        assert len(errors) == 5 and all(str(e) == "db down" for e in errors)
+
+    def test_results_are_not_kept_after_the_load(self):
+        flight = SingleFlight("test")
+        calls = []
+        flight.do("exam", lambda: calls.append(1))
+        flight.do("exam", lambda: calls.append(1))
+        assert len(calls) == 2
+
+    def test_exam_paper_hides_answer_keys(self, test_db):
+        now = datetime.now(timezone.utc)
+        admin = models.User(email="pub@t.com", hashed_password="x", role="admin")
+        question = models.Question(title="2+2?", complexity="easy", type="single_choice",
+                                   options=["3", "4"], correct_answers="4", max_score=1)
+        test_db.add(admin)
+        test_db.commit()
+        exam = models.Exam(title="Paper", start_time=now, end_time=now + timedelta(hours=1), duration_minutes=30,
+                           is_published=True, published_by=admin.id, questions=[question])
+        test_db.add(exam)
+        test_db.commit()
+
+        paper = crud.get_exam_paper(test_db, exam.id)
+        assert paper.published_by == "pub@t.com"
+        assert paper.start_time.tzinfo is not None
+        assert [q["title"] for q in paper.questions] == ["2+2?"]
+        assert "correct_answers" not in paper.questions[0]
+        with pytest.raises(AttributeError):
+            paper.title = "changed"
+        assert [p.id for p in crud.get_available_exam_papers(test_db)] == [exam.id]
+        assert crud.get_exam_paper(test_db, admin.id) is None
@@ -0,0 +1,98 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+
+
+@pytest.fixture
+def exam_and_student(make_exam, make_student):
+    """Factory for an open exam without questions and a student to start it."""
+    def make(db):
+        return make_exam(db, questions=[]), make_student(db)
+
+    return make
+
+
+def start_in_parallel(factory, exam_id, student_id, workers=8):
+    barrier = threading.Barrier(workers)
+    started, errors = [], []
+
+    def start():
+        db = factory()
+        try:
+            exam = db.get(models.Exam, exam_id)
+            barrier.wait()
+            started.append(crud.start_exam_attempt(db, exam, student_id).id)
+        except Exception as e:  # collected and asserted on below
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=start) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return started, errors
+
+
+class TestStartExam:
+    """Test suite for idempotent, race-free exam starts."""
+
+    def test_first_start_is_one_statement(self, test_db, exam_and_student):
+        exam, student = exam_and_student(test_db)
+        test_db.refresh(exam)
+        student_id = student.id
+
+        statements = []
+        engine = test_db.get_bind()
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            attempt = crud.start_exam_attempt(test_db, exam, student_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+        assert len(statements) == 1
+        assert "ON CONFLICT" in statements[0] and "RETURNING" in statements[0]
+        assert attempt.deadline_at is not None
+
+    def test_repeated_start_returns_open_attempt(self, test_db, exam_and_student):
+        exam, student = exam_and_student(test_db)
+        first = crud.start_exam_attempt(test_db, exam, student.id)
+        assert crud.start_exam_attempt(test_db, exam, student.id).id == first.id
+
+        crud.calculate_and_save_score(test_db, test_db.get(models.ExamAttempt, first.id))
+        assert crud.start_exam_attempt(test_db, exam, student.id).id != first.id
+
+    def test_unique_index_rejects_second_open_attempt(self, test_db, exam_and_student):
+        exam, student = exam_and_student(test_db)
+        crud.start_exam_attempt(test_db, exam, student.id)
+        test_db.add(models.ExamAttempt(exam_id=exam.id, student_id=student.id, start_time=datetime.now(timezone.utc)))
+        with pytest.raises(IntegrityError):
+            test_db.commit()
+        test_db.rollback()
+
+    @pytest.mark.parametrize("provisioned", [False, True])
+    def test_parallel_starts_share_one_attempt(self, file_db, provisioned, exam_and_student):
+        db = file_db()
+        exam, student = exam_and_student(db)
+        if provisioned:
+            crud.provision_exam_attempts(db, exam)
+        exam_id, student_id = exam.id, student.id
+
+        started, errors = start_in_parallel(file_db, exam_id, student_id)
+
+        assert errors == []
+        assert len(started) == 8 and len(set(started)) == 1
+        db.expire_all()
+        assert db.query(models.ExamAttempt).filter(models.ExamAttempt.student_id == student_id).count() == 1
+        db.close()
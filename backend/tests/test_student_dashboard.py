@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+
+from app import crud, models
+from app.routers import student as student_routes
+
+
+def make_request(etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/student/dashboard", "headers": headers})
+
+
+@pytest.fixture
+def dashboard_history(test_db, make_question, make_exam, make_student, make_attempt):
+    now = datetime.now(timezone.utc)
+    manual, auto = make_question("text", title="Essay"), make_question(title="Pick")
+    open_exam = make_exam(test_db, title="Open", questions=[auto])
+    past_exam = make_exam(test_db, now - timedelta(days=2), now - timedelta(days=1), title="Past",
+                          questions=[manual, auto])
+    make_exam(test_db, now, now + timedelta(hours=1), title="HSC only", target="HSC", questions=[])
+    student = make_student(test_db, candidate="SSC")
+    teacher = make_student(test_db, role="admin")
+    unfinished = make_attempt(test_db, open_exam, now, student=student)
+    completed = make_attempt(test_db, past_exam, now - timedelta(days=2), student=student,
+                             end_time=now - timedelta(days=2), score=1, total_possible_score=6,
+                             answers=[(manual, "words")])
+    [essay] = crud.get_answers(test_db, completed.id)
+    test_db.add(models.Evaluation(answer_id=essay.id, evaluated_by=teacher.id, score_awarded=3))
+    test_db.commit()
+    crud.evaluations_changed(test_db, completed.id)
+    return student, unfinished, completed
+
+
+class TestStudentDashboard:
+    def test_returns_all_sections(self, test_db, dashboard_history):
+        student, unfinished, completed = dashboard_history
+
+        response = student_routes.student_dashboard(make_request(), db=test_db, current_user=student)
+        body = json.loads(response.body)
+
+        # The HSC-only exam is not offered to an SSC candidate
+        assert sorted(exam["title"] for exam in body["exams"]) == ["Open", "Past"]
+        assert all("questions" not in exam for exam in body["exams"])
+        assert [a["id"] for a in body["unfinished_attempts"]] == [str(unfinished.id)]
+        assert body["unfinished_attempts"][0]["exam"]["title"] == "Open"
+        [entry] = body["completed_exams"]
+        assert entry["id"] == str(completed.id) and entry["exam_title"] == "Past"
+        # Auto-graded point plus the teacher's 3 points
+        assert entry["score"] == 4 and entry["percentage"] == 66.67
+
+    def test_matching_etag_returns_not_modified(self, test_db, dashboard_history):
+        student, _, _ = dashboard_history
+        first = student_routes.student_dashboard(make_request(), db=test_db, current_user=student)
+        etag = first.headers["etag"]
+
+        again = student_routes.student_dashboard(make_request(etag), db=test_db, current_user=student)
+        assert again.status_code == 304 and again.body == b""
+        assert again.headers["etag"] == etag
+
+        test_db.add(models.Exam(title="New", start_time=datetime.now(timezone.utc),
+                                end_time=datetime.now(timezone.utc) + timedelta(hours=1),
+                                duration_minutes=30, is_published=True))
+        test_db.commit()
+        student_routes.crud.invalidate_exam_paper()
+        changed = student_routes.student_dashboard(make_request(etag), db=test_db, current_user=student)
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+    def test_attempt_sections_are_capped_with_a_next_cursor(self, test_db, dashboard_history, make_exam,
+                                                             make_attempt, monkeypatch):
+        student, _, completed = dashboard_history
+        now = datetime.now(timezone.utc)
+        older = make_attempt(test_db, make_exam(test_db, title="Older"), now - timedelta(days=5), student=student,
+                             end_time=now - timedelta(days=5), score=0, total_possible_score=1)
+        monkeypatch.setattr(student_routes, "DASHBOARD_PAGE_SIZE", 1)
+
+        response = student_routes.student_dashboard(make_request(), db=test_db, current_user=student)
+        body = json.loads(response.body)
+        assert [entry["id"] for entry in body["completed_exams"]] == [str(completed.id)]
+        assert body["unfinished_next_cursor"] is None and body["completed_next_cursor"] is not None
+
+        rest = student_routes.list_completed_exams(
+            Response(), db=test_db, current_user=student,
+            limit=1, cursor=body["completed_next_cursor"], since=None, until=None,
+        )
+        assert [entry["id"] for entry in rest] == [str(older.id)]
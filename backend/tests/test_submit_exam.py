@@ -0,0 +1,85 @@
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+from app import crud, models
+from app.metrics import metrics
+from app.routers import student as student_routes
+
+
+@pytest.fixture
+def make_started_attempt(make_exam, make_student):
+    """Factory for an attempt started ``started_minutes_ago`` with the correct answer saved."""
+    def make(db, started_minutes_ago=5, duration=30):
+        exam = make_exam(db, duration=duration)
+        [question] = exam.questions
+        student = make_student(db)
+        started = datetime.now(timezone.utc) - timedelta(minutes=started_minutes_ago)
+        attempt = crud.start_exam_attempt(db, exam, student.id, started)
+        db.add(models.Answer(attempt_id=attempt.id, question_id=question.id, answer_data="4"))
+        db.commit()
+        return attempt, student
+
+    return make
+
+
+class TestSubmitExam:
+    """Test suite for the atomic submit claim."""
+
+    def test_claim_succeeds_once(self, test_db, make_started_attempt):
+        attempt, student = make_started_attempt(test_db)
+
+        claimed = crud.claim_submission(test_db, attempt.id, student.id)
+        assert claimed is not None and claimed.end_time is not None
+        assert crud.claim_submission(test_db, attempt.id, student.id) is None
+
+    def test_cannot_claim_another_students_attempt(self, test_db, make_started_attempt):
+        attempt, _ = make_started_attempt(test_db)
+        assert crud.claim_submission(test_db, attempt.id, uuid.uuid4()) is None
+
+    def test_late_claim_is_stamped_with_deadline(self, test_db, make_started_attempt):
+        attempt, student = make_started_attempt(test_db, started_minutes_ago=45, duration=30)
+
+        crud.claim_submission(test_db, attempt.id, student.id)
+
+        stored = test_db.get(models.ExamAttempt, attempt.id)
+        assert crud.as_utc(stored.end_time) == crud.as_utc(stored.deadline_at)
+
+    def test_concurrent_submits_grade_once(self, file_db, make_started_attempt):
+        db = file_db()
+        attempt, student = make_started_attempt(db)
+        attempt_id, student_id = attempt.id, student.id
+        db.close()
+        metrics.reset()
+
+        workers = 8
+        barrier = threading.Barrier(workers)
+        outcomes = []
+
+        def submit():
+            session = file_db()
+            try:
+                user = session.get(models.User, student_id)
+                barrier.wait()
+                body = student_routes.submit_exam(attempt_id, Response(), db=session, current_user=user)
+                outcomes.append(body["state"])
+            except HTTPException as e:
+                outcomes.append(e.detail)
+            finally:
+                session.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(outcomes) == ["Exam already submitted"] * (workers - 1) + ["graded"]
+        # The grading pool is not running here, so the one winner graded inline
+        assert metrics.counter("grading.inline") == 1
+        db = file_db()
+        assert db.get(models.ExamAttempt, attempt_id).score == 1.0
+        db.close()
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import jobs
+from app.grading import finalize_attempts
+from app.metrics import metrics
+from app.scheduler import Scheduler
+
+
+@pytest.fixture
+def sweep_exam(test_db, make_exam, make_question):
+    """A ten-minute exam worth two points, open from an hour ago to an hour from now."""
+    now = datetime.now(timezone.utc)
+    return make_exam(test_db, now - timedelta(hours=1), now + timedelta(hours=1), duration=10,
+                     questions=[make_question(max_score=2)])
+
+
+class TestExpiredAttemptSweeper:
+    """Test suite for the background auto-submit sweeper."""
+
+    def test_closes_only_expired_attempts(self, test_db, sweep_exam, make_attempt):
+        now = datetime.now(timezone.utc)
+        [question] = sweep_exam.questions
+        expired = make_attempt(test_db, sweep_exam, now - timedelta(minutes=20), answers=[(question, "4")])
+        active = make_attempt(test_db, sweep_exam, now - timedelta(minutes=2))
+
+        result = jobs.sweep_expired_attempts(test_db, now=now)
+
+        assert result["attempts_closed"] == 1
+        test_db.refresh(expired)
+        test_db.refresh(active)
+        assert expired.score == 2.0
+        assert expired.total_possible_score == 2.0
+        # Stamped with the deadline rather than the sweep time
+        assert jobs.as_utc(expired.end_time) == jobs.as_utc(expired.start_time) + timedelta(minutes=10)
+        assert active.end_time is None
+
+    def test_exam_window_closing_expires_attempt(self, test_db, make_exam, make_attempt):
+        now = datetime.now(timezone.utc)
+        exam = make_exam(test_db, now - timedelta(hours=2), now - timedelta(minutes=5), duration=120)
+        attempt = make_attempt(test_db, exam, now - timedelta(minutes=30))
+
+        jobs.sweep_expired_attempts(test_db, now=now)
+
+        test_db.refresh(attempt)
+        assert attempt.score == 0.0
+        assert jobs.as_utc(attempt.end_time) == jobs.as_utc(exam.end_time)
+
+    def test_batches_and_metrics(self, test_db, sweep_exam, make_attempt):
+        metrics.reset()
+        now = datetime.now(timezone.utc)
+        for i in range(5):
+            make_attempt(test_db, sweep_exam, now - timedelta(minutes=30, seconds=i))
+
+        result = jobs.sweep_expired_attempts(test_db, now=now, batch_size=2)
+
+        assert result == {"attempts_closed": 5, "batches": 3, "max_lag_seconds": result["max_lag_seconds"]}
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"]["sweeper.attempts_closed"] == 5
+        assert snapshot["observations"]["sweeper.batch_size"]["max"] == 2
+        assert snapshot["observations"]["sweeper.lag_seconds"]["last"] >= 20 * 60
+
+    def test_attempts_submitted_meanwhile_are_not_closed_or_announced(self, test_db, sweep_exam, make_attempt):
+        now = datetime.now(timezone.utc)
+        exam = sweep_exam
+        [question] = exam.questions
+        expired = make_attempt(test_db, exam, now - timedelta(minutes=20), answers=[(question, "4")])
+        submitted = make_attempt(test_db, exam, now - timedelta(minutes=20), answers=[(question, "3")])
+        submitted_at = now - timedelta(minutes=12)
+        submitted.end_time = submitted_at
+        test_db.commit()
+
+        # The sweeper read both rows before the student's own submit landed
+        deadline = now - timedelta(minutes=10)
+        closed = finalize_attempts(test_db, [(expired.id, exam.id, deadline), (submitted.id, exam.id, deadline)])
+
+        assert [row.id for row in closed] == [expired.id]
+        assert closed[0].student_id == expired.student_id
+        test_db.refresh(submitted)
+        assert submitted.score is None and jobs.as_utc(submitted.end_time) == submitted_at
+
+    def test_scheduler_runs_job_with_own_session(self, test_db, sweep_exam, make_attempt):
+        now = datetime.now(timezone.utc)
+        attempt = make_attempt(test_db, sweep_exam, now - timedelta(minutes=30))
+
+        runner = Scheduler(session_factory=sessionmaker(bind=test_db.get_bind()))
+        jobs.register_jobs(runner)
+        result = runner.run_job("sweep_expired_attempts")
+
+        assert result["attempts_closed"] == 1
+        assert runner.status()["jobs"][0]["runs"] == 1
+        test_db.refresh(attempt)
+        assert attempt.end_time is not None
+
+    def test_exclusive_job_is_skipped_while_another_process_holds_it(self, test_db, monkeypatch):
+        from app import scheduler as scheduler_module
+
+        runner = Scheduler(session_factory=sessionmaker(bind=test_db.get_bind()))
+        jobs.register_jobs(runner)
+        monkeypatch.setattr(scheduler_module, "_try_job_lock", lambda db, name: False)
+
+        assert runner.run_job("sweep_expired_attempts") is None
+        [status] = [job for job in runner.status()["jobs"] if job["name"] == "sweep_expired_attempts"]
+        assert status["skipped"] == 1 and status["runs"] == 0
@@ -0,0 +1,133 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, grading, jobs, warmup
+from app.cache import TTLCache
+from app.events import event_bus
+
+
+@pytest.fixture
+def exam_starting_in(make_exam):
+    """Factory for hour-long exams starting ``starts_in`` from now."""
+    def make(db, starts_in, **fields):
+        start = datetime.now(timezone.utc) + starts_in
+        return make_exam(db, start, start + timedelta(hours=1), **fields)
+
+    return make
+
+
+def count_statements(db, func):
+    statements = []
+    engine = db.get_bind()
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return result, statements
+
+
+class TestTTLCache:
+    """Test suite for the TTL cache."""
+
+    def test_entries_expire(self):
+        cache = TTLCache("test", ttl_seconds=0.05)
+        cache.set("k", 1)
+        assert cache.get("k") == 1 and "k" in cache
+        time.sleep(0.06)
+        assert cache.get("k") is None and "k" not in cache
+
+    def test_get_or_load_caches_non_none(self):
+        cache = TTLCache("test", ttl_seconds=60)
+        loads = []
+        assert cache.get_or_load("k", lambda: loads.append(1) or "v") == "v"
+        assert cache.get_or_load("k", lambda: loads.append(1) or "v") == "v"
+        assert cache.get_or_load("missing", lambda: None) is None
+        assert "missing" not in cache
+        assert len(loads) == 1
+
+    def test_evicts_when_full(self):
+        cache = TTLCache("test", ttl_seconds=60, max_entries=2)
+        cache.set("a", 1, ttl_seconds=1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        assert "a" not in cache and len(cache) == 2
+
+
+class TestExamWarmup:
+    """Test suite for pre-warming caches before an exam starts."""
+
+    def test_warms_only_exams_starting_soon(self, test_db, exam_starting_in, make_student):
+        soon = exam_starting_in(test_db, timedelta(minutes=3), target="SSC")
+        later = exam_starting_in(test_db, timedelta(hours=2))
+        exam_starting_in(test_db, timedelta(minutes=3), published=False)
+        make_student(test_db, candidate="SSC")
+        make_student(test_db, candidate="HSC")
+        soon_id = soon.id
+
+        result = jobs.warm_upcoming_exams(test_db)
+
+        assert result["exams_warmed"] == 1
+        status = warmup.snapshot()
+        assert [s["exam_id"] for s in status["exams"]] == [str(soon_id)]
+        assert status["exams"][0]["eligible_students"] == 1
+        assert status["exams"][0]["grading_plan"] is True
+        assert ("exam", later.id) not in crud.paper_cache
+
+        # Warmed: the paper, eligibility set and grading plan are served without queries
+        paper, statements = count_statements(test_db, lambda: crud.get_exam_paper(test_db, soon_id))
+        assert paper.id == soon_id and statements == []
+        _, statements = count_statements(test_db, lambda: (
+            crud.get_eligible_student_ids(test_db, paper), grading.get_grading_plan(test_db, soon_id)
+        ))
+        assert statements == []
+
+    def test_started_exams_are_not_rewarmed(self, test_db, exam_starting_in):
+        started = exam_starting_in(test_db, timedelta(minutes=-2))
+        upcoming = exam_starting_in(test_db, timedelta(minutes=3))
+        paper = crud.get_exam_paper(test_db, upcoming.id)
+
+        assert jobs.warm_upcoming_exams(test_db)["exams_warmed"] == 1
+        assert ("exam", started.id) not in crud.paper_cache
+        # Entries that were already warm are kept, not reloaded
+        assert crud.get_exam_paper(test_db, upcoming.id) is paper
+        _, statements = count_statements(test_db, lambda: jobs.warm_upcoming_exams(test_db))
+        assert len(statements) == 1
+
+    def test_unpublish_invalidates_cached_paper(self, test_db, exam_starting_in):
+        exam = exam_starting_in(test_db, timedelta(minutes=3))
+        jobs.warm_upcoming_exams(test_db)
+        exam.is_published = False
+        test_db.commit()
+        crud.invalidate_exam_paper(exam.id)
+        assert crud.get_exam_paper(test_db, exam.id).is_published is False
+
+    def test_invalidation_from_another_process_drops_cached_paper(self, test_db, exam_starting_in):
+        exam = exam_starting_in(test_db, timedelta(minutes=3))
+        jobs.warm_upcoming_exams(test_db)
+        exam.is_published = False
+        test_db.commit()
+
+        # What another worker's invalidate_exam_paper delivers to this one
+        event_bus.publish(crud.EXAM_CACHE_CHANNEL, "exam_changed", {"exam_id": str(exam.id)})
+        assert ("exam", exam.id) not in crud.paper_cache
+        assert crud.get_exam_paper(test_db, exam.id).is_published is False
+
+    def test_opens_pool_to_target_size(self, file_db, exam_starting_in):
+        db = file_db()
+        exam_starting_in(db, timedelta(minutes=1))
+        pool = db.get_bind().pool
+
+        result = jobs.warm_upcoming_exams(db)
+
+        assert result["connections_opened"] == pool.size()
+        assert pool.checkedin() >= pool.size() - 1
+        assert warmup.snapshot()["pool"]["opened"] == pool.size()
+        db.close()
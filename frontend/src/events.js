@@ -0,0 +1,14 @@
+import api from './api';
+
+// Subscribe to a server-sent event stream ('/student/events' or '/admin/events').
+// `handlers` maps event names to callbacks receiving the parsed data;
+// an 'open' handler runs whenever the stream (re)connects.
+// Returns a function that closes the stream.
+export function subscribeEvents(path, handlers) {
+  const token = localStorage.getItem('token');
+  const source = new EventSource(`${api.defaults.baseURL}${path}?token=${encodeURIComponent(token || '')}`);
+  Object.entries(handlers).forEach(([type, handler]) => {
+    source.addEventListener(type, (event) => handler(event.data ? JSON.parse(event.data) : null));
+  });
+  return () => source.close();
+}
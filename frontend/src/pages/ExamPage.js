@@ -1,7 +1,8 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useTheme } from '../context/ThemeContext';
 import api from '../api';
+import { subscribeEvents } from '../events';
 import Button from '../components/Button';
 
 
@@ -24,6 +25,21 @@ function ExamPage() {
   const [loadingResults, setLoadingResults] = useState(false);
   const [timeRemaining, setTimeRemaining] = useState(null);
   const [examEndTime, setExamEndTime] = useState(null);
+  const [queuePosition, setQueuePosition] = useState(null);
+  // Exam session socket and the sequence numbers of answers it has not acknowledged yet
+  const socketRef = useRef(null);
+  const seqRef = useRef(0);
+  const unackedRef = useRef(new Set());
+  // Highest stored sequence number this page has loaded; answers written after it are fetched as a delta
+  const syncedSeqRef = useRef(0);
+
+  // Sequence numbers follow the clock (milliseconds), never going backwards. A second tab on
+  // the same attempt restores the same last_seq, so plain counting from it would collide and
+  // the server would drop that tab's newer writes as stale; with the clock the later edit wins.
+  const nextSeq = () => {
+    seqRef.current = Math.max(seqRef.current + 1, Date.now());
+    return seqRef.current;
+  };
 
   const handleBackClick = () => {
     setShowBackConfirmModal(true);
@@ -62,11 +78,25 @@ function ExamPage() {
       let response;
 
       if (resumeAttemptId) {
-        // Resume an existing exam attempt
-        response = await api.post(`/student/attempts/${resumeAttemptId}/resume`);
+        // Resume an existing exam attempt. A fresh page holds no answers yet, so it asks for
+        // all of them (since_seq=0) inline, saving a second request; returning to the tab
+        // later only fetches the delta (see the visibility handler below).
+        response = await api.post(`/student/attempts/${resumeAttemptId}/resume`, null, { params: { since_seq: 0 } });
       } else {
-        // Start a new exam attempt
-        response = await api.post(`/student/exams/${id}/start`);
+        // Start a new exam attempt. During a start rush the server answers 429
+        // with our place in line; the timer only starts once we are let in.
+        while (!response) {
+          try {
+            response = await api.post(`/student/exams/${id}/start`);
+          } catch (err) {
+            if (err.response?.status !== 429) throw err;
+            const waiting = err.response.data?.detail;
+            setQueuePosition(waiting?.position ?? null);
+            const retryAfter = waiting?.retry_after_seconds || Number(err.response.headers?.['retry-after']) || 1;
+            await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+          }
+        }
+        setQueuePosition(null);
       }
 
       // Backend returns { exam: ExamForStudent, attempt: ExamAttempt }
@@ -77,7 +107,13 @@ function ExamPage() {
       setAttemptId(attemptObj?.id || null);
 
       // Set timer based on whether this is a new attempt or resuming
-      if (examObj?.duration_minutes && attemptObj?.start_time) {
+      if (typeof examObj?.time_remaining_seconds === 'number') {
+        // The server owns the deadline; anchor its remaining time to the local
+        // clock so a skewed device clock cannot extend the attempt
+        const remaining = Math.max(0, examObj.time_remaining_seconds);
+        setExamEndTime(new Date(Date.now() + remaining * 1000));
+        setTimeRemaining(remaining);
+      } else if (examObj?.duration_minutes && attemptObj?.start_time) {
         // Calculate student's personal exam end time based on when they started + duration
         const attemptStartTime = new Date(attemptObj.start_time);
         const durationMs = examObj.duration_minutes * 60 * 1000;
@@ -100,14 +136,21 @@ function ExamPage() {
         initialAnswers[q.id] = null;
       });
 
-      // Always try to fetch existing answers (both for new and resumed attempts)
+      // Existing answers come with the resume response; a start may also return an attempt already in progress
       try {
-        const answersResponse = await api.get(`/student/attempts/${attemptObj?.id}/answers`);
+        const storedAnswers = response.data?.answers
+          || (await api.get(`/student/attempts/${attemptObj?.id}/answers`)).data;
         const existingAnswers = {};
-        answersResponse.data.forEach(answer => {
+        storedAnswers.forEach(answer => {
           existingAnswers[answer.question_id] = answer.answer_data;
         });
         setAnswers(existingAnswers);
+        // Continue numbering after the latest stored write, or the server would ignore new ones as stale
+        syncedSeqRef.current = Math.max(
+          response.data?.last_seq || 0,
+          ...storedAnswers.map((answer) => answer.client_seq || 0),
+        );
+        seqRef.current = Math.max(seqRef.current, syncedSeqRef.current);
       } catch (err) {
         // If no answers found, use empty/initial answers
         setAnswers(initialAnswers);
@@ -144,8 +187,11 @@ function ExamPage() {
       const remaining = Math.floor((examEndTime - now) / 1000);
 
       if (remaining <= 0) {
-        // Time expired - auto-submit
         clearInterval(timerInterval);
+        setTimeRemaining(0);
+        // With the exam socket open the server auto-submits and tells us
+        if (socketRef.current && socketRef.current.readyState === WebSocket.OPEN) return;
+        // Time expired - auto-submit
         setSubmitting(true);
         api.post(`/student/attempts/${attemptId}/submit`)
           .then(async () => {
@@ -174,13 +220,22 @@ function ExamPage() {
       [questionId]: answer,
     });
 
-    // Auto-save answer
-    if (attemptId) {
+    // Auto-save answer: one small frame over the exam socket, or an HTTP request without it
+    const socket = socketRef.current;
+    if (attemptId && socket && socket.readyState === WebSocket.OPEN) {
+      const seq = nextSeq();
+      unackedRef.current.add(seq);
+      setSaving(true);
+      socket.send(JSON.stringify({ type: 'answer', seq, question_id: questionId, answer_data: answer }));
+    } else if (attemptId) {
+      // Same numbering as socket frames, so a retried or late request cannot overwrite a newer answer
+      const seq = nextSeq();
       setSaving(true);
       try {
-        const response = await api.post(`/student/attempts/${attemptId}/save-answer`, {
+        await api.post(`/student/attempts/${attemptId}/save-answer`, {
           question_id: questionId,
           answer_data: answer,
+          client_seq: seq,
         });
       } catch (err) {
         // Handle error silently
@@ -218,41 +273,165 @@ function ExamPage() {
     }
   };
 
-  const handleSubmitExam = async () => {
-    setShowSubmitModal(false);
-    setSubmitting(true);
-    try {
-      const submitResponse = await api.post(`/student/attempts/${attemptId}/submit`);
+  // Grading runs in a background queue; wait for its grading_finished event
+  // (long-polling the status if the event stream is unavailable), then fetch the results
+  const loadResultsAfterSubmit = useCallback(async (initialState) => {
+    setLoadingResults(true);
+    let state = initialState;
+    if (state === 'grading') {
+      state = await new Promise((resolve) => {
+        const timeout = setTimeout(() => { close(); resolve('grading'); }, 15000);
+        const finish = (result) => {
+          clearTimeout(timeout);
+          close();
+          resolve(result);
+        };
+        const close = subscribeEvents('/student/events', {
+          // Grading may have finished before the stream was open
+          open: async () => {
+            const statusResponse = await api.get(`/student/attempts/${attemptId}/status`).catch(() => null);
+            if (statusResponse?.data?.state === 'graded') finish('graded');
+          },
+          grading_finished: (data) => {
+            if (data.attempt_id === attemptId) finish('graded');
+          },
+        });
+      });
+    }
+    for (let i = 0; state === 'grading' && i < 6; i++) {
+      const statusResponse = await api.get(`/student/attempts/${attemptId}/status`, { params: { wait: 10 } });
+      state = statusResponse.data?.state;
+    }
 
-      // Retry fetching results briefly in case of timing/commit delay
-      setLoadingResults(true);
-      const fetchWithRetry = async (retries = 3, delayMs = 350) => {
-        for (let i = 0; i < retries; i++) {
-          try {
-            const res = await api.get(`/student/attempts/${attemptId}/results`);
-            setResults(res.data);
+    // Retry fetching results briefly in case of timing/commit delay
+    const fetchWithRetry = async (retries = 3, delayMs = 350) => {
+      for (let i = 0; i < retries; i++) {
+        try {
+          const res = await api.get(`/student/attempts/${attemptId}/results`);
+          setResults(res.data);
+          setLoadingResults(false);
+          setSubmitting(false);
+          return;
+        } catch (e) {
+          console.error(`Result fetch attempt ${i + 1} failed:`, e);
+          const status = e?.response?.status;
+          const retriable = status === 404 || status === 400; // not found or not submitted yet
+          if (i === retries - 1 || !retriable) {
+            let msg = 'Failed to fetch results';
+            const detail = e?.response?.data?.detail;
+            if (typeof detail === 'string') msg = detail;
+            else if (Array.isArray(detail)) msg = detail[0]?.msg || msg;
+            setError(msg);
             setLoadingResults(false);
             setSubmitting(false);
             return;
-          } catch (e) {
-            console.error(`Result fetch attempt ${i + 1} failed:`, e);
-            const status = e?.response?.status;
-            const retriable = status === 404 || status === 400; // not found or not submitted yet
-            if (i === retries - 1 || !retriable) {
-              let msg = 'Failed to fetch results';
-              const detail = e?.response?.data?.detail;
-              if (typeof detail === 'string') msg = detail;
-              else if (Array.isArray(detail)) msg = detail[0]?.msg || msg;
-              setError(msg);
-              setLoadingResults(false);
-              setSubmitting(false);
-              return;
-            }
-            await new Promise((r) => setTimeout(r, delayMs));
           }
+          await new Promise((r) => setTimeout(r, delayMs));
         }
-      };
-      await fetchWithRetry();
+      }
+    };
+    await fetchWithRetry();
+  }, [attemptId]);
+
+  // Exam session socket: answers are streamed over it and the server pushes
+  // time sync and the auto-submit at the deadline. HTTP saves are used while it is not open.
+  useEffect(() => {
+    if (!attemptId || results) return undefined;
+    const token = localStorage.getItem('token');
+    const baseUrl = api.defaults.baseURL.replace(/^http/, 'ws');
+    const socket = new WebSocket(`${baseUrl}/student/attempts/${attemptId}/ws`);
+    socketRef.current = socket;
+
+    // Authenticate with the first frame; a token in the URL would end up in access logs
+    socket.onopen = () => {
+      socket.send(JSON.stringify({ type: 'auth', token: token || '' }));
+    };
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'session' || message.type === 'time' || message.type === 'heartbeat') {
+        setExamEndTime(new Date(Date.now() + message.seconds_remaining * 1000));
+      } else if (message.type === 'ack' || message.type === 'error') {
+        unackedRef.current.delete(message.seq);
+        if (unackedRef.current.size === 0) setSaving(false);
+      } else if (message.type === 'auto_submitted') {
+        setSubmitting(true);
+        loadResultsAfterSubmit('grading');
+      }
+    };
+    socket.onclose = () => {
+      if (socketRef.current === socket) socketRef.current = null;
+    };
+
+    return () => {
+      socketRef.current = null;
+      socket.close();
+    };
+  }, [attemptId, results, loadResultsAfterSubmit]);
+
+  // Coming back to the tab: pick up answers saved elsewhere (another tab or device) meanwhile,
+  // fetching only what was written after the last sequence number this page has seen
+  useEffect(() => {
+    if (!attemptId || results) return undefined;
+    const handleVisibilityChange = async () => {
+      if (document.visibilityState !== 'visible') return;
+      try {
+        const { data } = await api.get(`/student/attempts/${attemptId}/answers`, {
+          params: { since_seq: syncedSeqRef.current },
+        });
+        if (!data.length) return;
+        setAnswers((current) => {
+          const merged = { ...current };
+          data.forEach((answer) => {
+            merged[answer.question_id] = answer.answer_data;
+          });
+          return merged;
+        });
+        syncedSeqRef.current = Math.max(syncedSeqRef.current, ...data.map((answer) => answer.client_seq || 0));
+        seqRef.current = Math.max(seqRef.current, syncedSeqRef.current);
+      } catch (err) {
+        // Keep the answers on screen; the next visit retries
+      }
+    };
+    document.addEventListener('visibilitychange', handleVisibilityChange);
+    return () => document.removeEventListener('visibilitychange', handleVisibilityChange);
+  }, [attemptId, results]);
+
+  // Heartbeat so proctors can see who still has the exam open: a socket frame, or a small POST without it
+  useEffect(() => {
+    if (!attemptId || results) return undefined;
+    const heartbeatInterval = setInterval(() => {
+      const socket = socketRef.current;
+      if (socket && socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ type: 'heartbeat' }));
+      } else {
+        api.post(`/student/attempts/${attemptId}/heartbeat`)
+          .then((res) => {
+            if (res.data.seconds_remaining !== null) {
+              setExamEndTime(new Date(Date.now() + res.data.seconds_remaining * 1000));
+            }
+          })
+          .catch(() => {});
+      }
+    }, 20000);
+    return () => clearInterval(heartbeatInterval);
+  }, [attemptId, results]);
+
+  // Give answers already sent over the socket a moment to be stored before submitting
+  const waitForAnswerAcks = async (timeoutMs = 2000) => {
+    const deadline = Date.now() + timeoutMs;
+    while (unackedRef.current.size > 0 && socketRef.current && Date.now() < deadline) {
+      await new Promise((r) => setTimeout(r, 50));
+    }
+  };
+
+  const handleSubmitExam = async () => {
+    setShowSubmitModal(false);
+    setSubmitting(true);
+    try {
+      await waitForAnswerAcks();
+      const submitResponse = await api.post(`/student/attempts/${attemptId}/submit`);
+      await loadResultsAfterSubmit(submitResponse.data?.state);
     } catch (err) {
       console.error('Submit exam error:', err);
       let errorMessage = 'Failed to submit exam';
@@ -343,6 +522,7 @@ function ExamPage() {
     );
   };
 
+  if (loading && queuePosition) return <div style={styles(theme).container}><p style={{ color: theme.primary }}>Many students are starting this exam. You are number {queuePosition} in line; your time starts when you are let in.</p></div>;
   if (loading) return <div style={styles(theme).container}><p style={{ color: theme.primary }}>Loading...</p></div>;
   if (error) return <div style={styles(theme).container}><p style={styles(theme).error}>{error}</p><Button onClick={() => navigate('/student-account')}>Back to Dashboard</Button></div>;
 
@@ -4,6 +4,7 @@ import { useAuth } from '../context/AuthContext';
 import { useTheme } from '../context/ThemeContext';
 import StudentSidebar from '../components/StudentSidebar';
 import api from '../api';
+import { subscribeEvents } from '../events';
 import Button from '../components/Button';
 
 function StudentDashboard() {
@@ -11,6 +12,7 @@ function StudentDashboard() {
   const { theme } = useTheme();
   const navigate = useNavigate();
   const [exams, setExams] = useState([]);
+  const [unfinishedAttempts, setUnfinishedAttempts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -18,10 +20,18 @@ function StudentDashboard() {
     fetchExams();
   }, [navigate]);
 
+  // Reload the list when an exam is published or withdrawn instead of polling
+  useEffect(() => subscribeEvents('/student/events', {
+    exam_published: () => fetchExams(),
+    exam_unpublished: () => fetchExams(),
+  }), []);
+
   const fetchExams = async () => {
     try {
-      const response = await api.get('/student/exams/');
-      setExams(response.data);
+      // One request for the whole page; the browser revalidates it with its ETag
+      const response = await api.get('/student/dashboard');
+      setExams(response.data.exams);
+      setUnfinishedAttempts(response.data.unfinished_attempts);
       setError('');
       setLoading(false);
     } catch (err) {
@@ -44,22 +54,13 @@ function StudentDashboard() {
     navigate('/login');
   };
 
-  const handleStartExam = async (examId) => {
-    try {
-      // Check if student has an unfinished attempt for this exam
-      const response = await api.get('/student/unfinished-attempts/');
-      const unfinishedAttempt = response.data.find(attempt => attempt.exam_id === examId);
-
-      if (unfinishedAttempt) {
-        // Resume existing attempt instead of starting new one
-        navigate(`/exam/resume/${unfinishedAttempt.id}`);
-      } else {
-        // Start new exam
-        navigate(`/exam/${examId}`);
-      }
-    } catch (err) {
-      // If checking for unfinished attempts fails, just start new exam
-      console.error('Error checking for unfinished attempts:', err);
+  const handleStartExam = (examId) => {
+    // Resume an unfinished attempt from the dashboard data instead of starting a new one;
+    // starting also returns an attempt opened elsewhere in the meantime
+    const unfinishedAttempt = unfinishedAttempts.find(attempt => attempt.exam_id === examId);
+    if (unfinishedAttempt) {
+      navigate(`/exam/resume/${unfinishedAttempt.id}`);
+    } else {
       navigate(`/exam/${examId}`);
     }
   };